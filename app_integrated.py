@@ -3,31 +3,151 @@ load_dotenv()
 
 import streamlit as st
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import db_utils
-from PIL import Image
-import pandas as pd
-import pypdf
+import upload_store
+import csv_profile
+import tracing
+import response_cache
+import gemini_limiter
+import session_memory
 import csv
+import fcntl
 import json
 import io
 import os
-import requests
-from google.genai import types
-from google import genai
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+# google.genai, pypdf, PIL (via image_payload) and requests are imported in the
+# functions that need them: together they add about a second to process
+# start, and most page renders never touch them
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
 WHISPER_SERVER_URL = "http://localhost:8001"
 OCR_SERVER_URL = "http://localhost:8002"
+VOSK_SERVER_URL = "http://localhost:8003"
+
+# Speech-to-text routing between Vosk (fast, lighter) and Whisper (accurate)
+VOICE_COMMAND_MAX_SECONDS = 15   # clips up to this long go to Vosk
+VOSK_MAX_SECONDS = 120           # longer clips always go to Whisper
+WHISPER_BUSY_QUEUE_DEPTH = 2     # queued Whisper jobs before overflow goes to Vosk
+VOSK_BUSY_WAITING = 1            # requests waiting for a Vosk recognizer before clips go to Whisper
+
+# Model server job API polling (see job_queue.py)
+JOB_POLL_INTERVAL = 0.5
+JOB_MAX_WAIT = 30 * 60
+
+# Chat history is rendered in pages; big result tables are collapsed
+HISTORY_PAGE_SIZE = 20
+TABLE_PREVIEW_ROWS = 20
+
+# Only a preview-sized copy of image attachments is kept in session memory
+IMAGE_PREVIEW_MAX_SIDE = 600
+
+# Background attachment processing (PDF parsing, OCR, Whisper, CSV stats)
+ATTACHMENT_WORKERS = 4
+ATTACHMENT_POLL_INTERVAL = 1.0
+
+# Sidebar latency percentiles cover this many days of turns
+LATENCY_STATS_WINDOW_DAYS = 7
+
+# In-app exports are written here (the CLI can't open local_chat.db while the app runs on DuckDB)
+EXPORT_DIR = "exports"
+
+# Retention jobs (chat archive, upload GC) run inside the app: on the default
+# DuckDB backend this process holds the lock on local_chat.db, so the CLIs
+# can't run next to it
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))  # 0 disables
+MAINTENANCE_FIRST_RUN_DELAY = 5 * 60  # let the app finish starting first
+MAINTENANCE_LOCK_PATH = os.path.join(upload_store.UPLOAD_ROOT, ".maintenance.lock")
 
 @st.cache_resource
 def get_gemini_client():
+    """Created on the first Gemini call, not at startup"""
+    from google import genai
+
     return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
-client = get_gemini_client()
+
+@st.cache_resource
+def get_gemini_limiter():
+    """Admission controller shared by every session in this process"""
+    return gemini_limiter.GeminiLimiter()
+
+limiter = get_gemini_limiter()
+
+
+@st.cache_resource
+def get_session_memory():
+    """Memory accounting and Gemini chat objects for every session in this process"""
+    # Spill dirs left by a previous run are unreachable: nothing refers to them any more
+    session_memory.sweep_spill_dirs()
+    return session_memory.SessionMemory()
+
+memory = get_session_memory()
+
+
+@st.cache_resource
+def get_attachment_executor():
+    """Thread pool shared by all sessions for attachment processing"""
+    return ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS, thread_name_prefix="attachment")
+
+
+def run_maintenance():
+    """Archive inactive chats, compact the archive and garbage-collect uploads"""
+    import chat_archive
+
+    results = {}
+    for name, job in (("archive", chat_archive.archive_inactive_sessions),
+                      ("compact", chat_archive.compact),
+                      ("upload_gc", upload_store.collect_garbage),
+                      ("spill_sweep", session_memory.sweep_spill_dirs)):
+        try:
+            results[name] = job()
+        except Exception as e:
+            results[name] = {"error": str(e)}
+    print(f"Maintenance: {results}")
+    return results
+
+
+@st.cache_resource
+def start_maintenance():
+    """
+    Background thread running run_maintenance() every MAINTENANCE_INTERVAL_HOURS
+
+    One per process. With several app processes on the SQLite backend, a
+    file lock keeps two runs from overlapping.
+    """
+    if MAINTENANCE_INTERVAL_HOURS <= 0:
+        return None
+
+    def loop():
+        time.sleep(MAINTENANCE_FIRST_RUN_DELAY)
+        while True:
+            os.makedirs(os.path.dirname(MAINTENANCE_LOCK_PATH), exist_ok=True)
+            with open(MAINTENANCE_LOCK_PATH, "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    pass  # another process is running it right now
+                else:
+                    run_maintenance()
+            time.sleep(MAINTENANCE_INTERVAL_HOURS * 3600)
+
+    thread = threading.Thread(target=loop, name="maintenance", daemon=True)
+    thread.start()
+    return thread
+
+start_maintenance()
 
 
 # ============================================================================
@@ -36,6 +156,8 @@ client = get_gemini_client()
 
 def check_server_health(server_url, server_name):
     """Check if a server is running"""
+    import requests
+
     try:
         response = requests.get(f"{server_url}/health", timeout=2)
         return response.status_code == 200
@@ -43,10 +165,87 @@ def check_server_health(server_url, server_name):
         return False
 
 
+def get_server_health(server_url):
+    """Health payload of a server, or None if it is unreachable"""
+    import requests
+
+    try:
+        response = requests.get(f"{server_url}/health", timeout=2)
+        return response.json() if response.status_code == 200 else None
+    except:
+        return None
+
+
+def get_audio_duration(audio_file):
+    """Clip length in seconds read from the WAV header, or None for other formats"""
+    try:
+        with wave.open(io.BytesIO(audio_file.getbuffer()), "rb") as wf:
+            return wf.getnframes() / wf.getframerate()
+    except Exception:
+        return None
+
+
+def choose_stt_engine(duration, accuracy="normal", whisper_health=None, vosk_health=None):
+    """
+    Pick the speech-to-text server for a clip
+
+    Short voice commands go to Vosk; long, unknown-length or high-accuracy
+    audio goes to Whisper. When Whisper's job queue is backed up, mid-length
+    clips overflow to Vosk; when Vosk's recognizer pool is saturated and
+    Whisper is not, clips go to Whisper. Falls back to whichever server is up.
+
+    Args:
+        duration: Clip length in seconds (None if unknown)
+        accuracy: "normal" or "high"
+        whisper_health: /health payload of the Whisper server (None if offline)
+        vosk_health: /health payload of the Vosk server (None if offline)
+
+    Returns:
+        tuple: (engine, reason) where engine is "vosk", "whisper" or None if both are offline
+    """
+    vosk_can_handle = duration is not None and duration <= VOSK_MAX_SECONDS
+    whisper_backlog = whisper_health["jobs"]["queue_depth"] if whisper_health and "jobs" in whisper_health else 0
+    whisper_busy = whisper_backlog >= WHISPER_BUSY_QUEUE_DEPTH
+    vosk_pool = vosk_health.get("pool") if vosk_health else None
+    # Every request decodes at the model rate, so all share one pool of capacity_per_rate recognizers
+    vosk_saturated = bool(vosk_pool) and (
+        vosk_pool["waiting"] >= VOSK_BUSY_WAITING or vosk_pool["active"] >= vosk_pool["capacity_per_rate"]
+    )
+
+    if accuracy == "high":
+        engine, reason = "whisper", "high accuracy requested"
+    elif not vosk_can_handle:
+        engine, reason = "whisper", "long or unknown-length audio"
+    elif duration <= VOICE_COMMAND_MAX_SECONDS:
+        engine, reason = "vosk", "short voice clip"
+    elif whisper_busy:
+        engine, reason = "vosk", f"Whisper busy ({whisper_backlog} queued)"
+    else:
+        engine, reason = "whisper", "Whisper has capacity"
+
+    # Don't queue behind a full Vosk pool while Whisper has room
+    if engine == "vosk" and vosk_saturated and whisper_health is not None and not whisper_busy:
+        engine, reason = "whisper", (
+            f"Vosk busy ({vosk_pool['active']} active, {vosk_pool['waiting']} waiting)"
+        )
+
+    # Fall back to whichever server is up
+    if engine == "vosk" and vosk_health is None:
+        engine, reason = "whisper", "Vosk offline"
+    if engine == "whisper" and whisper_health is None:
+        if vosk_health is not None and vosk_can_handle:
+            engine, reason = "vosk", "Whisper offline"
+        else:
+            engine, reason = None, "No speech-to-text server available for this clip"
+    return engine, reason
+
+
 def convert_csv_to_json(csv_file, max_rows=100):
     """Convert CSV to JSON with row limit to prevent large file issues"""
     data = {}
-    text_file = io.StringIO(csv_file.getvalue().decode('utf-8'))
+    # Decode lazily from the file stream: only the first max_rows rows are read
+    csv_file.seek(0)
+    text_file = io.TextIOWrapper(csv_file, encoding='utf-8', newline='')
     csv_reader = csv.DictReader(text_file)
     row_count = 0
 
@@ -57,101 +256,197 @@ def convert_csv_to_json(csv_file, max_rows=100):
         data[i] = row
         row_count += 1
 
+    # Detach so closing the wrapper does not close the uploaded file
+    text_file.detach()
+    csv_file.seek(0)
+
     with open('output.json', 'w') as json_file:
         json.dump(data, json_file, indent=4)
 
     return json.dumps(data, indent=2)
 
 
-def save_csv_to_disk(uploaded_file, session_id):
-    """Save CSV file to disk and return path"""
-    upload_dir = f"uploads/{session_id}"
-    os.makedirs(upload_dir, exist_ok=True)
-    csv_path = os.path.join(upload_dir, uploaded_file.name)
-    with open(csv_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return csv_path
+def save_csv_to_disk(uploaded_file, session_id, progress_callback=None):
+    """Stream CSV file to the deduplicated upload store and return path"""
+    total_bytes = upload_store.get_upload_size(uploaded_file)
+
+    # Large-file mode: report copy progress to the uploader area
+    if total_bytes < upload_store.LARGE_FILE_THRESHOLD or progress_callback is None:
+        return upload_store.store_upload(uploaded_file, session_id)
+
+    def report_progress(bytes_copied):
+        progress_callback(
+            min(bytes_copied / total_bytes, 1.0) * 0.8,
+            f"Saving {bytes_copied // (1024 * 1024)} / {total_bytes // (1024 * 1024)} MB"
+        )
+
+    return upload_store.store_upload(uploaded_file, session_id, progress_callback=report_progress)
+
+
+def run_server_job(server_url, job_path, file_path, priority="bulk", max_wait=JOB_MAX_WAIT, status_callback=None):
+    """Submit a file to a model server's job API and poll until it finishes"""
+    import requests
+
+    with open(file_path, 'rb') as f:
+        files = {'file': f}
+        response = requests.post(f"{server_url}{job_path}", files=files, data={"priority": priority}, timeout=60)
+
+    if response.status_code != 202:
+        raise Exception(response.json().get("error") or f"Server returned {response.status_code}")
+    job_id = response.json()["job_id"]
 
+    # Long work is bounded by max_wait, not by a single HTTP timeout
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        job = requests.get(f"{server_url}/jobs/{job_id}", timeout=5).json()
+        if not job.get("success"):
+            raise Exception(job.get("error", "Unknown error"))
+        if job["status"] == "done":
+            return job["result"]
+        if job["status"] in ("failed", "expired"):
+            raise Exception(job.get("error") or f"Job {job['status']}")
+        if status_callback:
+            position = job.get("queue_position")
+            status_callback("Queued" + (f" (position {position + 1})" if position is not None else "")
+                            if job["status"] == "queued" else "Running")
+        time.sleep(JOB_POLL_INTERVAL)
 
-def transcribe_audio_via_server(audio_file):
+    raise Exception(f"Job {job_id} did not finish within {max_wait}s")
+
+
+def transcribe_audio_via_server(audio_file, priority="bulk", status_callback=None):
     """Send audio to Whisper server for transcription"""
     try:
         # Save temp file
-        temp_path = f"temp_audio_{st.session_state['session_id']}.wav"
-        with open(temp_path, "wb") as f:
+        with tempfile.NamedTemporaryFile(delete=False, prefix="temp_audio_", suffix=".wav") as f:
             f.write(audio_file.getbuffer())
+            temp_path = f.name
 
         # Send to Whisper server
-        with open(temp_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(f"{WHISPER_SERVER_URL}/transcribe", files=files, timeout=60)
-
-        # Cleanup
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return result.get("transcription", "")
-            else:
-                raise Exception(result.get("error", "Unknown error"))
+        try:
+            result = run_server_job(WHISPER_SERVER_URL, "/jobs/transcribe", temp_path, priority,
+                                    status_callback=status_callback)
+        finally:
+            # Cleanup
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if result.get("success"):
+            return result.get("transcription", "")
         else:
-            raise Exception(f"Server returned {response.status_code}")
+            raise Exception(result.get("error", "Unknown error"))
 
     except Exception as e:
         raise Exception(f"Whisper server error: {str(e)}")
 
 
-def extract_text_via_ocr_server(image_file):
+def transcribe_audio_via_vosk(audio_file):
+    """Send audio to the Vosk server (synchronous; meant for short clips)"""
+    import requests
+
+    try:
+        response = requests.post(
+            f"{VOSK_SERVER_URL}/transcribe",
+            files={"file": (getattr(audio_file, "name", "audio.wav"), audio_file.getbuffer())},
+            timeout=60
+        )
+        result = response.json()
+        if result.get("success"):
+            return result.get("transcription", "")
+        else:
+            raise Exception(result.get("error", "Unknown error"))
+
+    except Exception as e:
+        raise Exception(f"Vosk server error: {str(e)}")
+
+
+def transcribe_audio(audio_file, priority="bulk", accuracy="normal", status_callback=None):
+    """
+    Transcribe audio on the server chosen by choose_stt_engine
+
+    Returns:
+        tuple: (transcription, engine)
+    """
+    duration = get_audio_duration(audio_file)
+    engine, reason = choose_stt_engine(
+        duration,
+        accuracy,
+        whisper_health=get_server_health(WHISPER_SERVER_URL),
+        vosk_health=get_server_health(VOSK_SERVER_URL)
+    )
+    if engine is None:
+        raise Exception(reason)
+    print(f"STT routing: {engine} ({reason})")
+
+    if engine == "vosk":
+        try:
+            return transcribe_audio_via_vosk(audio_file), "vosk"
+        except Exception as e:
+            # e.g. a format Vosk can't decode: let Whisper have a go
+            print(f"{e} - retrying with Whisper")
+    return transcribe_audio_via_server(audio_file, priority, status_callback=status_callback), "whisper"
+
+
+def extract_text_via_ocr_server(image_file, priority="bulk", status_callback=None):
     """Send image to OCR server for text extraction"""
     try:
         # Save temp file
         file_ext = os.path.splitext(image_file.name)[1] or '.jpg'
-        temp_path = f"temp_image_{st.session_state['session_id']}{file_ext}"
-        with open(temp_path, "wb") as f:
+        with tempfile.NamedTemporaryFile(delete=False, prefix="temp_image_", suffix=file_ext) as f:
             f.write(image_file.getbuffer())
+            temp_path = f.name
 
         # Send to OCR server
-        with open(temp_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(f"{OCR_SERVER_URL}/ocr", files=files, timeout=60)
-
-        # Cleanup
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("success"):
-                return {
-                    "text": result.get("text", ""),
-                    "lines": result.get("lines", []),
-                    "confidence": sum([line["confidence"] for line in result.get("lines", [])]) / len(result.get("lines", [])) if result.get("lines") else 0
-                }
-            else:
-                raise Exception(result.get("error", "Unknown error"))
+        try:
+            result = run_server_job(OCR_SERVER_URL, "/jobs/ocr", temp_path, priority,
+                                    status_callback=status_callback)
+        finally:
+            # Cleanup
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if result.get("success"):
+            return {
+                "text": result.get("text", ""),
+                "lines": result.get("lines", []),
+                "confidence": sum([line["confidence"] for line in result.get("lines", [])]) / len(result.get("lines", [])) if result.get("lines") else 0
+            }
         else:
-            raise Exception(f"Server returned {response.status_code}")
+            raise Exception(result.get("error", "Unknown error"))
 
     except Exception as e:
         raise Exception(f"OCR server error: {str(e)}")
 
 
-def process_file(uploaded_file, session_id, ocr_mode="vision"):
-    """Process uploaded files and return context"""
+def process_file(uploaded_file, session_id, ocr_mode="vision", progress_callback=None):
+    """
+    Process uploaded files and return context
+
+    Runs on the attachment executor, so it must not call any st.* functions;
+    failures are raised and progress is reported through
+    progress_callback(fraction, text).
+    """
     file_text_context = ""
     image_data = None
     csv_info = None
     audio_transcription = None
     ocr_result = None
+    vision_payload = None
+
+    def report(fraction, text):
+        if progress_callback:
+            progress_callback(fraction, text)
 
     file_type = uploaded_file.type
 
     # PDF processing
     if file_type == "application/pdf":
+        import pypdf
+
         pdf_reader = pypdf.PdfReader(uploaded_file)
-        for page in pdf_reader.pages:
+        page_count = len(pdf_reader.pages)
+        for page_number, page in enumerate(pdf_reader.pages, start=1):
+            report(page_number / page_count, f"Extracting text from page {page_number} of {page_count}")
             extracted_text = page.extract_text()
             if extracted_text:
                 file_text_context += extracted_text
@@ -160,65 +455,82 @@ def process_file(uploaded_file, session_id, ocr_mode="vision"):
 
     # CSV processing
     elif file_type == "text/csv":
-        csv_path = save_csv_to_disk(uploaded_file, session_id)
+        report(0.0, "Saving")
+        csv_path = save_csv_to_disk(uploaded_file, session_id, progress_callback)
+        report(0.8, "Reading schema")
         schema_result = db_utils.get_csv_schema(csv_path)
-        if schema_result["success"]:
-            csv_info = {
-                "path": csv_path,
-                "filename": uploaded_file.name,
-                "schema": schema_result["schema"]
-            }
-            file_text_context = f"[CSV uploaded: {uploaded_file.name}]"
-        else:
-            st.error(f"Failed to read CSV: {schema_result['error']}")
-            file_text_context = "[CSV upload failed]"
+        if not schema_result["success"]:
+            raise Exception(f"Failed to read CSV: {schema_result['error']}")
+
+        # Column statistics are computed once per upload and cached by blob path
+        report(0.85, "Computing column statistics")
+        stats_result = db_utils.get_csv_stats(csv_path)
+        csv_info = {
+            "path": csv_path,
+            "filename": uploaded_file.name,
+            "schema": schema_result["schema"],
+            "stats": stats_result["stats"] if stats_result["success"] else None
+        }
+        file_text_context = f"[CSV uploaded: {uploaded_file.name}]"
 
     # Image processing
     elif file_type in ["image/png", "image/jpeg", "image/jpg", "image/webp"]:
+        import image_payload
+        from PIL import Image
+
         image_data = Image.open(uploaded_file)
+        image_data.thumbnail((IMAGE_PREVIEW_MAX_SIDE, IMAGE_PREVIEW_MAX_SIDE))
 
         if ocr_mode == "ocr":
             # Send to OCR server
             uploaded_file.seek(0)  # Reset file pointer
-            ocr_result = extract_text_via_ocr_server(uploaded_file)
+            report(0.0, "Sending to OCR server")
+            ocr_result = extract_text_via_ocr_server(uploaded_file, status_callback=lambda text: report(0.5, f"OCR: {text}"))
             file_text_context = f"[OCR extracted from {uploaded_file.name}]:\n{ocr_result['text']}"
         else:
-            # Use Gemini Vision
+            # Use Gemini Vision: resize/re-encode now so the chat turn only uploads the small payload
+            report(0.0, "Optimizing image for Gemini")
+            vision_payload = image_payload.prepare_vision_payload(uploaded_file)
             file_text_context = f"[Image: {uploaded_file.name}]"
 
     # Audio processing (new!)
     elif file_type in ["audio/mpeg", "audio/wav", "audio/mp3", "audio/x-wav"]:
         uploaded_file.seek(0)
-        audio_transcription = transcribe_audio_via_server(uploaded_file)
+        report(0.0, "Sending to speech-to-text server")
+        audio_transcription, _ = transcribe_audio(uploaded_file, status_callback=lambda text: report(0.5, f"Transcription: {text}"))
         file_text_context = f"[Audio transcription from {uploaded_file.name}]:\n{audio_transcription}"
 
-    return file_text_context, image_data, csv_info, audio_transcription, ocr_result
+    return file_text_context, image_data, csv_info, audio_transcription, ocr_result, vision_payload
 
 
 # ============================================================================
 # SESSION MANAGEMENT
 # ============================================================================
 
+def is_valid_session_id(value):
+    """Session ids are UUIDs generated by initialize_session (they end up in file paths)"""
+    try:
+        return str(uuid.UUID(value)) == value
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
 def initialize_session():
     query_params = st.query_params
 
     if "session_id" not in st.session_state:
-        if "session_id" in query_params:
+        if is_valid_session_id(query_params.get("session_id")):
             st.session_state["session_id"] = query_params["session_id"]
         else:
+            # No id, or one the app didn't generate: start a new session
             new_session_id = str(uuid.uuid4())
             st.session_state["session_id"] = new_session_id
             st.query_params["session_id"] = new_session_id
 
     if "messages" not in st.session_state:
+        # Only the latest page is loaded; older pages are fetched on demand
         st.session_state["messages"] = []
-        history = db_utils.load_history(st.session_state["session_id"])
-        for row in history:
-            st.session_state["messages"].append({
-                "role": row[2],
-                "content": row[3],
-                "has_attachment": row[4]
-            })
+        load_older_messages()
 
     if "system_prompt" not in st.session_state:
         st.session_state["system_prompt"] = "You are a helpful AI assistant."
@@ -241,6 +553,15 @@ def initialize_session():
     if "ocr_result" not in st.session_state:
         st.session_state["ocr_result"] = None
 
+    if "vision_payload" not in st.session_state:
+        st.session_state["vision_payload"] = None
+
+    if "attachment_key" not in st.session_state:
+        st.session_state["attachment_key"] = None
+
+    if "attachment_ms" not in st.session_state:
+        st.session_state["attachment_ms"] = None
+
     if "stt_service" not in st.session_state:
         st.session_state["stt_service"] = None
 
@@ -265,9 +586,11 @@ def display_sidebar():
     st.sidebar.subheader("Server Status")
     whisper_status = check_server_health(WHISPER_SERVER_URL, "Whisper")
     ocr_status = check_server_health(OCR_SERVER_URL, "OCR")
+    vosk_status = check_server_health(VOSK_SERVER_URL, "Vosk")
 
     st.sidebar.write(f"{'🟢' if whisper_status else '🔴'} Whisper (8001): {'Running' if whisper_status else 'Offline'}")
     st.sidebar.write(f"{'🟢' if ocr_status else '🔴'} OCR (8002): {'Running' if ocr_status else 'Offline'}")
+    st.sidebar.write(f"{'🟢' if vosk_status else '🔴'} Vosk (8003): {'Running' if vosk_status else 'Offline'}")
 
     st.sidebar.divider()
 
@@ -286,19 +609,245 @@ def display_sidebar():
         help="Define how the AI should behave"
     )
 
+    st.session_state["use_response_cache"] = st.sidebar.checkbox(
+        "Cache repeated Gemini answers",
+        value=response_cache.CACHE_ENABLED_DEFAULT,
+        help="Reuse answers for identical stateless requests (SQL generation, first message of a chat)"
+    )
+    if st.session_state["use_response_cache"]:
+        cache_stats = response_cache.get_cache_stats()
+        st.sidebar.caption(f"{cache_stats['entries']} cached answers, {cache_stats['hits']} hits")
+
+    if st.sidebar.checkbox("Show latency breakdown"):
+        last_trace = st.session_state.get("last_turn_trace")
+        if last_trace:
+            st.sidebar.write("**Last turn:**")
+            for stage, duration_ms in last_trace["spans"]:
+                st.sidebar.write(f"- {stage}: {duration_ms:.0f} ms")
+        limiter_stats = limiter.stats()
+        st.sidebar.write(
+            f"**Gemini queue:** {limiter_stats['queue_depth']} waiting, "
+            f"{limiter_stats['in_flight']}/{limiter_stats['max_concurrent']} in flight, "
+            f"wait p50/p95 {limiter_stats['wait_p50_ms']:.0f} / {limiter_stats['wait_p95_ms']:.0f} ms, "
+            f"{limiter_stats['throttled']} throttled"
+        )
+        st.sidebar.write(f"**Last {LATENCY_STATS_WINDOW_DAYS} days (p50 / p95):**")
+        since = datetime.now() - timedelta(days=LATENCY_STATS_WINDOW_DAYS)
+        for row in db_utils.get_stage_latency_stats(since):
+            st.sidebar.write(f"- {row['stage']}: {row['p50_ms']:.0f} / {row['p95_ms']:.0f} ms ({row['turns']} turns)")
+
+    if st.sidebar.checkbox("Show memory usage"):
+        memory_stats = memory.stats()
+        st.sidebar.write(f"**This session:** {st.session_state.get('memory_footprint', 0) / 1024 / 1024:.1f} MB")
+        st.sidebar.write(
+            f"**All sessions:** {memory_stats['total_bytes'] / 1024 / 1024:.1f} MB "
+            f"({memory_stats['sessions']} sessions, {memory_stats['chats']} chat objects)"
+        )
+
     if st.sidebar.checkbox("Show all sessions in DB"):
         all_sessions = db_utils.get_all_sessions()
         st.sidebar.write("**All Sessions:**")
         for session in all_sessions:
             st.sidebar.write(f"- {session}")
 
+    if st.sidebar.checkbox("Export / import chats"):
+        display_transfer_controls()
+
+
+def display_transfer_controls():
+    """Export/import through the app's own connection (see chat_export.py for the CLI)"""
+    fmt = st.sidebar.selectbox("Format", db_utils.TRANSFER_FORMATS, key="transfer_format")
+    this_session_only = st.sidebar.checkbox("This session only", key="export_this_session")
+
+    if st.sidebar.button("Export", key="export_chats"):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = os.path.join(EXPORT_DIR, f"chats-{datetime.now():%Y%m%d-%H%M%S}.{fmt}")
+        session_ids = [st.session_state["session_id"]] if this_session_only else None
+        try:
+            with st.spinner("Exporting..."):
+                stats = db_utils.export_messages(path, fmt=fmt, session_ids=session_ids)
+            st.session_state["last_export"] = path
+            st.sidebar.success(f"Exported {stats['messages']:,} messages from {stats['sessions']:,} sessions")
+        except (ValueError, ImportError) as e:
+            st.sidebar.error(str(e))
+
+    last_export = st.session_state.get("last_export")
+    if last_export and os.path.exists(last_export):
+        st.sidebar.caption(f"Saved on the server as `{last_export}`")
+        with open(last_export, "rb") as f:
+            st.sidebar.download_button("Download export", f, file_name=os.path.basename(last_export), key="download_export")
+
+    import_file = st.sidebar.file_uploader("Import messages", type=list(db_utils.TRANSFER_FORMATS), key="import_file")
+    if import_file is not None and st.sidebar.button("Import", key="import_chats"):
+        suffix = os.path.splitext(import_file.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(import_file.getbuffer())
+            temp_path = f.name
+        try:
+            with st.spinner("Importing..."):
+                stats = db_utils.import_messages(temp_path)
+            st.sidebar.success(f"Imported {stats['messages']:,} messages ({stats['skipped']:,} already present)")
+        except (ValueError, ImportError) as e:
+            st.sidebar.error(str(e))
+        finally:
+            os.unlink(temp_path)
+
+
+def load_older_messages():
+    """Prepend the next page of history (one extra row tells whether more exist)"""
+    messages = st.session_state["messages"]
+    before = messages[0]["timestamp"] if messages else None
+    # Messages already shown that share the oldest timestamp (e.g. imported chats)
+    skip = sum(1 for message in messages if message["timestamp"] == before)
+    rows = db_utils.load_history_page(st.session_state["session_id"], HISTORY_PAGE_SIZE + 1, before, skip)
+
+    st.session_state["history_has_older"] = len(rows) > HISTORY_PAGE_SIZE
+    page = [
+        {
+            "timestamp": row[1],
+            "role": row[2],
+            "content": row[3],
+            "has_attachment": row[4]
+        }
+        for row in rows[-HISTORY_PAGE_SIZE:]
+    ]
+    st.session_state["messages"] = page + messages
+
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def prepare_message_markdown(content, preview_rows=TABLE_PREVIEW_ROWS):
+    """
+    Collapse long markdown tables to their first rows
+
+    Cached by content, so each message is scanned once rather than on every rerun.
+
+    Returns:
+        tuple: (preview markdown, number of table rows hidden from the preview)
+    """
+    lines = content.split("\n")
+    preview = []
+    hidden = 0
+    table_rows = 0
+    for line in lines:
+        if line.startswith("|"):
+            table_rows += 1
+            # Header and separator lines are always kept
+            if table_rows > preview_rows + 2:
+                hidden += 1
+                continue
+        else:
+            if table_rows > preview_rows + 2:
+                preview.append(f"\n*… {table_rows - preview_rows - 2} more rows*")
+            table_rows = 0
+        preview.append(line)
+    if table_rows > preview_rows + 2:
+        preview.append(f"\n*… {table_rows - preview_rows - 2} more rows*")
+    return "\n".join(preview), hidden
+
+
+def display_message(message, index):
+    """Render one message; `index` counts back from the newest, so widget keys
+    stay unique for messages sharing a timestamp and stable when older pages load"""
+    if message["role"] != "assistant":
+        st.write(message["content"])
+        return
+
+    preview, hidden_rows = prepare_message_markdown(message["content"])
+    if not hidden_rows:
+        st.markdown(message["content"])
+        return
+
+    # Full tables are only sent to the browser when asked for
+    if st.toggle(f"Show all rows ({hidden_rows} hidden)", key=f"full_{index}_{message['role']}"):
+        st.markdown(message["content"])
+    else:
+        st.markdown(preview)
+
 
 def display_chat_history():
-    for message in st.session_state["messages"]:
+    if st.session_state.get("history_has_older"):
+        if st.button("⬆️ Load older messages", key="load_older"):
+            load_older_messages()
+            st.rerun()
+
+    messages = st.session_state["messages"]
+    for position, message in enumerate(messages):
         with st.chat_message(message["role"]):
             if message.get("has_attachment"):
                 st.caption("📎 Message with attachment")
-            st.write(message["content"])
+            display_message(message, len(messages) - position)
+
+
+def clear_attachment():
+    session_memory.release(st.session_state["session_id"])
+    st.session_state["uploaded_file"] = None
+    st.session_state["file_context"] = ""
+    st.session_state["image_data"] = None
+    st.session_state["csv_info"] = None
+    st.session_state["audio_transcription"] = None
+    st.session_state["ocr_result"] = None
+    st.session_state["vision_payload"] = None
+    st.session_state["attachment_ms"] = None
+
+
+def submit_attachment_job(uploaded_file, job_key, ocr_mode):
+    """Start processing an attachment on the shared executor"""
+    progress = {"fraction": 0.0, "text": "Waiting to start"}
+    session_id = st.session_state["session_id"]  # session state is not readable from worker threads
+
+    def update_progress(fraction, text):
+        progress["fraction"] = min(max(fraction, 0.0), 1.0)
+        progress["text"] = text
+
+    def run():
+        start = time.perf_counter()
+        result = process_file(uploaded_file, session_id, ocr_mode, update_progress)
+        return result, (time.perf_counter() - start) * 1000
+
+    job = {
+        "key": job_key,
+        "name": uploaded_file.name,
+        "progress": progress,
+        "future": get_attachment_executor().submit(run)
+    }
+    st.session_state["attachment_job"] = job
+    return job
+
+
+def collect_attachment_job(job, uploaded_file):
+    """Attach a finished job's result to the session"""
+    del st.session_state["attachment_job"]
+    st.session_state["attachment_key"] = job["key"]
+
+    try:
+        result, duration_ms = job["future"].result()
+    except Exception as e:
+        clear_attachment()
+        st.error(f"Failed to process {job['name']}: {e}")
+        return
+
+    file_context, image_data, csv_info, audio_transcription, ocr_result, vision_payload = result
+    st.session_state["uploaded_file"] = uploaded_file
+    st.session_state["file_context"] = file_context
+    st.session_state["image_data"] = image_data
+    st.session_state["csv_info"] = csv_info
+    st.session_state["audio_transcription"] = audio_transcription
+    st.session_state["ocr_result"] = ocr_result
+    st.session_state["vision_payload"] = vision_payload
+    st.session_state["attachment_ms"] = duration_ms
+
+
+@st.fragment(run_every=ATTACHMENT_POLL_INTERVAL)
+def display_attachment_progress():
+    """Poll the running attachment job without rerunning the whole page"""
+    job = st.session_state.get("attachment_job")
+    if job is None:
+        return
+    if job["future"].done():
+        # Full rerun so the uploader can attach the result
+        st.rerun()
+    st.progress(job["progress"]["fraction"], text=f"⏳ {job['name']}: {job['progress']['text']}")
+    st.caption("You can keep typing; the file is attached as soon as it is ready.")
 
 
 def display_file_uploader():
@@ -310,74 +859,97 @@ def display_file_uploader():
         key="file_uploader"
     )
 
-    if uploaded_file is not None:
-        file_type = uploaded_file.type
-
-        # Show OCR option for images only
-        if file_type in ["image/png", "image/jpeg", "image/jpg", "image/webp"]:
-            ocr_available = check_server_health(OCR_SERVER_URL, "OCR")
-
-            if ocr_available:
-                st.session_state["image_processing_mode"] = st.radio(
-                    "Image Processing Mode:",
-                    options=["vision", "ocr"],
-                    format_func=lambda x: {
-                        "vision": "🔷 Gemini Vision (AI understands image)",
-                        "ocr": "📄 OCR (Extract text only)"
-                    }[x],
-                    horizontal=True,
-                    key="image_mode_selector"
-                )
-            else:
-                st.warning("⚠️ OCR server offline. Using Gemini Vision.")
-                st.session_state["image_processing_mode"] = "vision"
-
-        # Process file
-        st.session_state["uploaded_file"] = uploaded_file
-        file_context, image_data, csv_info, audio_transcription, ocr_result = process_file(
-            uploaded_file,
-            st.session_state["session_id"],
-            st.session_state.get("image_processing_mode", "vision")
-        )
-        st.session_state["file_context"] = file_context
-        st.session_state["image_data"] = image_data
-        st.session_state["csv_info"] = csv_info
-        st.session_state["audio_transcription"] = audio_transcription
-        st.session_state["ocr_result"] = ocr_result
-
-        # Display file info
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.success(f"✓ Attached: **{uploaded_file.name}**")
-        with col2:
-            if st.button("Remove", key="remove_file"):
-                st.session_state["uploaded_file"] = None
-                st.session_state["file_context"] = ""
-                st.session_state["image_data"] = None
-                st.session_state["csv_info"] = None
-                st.session_state["audio_transcription"] = None
-                st.session_state["ocr_result"] = None
-                st.rerun()
+    job = st.session_state.get("attachment_job")
 
-        # Display previews
-        if image_data:
-            st.image(image_data, caption=uploaded_file.name, width=300)
-            if ocr_result:
-                st.info(f"📊 **OCR Confidence:** {ocr_result['confidence']:.1%}")
-                with st.expander("View extracted text"):
-                    st.text(ocr_result['text'])
+    if uploaded_file is None:
+        # File removed from the uploader: drop any pending work for it
+        if job is not None:
+            job["future"].cancel()
+            del st.session_state["attachment_job"]
+        st.session_state["attachment_key"] = None
+        return
 
-        if csv_info:
-            st.info("📊 **CSV Schema Detected:**")
-            schema_text = ""
-            for col in csv_info["schema"]:
-                schema_text += f"• **{col['name']}** ({col['type']})\n"
-            st.markdown(schema_text)
-            st.caption("💡 You can now ask questions about this data!")
+    file_type = uploaded_file.type
+
+    # Show OCR option for images only
+    if file_type in ["image/png", "image/jpeg", "image/jpg", "image/webp"]:
+        ocr_available = check_server_health(OCR_SERVER_URL, "OCR")
+
+        if ocr_available:
+            st.session_state["image_processing_mode"] = st.radio(
+                "Image Processing Mode:",
+                options=["vision", "ocr"],
+                format_func=lambda x: {
+                    "vision": "🔷 Gemini Vision (AI understands image)",
+                    "ocr": "📄 OCR (Extract text only)"
+                }[x],
+                horizontal=True,
+                key="image_mode_selector"
+            )
+        else:
+            st.warning("⚠️ OCR server offline. Using Gemini Vision.")
+            st.session_state["image_processing_mode"] = "vision"
+
+    # Process each (file, mode) once, in the background; reruns reuse the running job
+    ocr_mode = st.session_state.get("image_processing_mode", "vision")
+    job_key = (getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size), ocr_mode)
+
+    if job is not None and job["key"] != job_key:
+        job["future"].cancel()
+        job = None
+    if job is None and st.session_state.get("attachment_key") != job_key:
+        clear_attachment()
+        job = submit_attachment_job(uploaded_file, job_key, ocr_mode)
+
+    if job is not None:
+        if not job["future"].done():
+            display_attachment_progress()
+            return
+        collect_attachment_job(job, uploaded_file)
+
+    if st.session_state["uploaded_file"] is None:
+        # Processing failed, attachment was removed, or it was sent with the last message
+        return
 
-        if audio_transcription:
-            st.info("🎵 **Audio Transcription:**")
-            st.text(audio_transcription)
+    image_data = st.session_state["image_data"]
+    csv_info = st.session_state["csv_info"]
+    audio_transcription = session_memory.load(st.session_state["audio_transcription"])
+    ocr_result = st.session_state["ocr_result"]
+
+    # Display file info
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.success(f"✓ Attached: **{uploaded_file.name}**")
+    with col2:
+        if st.button("Remove", key="remove_file"):
+            clear_attachment()
+            st.rerun()
+
+    # Display previews
+    if image_data:
+        st.image(image_data, caption=uploaded_file.name, width=300)
+        payload = session_memory.load(st.session_state["vision_payload"])
+        if payload:
+            st.caption(
+                f"Sent to Gemini as {payload['sent_size'][0]}×{payload['sent_size'][1]} {payload['mime_type']}, "
+                f"{len(payload['data']) / 1024:.0f} KB (original {payload['original_bytes'] / 1024:.0f} KB)"
+            )
+        if ocr_result:
+            st.info(f"📊 **OCR Confidence:** {ocr_result['confidence']:.1%}")
+            with st.expander("View extracted text"):
+                st.text(ocr_result['text'])
+
+    if csv_info:
+        st.info("📊 **CSV Schema Detected:**")
+        schema_text = ""
+        for col in csv_info["schema"]:
+            schema_text += f"• **{col['name']}** ({col['type']})\n"
+        st.markdown(schema_text)
+        st.caption("💡 You can now ask questions about this data!")
+
+    if audio_transcription:
+        st.info("🎵 **Audio Transcription:**")
+        st.text(audio_transcription)
 
 
 def display_voice_input():
@@ -399,30 +971,41 @@ def display_voice_input():
     if st.session_state.get("show_audio_recorder"):
         st.markdown("### 🎙️ Record Voice Input")
 
-        # Check Whisper server status
+        # Check speech-to-text server status
         whisper_available = check_server_health(WHISPER_SERVER_URL, "Whisper")
+        vosk_available = check_server_health(VOSK_SERVER_URL, "Vosk")
 
-        if not whisper_available:
-            st.error("⚠️ Whisper server is offline! Please start it: `python whisper_model/whisper_server.py`")
+        if not whisper_available and not vosk_available:
+            st.error("⚠️ Speech-to-text servers are offline! Please start one: "
+                     "`python whisper_model/whisper_server.py` or `python vosk_server.py`")
             if st.button("Cancel"):
                 st.session_state["show_audio_recorder"] = False
                 st.rerun()
             return
 
-        st.markdown("**Recording with Whisper Server**")
+        high_accuracy = st.checkbox(
+            "High accuracy (always use Whisper)",
+            disabled=not whisper_available,
+            help="Short clips are normally transcribed by the faster Vosk server"
+        )
         audio_value = st.audio_input("Click to record")
 
         if audio_value:
-            with st.spinner("Transcribing with Whisper Server..."):
+            with st.spinner("Transcribing..."):
                 try:
-                    # Transcribe via Whisper server
-                    transcription = transcribe_audio_via_server(audio_value)
+                    # Short commands go to Vosk, long or high-accuracy audio to Whisper
+                    # Voice input is interactive: it jumps ahead of queued bulk files
+                    transcription, engine = transcribe_audio(
+                        audio_value,
+                        priority="interactive",
+                        accuracy="high" if high_accuracy else "normal"
+                    )
 
                     # Store transcription
                     st.session_state["transcribed_text"] = transcription
                     st.session_state["show_audio_recorder"] = False
 
-                    st.success(f"✅ Transcribed: {transcription}")
+                    st.success(f"✅ Transcribed ({engine}): {transcription}")
                     st.rerun()
 
                 except Exception as e:
@@ -438,29 +1021,46 @@ def display_voice_input():
 # RESPONSE GENERATION
 # ============================================================================
 
-def generate_sql_query(user_question, csv_schema):
+def generate_sql_query(user_question, csv_schema, csv_stats=None):
     """Generate SQL query using Gemini for CSV Q&A"""
     try:
         schema_text = ", ".join([f"{col['name']} ({col['type']})" for col in csv_schema])
 
+        # Value ranges, categories and sample rows help Gemini get literals right first time
+        stats_text = ""
+        if csv_stats:
+            stats_text = f"\nColumn statistics:\n{csv_profile.format_stats_for_prompt(csv_stats)}\n"
+
         prompt = f"""You are a SQL expert for DuckDB.
 
 The user has uploaded a CSV with these columns:
 {schema_text}
-
+{stats_text}
 User question: "{user_question}"
 
 Write a DuckDB SQL query to answer this question. Use "csv_data" as the table name.
 Return ONLY the SQL query, no explanation or markdown formatting."""
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
+        # The prompt fully determines the query, so it can be served from the cache
+        use_cache = st.session_state.get("use_response_cache", False)
+        if use_cache:
+            cache_key = response_cache.make_key(GEMINI_MODEL, "generate_sql_query", [prompt])
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        client = get_gemini_client()
+        response = limiter.call(GEMINI_MODEL, lambda: client.models.generate_content(
+            model=GEMINI_MODEL,
             contents=prompt
-        )
+        ))
 
         sql_query = response.text.strip()
         sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
 
+        if use_cache:
+            response_cache.put(cache_key, GEMINI_MODEL, sql_query)
+
         return sql_query
 
     except Exception as e:
@@ -485,27 +1085,31 @@ def format_query_results(sql_query, columns, rows):
 
 
 def get_or_create_chat_session(session_id, system_prompt):
-    if "gemini_chat" in st.session_state:
-        return st.session_state["gemini_chat"]
+    chat = memory.get_chat(session_id)
+    if chat is not None:
+        return chat
+
+    from google.genai import types
 
-    history = db_utils.load_history(session_id)
+    # Chats of idle sessions are evicted, so rebuilding must be cheap: the saved
+    # history is passed in directly instead of being replayed through the API
+    history = []
+    for row in db_utils.load_history(session_id):
+        session_id_db, timestamp, role, content_text, has_attachment = row
+        history.append(types.Content(
+            role="user" if role == "user" else "model",
+            parts=[types.Part.from_text(text=content_text)]
+        ))
 
-    chat = client.chats.create(
-        model="gemini-2.5-flash",
+    chat = get_gemini_client().chats.create(
+        model=GEMINI_MODEL,
         config=types.GenerateContentConfig(
             system_instruction=system_prompt
-        )
+        ),
+        history=history
     )
 
-    if history:
-        history = history[:-1]
-
-    for row in history:
-        session_id_db, timestamp, role, content_text, has_attachment = row
-        if role == "user":
-            chat.send_message(content_text)
-
-    st.session_state["gemini_chat"] = chat
+    memory.set_chat(session_id, chat)
 
     return chat
 
@@ -515,7 +1119,16 @@ def generate_response(user_message):
         # CSV Q&A mode
         if st.session_state.get("csv_info"):
             csv_info = st.session_state["csv_info"]
-            sql_query = generate_sql_query(user_message, csv_info["schema"])
+            upload_store.touch_blob(csv_info["path"])  # keeps it from quota eviction while in use
+
+            # Simple profile questions are answered locally from cached stats
+            if csv_info.get("stats"):
+                profile_answer = csv_profile.answer_profile_question(user_message, csv_info["stats"])
+                if profile_answer:
+                    return profile_answer
+
+            with tracing.span("generate_sql_query"):
+                sql_query = generate_sql_query(user_message, csv_info["schema"], csv_info.get("stats"))
             query_result = db_utils.execute_csv_query(csv_info["path"], sql_query)
 
             if query_result["success"]:
@@ -529,21 +1142,42 @@ def generate_response(user_message):
                 return f"❌ Query execution failed: {query_result['error']}\n\n**Generated SQL:**\n```sql\n{sql_query}\n```"
 
         # Regular chat mode
-        chat = get_or_create_chat_session(
-            st.session_state["session_id"],
-            st.session_state["system_prompt"]
-        )
-
         message_parts = [user_message]
 
         if st.session_state["file_context"]:
-            message_parts.append(st.session_state["file_context"])
+            message_parts.append(session_memory.load(st.session_state["file_context"]))
 
         # Only add image if using vision mode
-        if st.session_state["image_data"] and st.session_state.get("image_processing_mode") == "vision":
-            message_parts.append(st.session_state["image_data"])
-
-        response = chat.send_message(message_parts)
+        if st.session_state["vision_payload"] and st.session_state.get("image_processing_mode") == "vision":
+            from google.genai import types
+
+            payload = session_memory.load(st.session_state["vision_payload"])
+            message_parts.append(types.Part.from_bytes(data=payload["data"], mime_type=payload["mime_type"]))
+
+        # Only the first turn of a session is stateless enough to cache; once there
+        # is history the answer depends on it, so the cache is bypassed
+        cache_key = None
+        if (st.session_state.get("use_response_cache")
+                and not st.session_state["messages"]
+                and memory.get_chat(st.session_state["session_id"]) is None):
+            cache_key = response_cache.make_key(GEMINI_MODEL, st.session_state["system_prompt"], message_parts)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                # No chat object is created: the next turn rebuilds it from the saved history
+                return cached
+
+        with tracing.span("get_or_create_chat_session"):
+            chat = get_or_create_chat_session(
+                st.session_state["session_id"],
+                st.session_state["system_prompt"]
+            )
+
+        with tracing.span("chat.send_message"):
+            response = limiter.call(GEMINI_MODEL, lambda: chat.send_message(message_parts))
+        memory.refresh_chat_size(st.session_state["session_id"])
+
+        if cache_key:
+            response_cache.put(cache_key, GEMINI_MODEL, response.text)
 
         return response.text
 
@@ -554,6 +1188,8 @@ def generate_response(user_message):
 
 
 def handle_user_input(prompt):
+    # The turn starts here: page rendering before the message is not part of its latency
+    tracing.start_turn()
     has_attachment = st.session_state["uploaded_file"] is not None
     attachment_name = st.session_state["uploaded_file"].name if has_attachment else ""
 
@@ -583,13 +1219,17 @@ def handle_user_input(prompt):
             has_attachment=False
         )
 
+        # Record per-stage latency for this turn (attachment work ran in the
+        # background before the message was sent, so it is not part of "total")
+        if has_attachment and st.session_state.get("attachment_ms") is not None:
+            tracing.record("process_file", st.session_state["attachment_ms"])
+        trace = tracing.finish_turn()
+        if trace:
+            db_utils.save_turn_trace(st.session_state["session_id"], trace)
+            st.session_state["last_turn_trace"] = trace
+
         # Clear attachments
-        st.session_state["uploaded_file"] = None
-        st.session_state["file_context"] = ""
-        st.session_state["image_data"] = None
-        st.session_state["csv_info"] = None
-        st.session_state["audio_transcription"] = None
-        st.session_state["ocr_result"] = None
+        clear_attachment()
 
         # Clear messages to force reload
         if "messages" in st.session_state:
@@ -598,16 +1238,33 @@ def handle_user_input(prompt):
         st.rerun()
 
     except Exception as e:
+        tracing.finish_turn()  # discard the failed turn's trace
         st.error(f"Failed to generate response. Nothing was saved to database.")
-        st.session_state["uploaded_file"] = None
-        st.session_state["file_context"] = ""
-        st.session_state["image_data"] = None
-        st.session_state["csv_info"] = None
-        st.session_state["audio_transcription"] = None
-        st.session_state["ocr_result"] = None
+        clear_attachment()
         st.stop()
 
 
+def register_session_memory():
+    """
+    Register this session with the process-wide memory accounting
+
+    The runtime's thread-safe copy of this session's state is registered too, so
+    other sessions' runs can spill it once this tab goes idle, and the
+    runtime is asked whether the tab still exists before its spill dir is deleted.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    shared_state, is_active = None, None
+    if ctx is not None and Runtime.exists():
+        runtime = Runtime.instance()
+        streamlit_session_id = ctx.session_id
+        shared_state = ctx.session_state
+        is_active = lambda: runtime.is_active_session(streamlit_session_id)
+    return memory.update(st.session_state["session_id"], st.session_state, shared_state, is_active)
+
+
 # ============================================================================
 # MAIN APP
 # ============================================================================
@@ -628,3 +1285,6 @@ if st.session_state.get("transcribed_text"):
     handle_user_input(prompt)
 elif prompt := st.chat_input("Type your message here..."):
     handle_user_input(prompt)
+
+# Account for this session's memory; spills over-budget attachments and evicts idle sessions
+st.session_state["memory_footprint"] = register_session_memory()
@@ -0,0 +1,31 @@
+"""Benchmarks for app_integrated helpers (stub Gemini client, no network)"""
+import pytest
+
+from conftest import EMPLOYEES_CSV, FakeUpload, make_text_pdf
+
+
+@pytest.mark.parametrize("rows", [10**2, 10**4, 10**5])
+def bench_format_query_results(benchmark, app, rows):
+    columns = ["department", "employee_name", "salary", "hire_date"]
+    result_rows = [("Engineering", f"Employee {i}", 100000 + i, "2020-01-15") for i in range(rows)]
+    text = benchmark(app.format_query_results, "SELECT * FROM csv_data", columns, result_rows)
+    assert f"Found {rows} row(s)" in text
+
+
+@pytest.mark.parametrize("pages", [1, 20, 200])
+def bench_process_file_pdf(benchmark, app, pages):
+    data = make_text_pdf(pages)
+
+    def process():
+        upload = FakeUpload(data, "report.pdf", "application/pdf")
+        return app.process_file(upload, "session-bench")
+
+    file_text_context = benchmark(process)[0]
+    assert f"Page {pages - 1} line 0" in file_text_context
+
+
+def bench_generate_sql_query(benchmark, app, db_utils):
+    stats = db_utils.compute_csv_stats(EMPLOYEES_CSV)
+    schema = [{"name": col["name"], "type": col["type"]} for col in stats["columns"]]
+    sql_query = benchmark(app.generate_sql_query, "Average salary by department?", schema, stats)
+    assert sql_query.startswith("SELECT")
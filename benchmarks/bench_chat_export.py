@@ -0,0 +1,81 @@
+"""Bulk export/import of conversations, and the Parquet archive behind it"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import chat_archive
+from conftest import populate_chats
+
+
+@pytest.fixture
+def archived_chats(db_utils, fresh_db, tmp_path, monkeypatch):
+    """Session a is hot, b/c/d are archived; b also got a message after archiving"""
+    monkeypatch.setattr(chat_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    now = datetime.now()
+    old = now - timedelta(days=200)
+    for session_id in "abcd":
+        start = now if session_id == "a" else old
+        for i, role in enumerate(("user", "assistant", "user")):
+            db_utils.save_message(session_id, start + timedelta(seconds=i), role, f"{session_id} {i}", False)
+
+    assert chat_archive.archive_inactive_sessions()["archived_sessions"] == 3
+    db_utils.save_message("b", now, "user", "b late", False)
+    return fresh_db
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def bench_export_merges_hot_and_archived_rows(db_utils, archived_chats, tmp_path):
+    path = str(tmp_path / "chats.jsonl")
+    stats = db_utils.export_messages(path, batch_size=2)
+
+    records = read_jsonl(path)
+    keys = [(record["session_id"], record["timestamp"]) for record in records]
+    assert keys == sorted(keys)
+    assert stats["messages"] == 13
+    assert stats["sessions"] == 4
+
+
+def bench_reimport_of_archived_sessions_is_skipped(db_utils, archived_chats, tmp_path):
+    path = str(tmp_path / "chats.jsonl")
+    db_utils.export_messages(path)
+
+    stats = db_utils.import_messages(path, batch_size=5)
+    assert stats["messages"] == 0
+    assert stats["skipped"] == 13
+
+    db_utils.export_messages(path, session_ids=["b"])
+    assert len(read_jsonl(path)) == 4
+
+
+def bench_restore_matches_role_as_well_as_timestamp(db_utils, archived_chats):
+    # An interrupted archive run left the user message hot; its same-second reply was archived
+    moment = datetime.now() - timedelta(days=300)
+    db_utils.save_message("e", moment, "user", "e question", False)
+    db_utils.save_message("e", moment, "assistant", "e answer", False)
+    assert chat_archive.archive_inactive_sessions()["archived_sessions"] == 1
+    db_utils.save_message("e", moment, "user", "e question", False)
+
+    assert chat_archive.restore_session("e") == 1
+    assert sorted(row[2] for row in db_utils.load_history("e")) == ["assistant", "user"]
+
+
+def bench_compact_keeps_other_archived_sessions(db_utils, archived_chats):
+    chat_archive.restore_session("c")
+    assert chat_archive.compact()["partitions_rewritten"] == 1
+
+    assert chat_archive.is_archived("d")
+    assert [row[3] for row in chat_archive.load_archived_session("d")] == ["d 0", "d 1", "d 2"]
+    assert not chat_archive.is_archived("c")
+
+
+@pytest.mark.parametrize("rows", [10**5])
+def bench_export_jsonl(benchmark, db_utils, fresh_db, tmp_path, rows):
+    populate_chats(fresh_db, rows)
+    path = str(tmp_path / "chats.jsonl")
+    stats = benchmark(db_utils.export_messages, path)
+    assert stats["messages"] == rows
@@ -0,0 +1,32 @@
+"""CSV schema, statistics and query benchmarks on scaled-up test_employees.csv"""
+import pytest
+
+from conftest import make_employees_csv
+
+CSV_SIZES = [10**3, 10**5, 10**6]
+
+
+@pytest.fixture(scope="module", params=CSV_SIZES)
+def employees_csv(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp("csv") / f"employees_{request.param}.csv"
+    return str(make_employees_csv(path, request.param))
+
+
+def bench_get_csv_schema(benchmark, db_utils, employees_csv):
+    result = benchmark(db_utils.get_csv_schema, employees_csv)
+    assert result["success"]
+
+
+def bench_compute_csv_stats(benchmark, db_utils, employees_csv):
+    stats = benchmark(db_utils.compute_csv_stats, employees_csv)
+    assert stats["columns"]
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT department, AVG(salary) FROM csv_data GROUP BY department",
+    "SELECT * FROM csv_data WHERE salary > 100000 ORDER BY salary DESC LIMIT 10",
+    "SELECT COUNT(DISTINCT employee_name) FROM csv_data",
+], ids=["group_by", "filter_sort", "count_distinct"])
+def bench_execute_csv_query(benchmark, db_utils, employees_csv, sql_query):
+    result = benchmark(db_utils.execute_csv_query, employees_csv, sql_query)
+    assert result["success"]
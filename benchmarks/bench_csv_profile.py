@@ -0,0 +1,41 @@
+"""Profile questions answered from cached CSV stats, and the ones that must go to SQL"""
+import pytest
+
+import csv_profile
+from conftest import EMPLOYEES_CSV
+
+
+@pytest.fixture(scope="module")
+def employees_stats(db_utils):
+    return db_utils.compute_csv_stats(EMPLOYEES_CSV)
+
+
+@pytest.mark.parametrize("question", [
+    "What is the average salary in Sales?",
+    "What is the average salary for engineers?",
+    "highest salary among Engineering employees",
+    "max salary in 2020",
+    "how many rows have salary over 100000?",
+    "who has the highest salary?",
+    "average salary by department",
+    "what is the average hire date?",
+])
+def bench_filtered_questions_need_sql(employees_stats, question):
+    assert csv_profile.answer_profile_question(question, employees_stats) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the average salary?", "Average **salary**"),
+    ("What's the highest salary?", "Maximum **salary**"),
+    ("What is the earliest hire date?", "Minimum **hire_date**"),
+    ("How many rows are in the CSV?", "row(s)"),
+    ("How many unique departments are there?", "distinct value(s)"),
+])
+def bench_whole_table_questions_use_stats(benchmark, employees_stats, question, expected):
+    answer = benchmark(csv_profile.answer_profile_question, question, employees_stats)
+    assert expected in answer
+
+
+def bench_date_average_falls_through_to_sql(benchmark, employees_stats):
+    # SUMMARIZE gives DATE columns a timestamp-string avg; it must not be parsed as a number
+    assert benchmark(csv_profile.answer_profile_question, "What is the average hire date?", employees_stats) is None
@@ -0,0 +1,24 @@
+"""Chat storage benchmarks at 10^3 - 10^6 existing rows"""
+from datetime import datetime
+
+import pytest
+
+from conftest import populate_chats
+
+TABLE_SIZES = [10**3, 10**4, 10**5, 10**6]
+
+
+@pytest.mark.parametrize("rows", TABLE_SIZES)
+def bench_save_message(benchmark, db_utils, fresh_db, rows):
+    populate_chats(fresh_db, rows)
+    benchmark(
+        db_utils.save_message,
+        "session-bench", datetime.now(), "user", "How many employees are in Sales?", False
+    )
+
+
+@pytest.mark.parametrize("rows", TABLE_SIZES)
+def bench_load_history(benchmark, db_utils, fresh_db, rows):
+    populate_chats(fresh_db, rows)
+    history = benchmark(db_utils.load_history, "session-7")
+    assert len(history) == rows // 1000
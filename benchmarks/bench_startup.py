@@ -0,0 +1,60 @@
+"""Cold-start budget: module imports and the first render of app_integrated"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+
+# Importing app_integrated runs the script in Streamlit's bare mode, i.e. one
+# full first render. Override on slow machines.
+APP_START_BUDGET_SECONDS = float(os.getenv("APP_START_BUDGET_SECONDS", "1.25"))
+DB_UTILS_IMPORT_BUDGET_SECONDS = float(os.getenv("DB_UTILS_IMPORT_BUDGET_SECONDS", "0.1"))
+RUNS = 3
+
+# Only needed once a user sends a message or uploads a file
+DEFERRED_MODULES = ("google.genai", "pypdf", "PIL")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}}))
+"""
+
+
+def import_in_fresh_process(module, cwd):
+    """Import a module in a new interpreter; returns (seconds, loaded module names)"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    env.pop("GEMINI_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe["seconds"], set(probe["modules"])
+
+
+def timed_imports(benchmark, module, cwd):
+    """
+    Import a module in RUNS fresh interpreters under the benchmark fixture
+
+    The saved timings (interpreter start included) track cold start in the
+    baseline; the budgets below apply to the import itself, best of RUNS.
+    """
+    probes = []
+    benchmark.pedantic(lambda: probes.append(import_in_fresh_process(module, cwd)), rounds=RUNS, iterations=1)
+    return min(probes)
+
+
+def bench_db_utils_import(benchmark, tmp_path):
+    seconds, modules = timed_imports(benchmark, "db_utils", tmp_path)
+    assert "duckdb" not in modules
+    assert not os.path.exists(tmp_path / "local_chat.db")
+    assert seconds < DB_UTILS_IMPORT_BUDGET_SECONDS
+
+
+def bench_app_first_render(benchmark, tmp_path):
+    seconds, modules = timed_imports(benchmark, "app_integrated", tmp_path)
+    assert not modules & set(DEFERRED_MODULES)
+    assert seconds < APP_START_BUDGET_SECONDS
@@ -0,0 +1,189 @@
+"""Shared fixtures for the offline benchmark suite (no network, stub Gemini client)"""
+import csv
+import io
+import logging
+import os
+import sys
+
+import duckdb
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# No background archive/GC runs against the benchmark databases
+os.environ.setdefault("MAINTENANCE_INTERVAL_HOURS", "0")
+# The stub client answers instantly; with the default 60/min token bucket the
+# Gemini benchmarks would measure the limiter's sleep instead of the app code
+os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "1000000000")
+
+EMPLOYEES_CSV = os.path.join(REPO_ROOT, "test_employees.csv")
+
+
+# ============================================================================
+# STUBS
+# ============================================================================
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubChat:
+    def send_message(self, message):
+        return StubResponse("stub reply")
+
+
+class StubModels:
+    def generate_content(self, model, contents, config=None):
+        return StubResponse("```sql\nSELECT department, AVG(salary) FROM csv_data GROUP BY department\n```")
+
+
+class StubChats:
+    def create(self, model, config=None, history=None):
+        return StubChat()
+
+
+class StubGeminiClient:
+    """Offline stand-in for google.genai.Client"""
+
+    def __init__(self, *args, **kwargs):
+        self.models = StubModels()
+        self.chats = StubChats()
+
+
+class FakeUpload(io.BytesIO):
+    """Minimal stand-in for Streamlit's UploadedFile"""
+
+    def __init__(self, data, name, file_type):
+        super().__init__(data)
+        self.name = name
+        self.type = file_type
+        self.size = len(data)
+
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def make_employees_csv(path, rows):
+    """Scale test_employees.csv up to the requested number of rows"""
+    with open(EMPLOYEES_CSV, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        seed_rows = list(reader)
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            department, name, salary, hire_date = seed_rows[i % len(seed_rows)]
+            writer.writerow([department, f"{name} {i}", int(salary) + i % 1000, hire_date])
+    return path
+
+
+def make_text_pdf(pages, lines_per_page=40):
+    """Build a simple multi-page PDF with extractable text (no extra dependencies)"""
+    objects = []
+    page_ids = []
+    font_id = 3
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    add(b"")  # Pages placeholder, filled in below
+    add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for page in range(pages):
+        lines = [
+            f"BT /F1 10 Tf 40 {800 - 18 * n} Td (Page {page} line {n}: quarterly revenue grew in every region) Tj ET"
+            for n in range(lines_per_page)
+        ]
+        stream = "\n".join(lines).encode()
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref_offset = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b"%010d 00000 n \n" % offset)
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return output.getvalue()
+
+
+def populate_chats(connection, rows, sessions=1000):
+    """Bulk-insert synthetic chat rows spread over many sessions"""
+    connection.execute(
+        f"""INSERT INTO chats
+            SELECT 'session-' || (i % {sessions}),
+                   TIMESTAMP '2025-01-01' + to_seconds(i),
+                   CASE WHEN i % 2 = 0 THEN 'user' ELSE 'assistant' END,
+                   'message ' || i,
+                   i % 10 = 0
+            FROM range({rows}) t(i)"""
+    )
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture(scope="session")
+def workdir(tmp_path_factory):
+    """Run everything in a scratch directory so local_chat.db and uploads/ stay untouched"""
+    path = tmp_path_factory.mktemp("bench")
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def db_utils(workdir):
+    import db_utils
+    return db_utils
+
+
+@pytest.fixture
+def fresh_db(db_utils, monkeypatch):
+    """Point db_utils at an empty in-memory database"""
+    connection = duckdb.connect(":memory:")
+    db_utils.create_tables(connection)
+    monkeypatch.setattr(db_utils, "connection", connection)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="session")
+def app(workdir):
+    """Import app_integrated with the Gemini client replaced by a stub"""
+    from google import genai
+
+    # The client is created on the first Gemini call, so the stub stays in place for the whole run
+    original_client = genai.Client
+    genai.Client = StubGeminiClient
+    try:
+        import app_integrated
+
+        # Outside `streamlit run`, every st.session_state access logs a
+        # "missing ScriptRunContext" warning; don't time the logging
+        for name in list(logging.root.manager.loggerDict):
+            if name.startswith("streamlit"):
+                logging.getLogger(name).setLevel(logging.ERROR)
+        yield app_integrated
+    finally:
+        genai.Client = original_client
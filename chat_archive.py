@@ -0,0 +1,343 @@
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import db_utils
+
+# Hot/cold retention for chat history.
+#
+# Sessions with no messages for DEFAULT_INACTIVE_DAYS are moved out of the
+# `chats` table into Parquet files partitioned by the date of their last
+# activity: archive/chats/date=YYYY-MM-DD/part-<id>.parquet. The
+# archived_sessions table records which file holds each session, so reads
+# never have to scan the archive. Loading an archived session restores it to
+# the hot table; compaction later rewrites partitions without it and merges
+# small files.
+#
+# Readers (restore, export) hold a shared lock on ARCHIVE_DIR/.lock from
+# looking up a session's file until they are done reading it; archiving and
+# compaction take it exclusively, so no file is deleted while being read.
+ARCHIVE_DIR = os.path.join("archive", "chats")
+DEFAULT_INACTIVE_DAYS = 90
+SESSION_BATCH_SIZE = 500  # sessions per IN (...) clause
+
+CHAT_COLUMNS = "session_id, timestamp, role, content_text, has_attachment"
+
+
+def _partition_dir(partition_date):
+    return os.path.join(ARCHIVE_DIR, f"date={partition_date}")
+
+
+def _placeholders(values):
+    return ", ".join("?" for _ in values)
+
+
+@contextmanager
+def archive_lock(exclusive=False):
+    """
+    Shared (readers) or exclusive (archive/compact) lock on the archive files
+
+    A file lock, so it also covers other app processes and the CLI. Without an
+    archive directory there is nothing to read, and readers skip the lock.
+    """
+    if not exclusive and not os.path.isdir(ARCHIVE_DIR):
+        yield
+        return
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(ARCHIVE_DIR, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_parquet(rows, path):
+    """Write chat rows to a Parquet file atomically (temp file + rename)"""
+    analytics = db_utils.get_analytics_connection()
+    table = f"archive_rows_{uuid.uuid4().hex}"
+    temp_path = f"{path}.tmp"
+
+    analytics.execute(
+        f"CREATE TEMP TABLE {table} (session_id VARCHAR, timestamp TIMESTAMP, role VARCHAR, content_text VARCHAR, has_attachment BOOLEAN)"
+    )
+    try:
+        pyarrow = db_utils._import_pyarrow()
+        if pyarrow is None or not rows:
+            analytics.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?)", rows)
+        else:
+            # Row-by-row executemany is slow on DuckDB; insert the rows as one Arrow table
+            batch = pyarrow.Table.from_arrays(
+                [pyarrow.array(column) for column in zip(*rows)], names=list(db_utils.MESSAGE_COLUMNS)
+            )
+            analytics.register(f"{table}_batch", batch)
+            try:
+                analytics.execute(f"INSERT INTO {table} SELECT * FROM {table}_batch")
+            finally:
+                analytics.unregister(f"{table}_batch")
+        analytics.execute(
+            f"COPY (SELECT * FROM {table} ORDER BY session_id, timestamp) TO '{temp_path}' (FORMAT PARQUET)"
+        )
+    finally:
+        analytics.execute(f"DROP TABLE {table}")
+    os.replace(temp_path, path)
+
+
+def _read_parquet(path, session_ids=None):
+    """Chat rows from an archive file, optionally limited to some sessions"""
+    analytics = db_utils.get_analytics_connection()
+    query = f"SELECT {CHAT_COLUMNS} FROM read_parquet('{path}')"
+    params = ()
+    if session_ids is not None:
+        query += f" WHERE session_id IN ({_placeholders(session_ids)})"
+        params = tuple(session_ids)
+    return analytics.execute(query + " ORDER BY session_id, timestamp", params).fetchall()
+
+
+def archive_inactive_sessions(inactive_days=DEFAULT_INACTIVE_DAYS):
+    """
+    Move sessions inactive for `inactive_days` from the hot table to Parquet
+
+    Returns:
+        dict: Counts of archived sessions, messages and files written
+    """
+    with archive_lock(exclusive=True):
+        return _archive_inactive_sessions(inactive_days)
+
+
+def _archive_inactive_sessions(inactive_days):
+    connection = db_utils.get_db_connection()
+    cutoff = datetime.now() - timedelta(days=inactive_days)
+
+    inactive = connection.execute(
+        """SELECT session_id, MAX(timestamp) AS last_activity, COUNT(*) AS message_count
+           FROM chats GROUP BY session_id HAVING MAX(timestamp) < ?""",
+        (cutoff,)
+    ).fetchall()
+
+    by_date = {}
+    for session_id, last_activity, message_count in inactive:
+        if isinstance(last_activity, str):
+            # SQLite drops the column type on aggregates
+            last_activity = datetime.fromisoformat(last_activity)
+        by_date.setdefault(last_activity.date().isoformat(), []).append((session_id, last_activity, message_count))
+
+    archived_sessions = 0
+    archived_messages = 0
+    files_written = 0
+
+    for partition_date, sessions in sorted(by_date.items()):
+        os.makedirs(_partition_dir(partition_date), exist_ok=True)
+        for start in range(0, len(sessions), SESSION_BATCH_SIZE):
+            batch = sessions[start:start + SESSION_BATCH_SIZE]
+            session_ids = [session_id for session_id, _, _ in batch]
+
+            rows = connection.execute(
+                f"SELECT {CHAT_COLUMNS} FROM chats WHERE session_id IN ({_placeholders(session_ids)})",
+                tuple(session_ids)
+            ).fetchall()
+            path = os.path.join(_partition_dir(partition_date), f"part-{uuid.uuid4().hex}.parquet")
+            _write_parquet(rows, path)
+            files_written += 1
+
+            # Index first, then drop hot rows: a crash in between leaves
+            # duplicates (restored harmlessly), never lost messages
+            now = datetime.now()
+            for session_id, last_activity, message_count in batch:
+                connection.execute("DELETE FROM archived_sessions WHERE session_id = ?", (session_id,))
+                connection.execute(
+                    "INSERT INTO archived_sessions VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, partition_date, path, message_count, last_activity, now)
+                )
+                # Only rows that were archived: a message arriving meanwhile stays hot
+                connection.execute(
+                    "DELETE FROM chats WHERE session_id = ? AND timestamp <= ?",
+                    (session_id, last_activity)
+                )
+            archived_sessions += len(batch)
+            archived_messages += len(rows)
+
+    return {
+        "archived_sessions": archived_sessions,
+        "archived_messages": archived_messages,
+        "files_written": files_written
+    }
+
+
+def is_archived(session_id):
+    connection = db_utils.get_db_connection()
+    return connection.execute(
+        "SELECT 1 FROM archived_sessions WHERE session_id = ?", (session_id,)
+    ).fetchone() is not None
+
+
+def load_archived_session(session_id):
+    """Rows of an archived session, read from its Parquet file (empty if not archived)"""
+    connection = db_utils.get_db_connection()
+    with archive_lock():
+        entry = connection.execute(
+            "SELECT path FROM archived_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if entry is None:
+            return []
+        return _read_parquet(entry[0], [session_id])
+
+
+def restore_session(session_id):
+    """
+    Move an archived session back into the hot table
+
+    The archive file keeps its copy until the next compaction.
+
+    Returns:
+        int: Number of messages restored
+    """
+    rows = load_archived_session(session_id)
+    if not rows:
+        return 0
+
+    connection = db_utils.get_db_connection()
+    # Skip rows still present in the hot table (e.g. after an interrupted archive
+    # run); a user message and its reply can share a timestamp, so match the role too
+    existing = set(connection.execute(
+        "SELECT timestamp, role FROM chats WHERE session_id = ?", (session_id,)
+    ).fetchall())
+    restored = [row for row in rows if (row[1], row[2]) not in existing]
+    if restored:
+        connection.executemany("INSERT INTO chats VALUES (?, ?, ?, ?, ?)", restored)
+    connection.execute("DELETE FROM archived_sessions WHERE session_id = ?", (session_id,))
+    return len(restored)
+
+
+def compact(min_file_rows=10000):
+    """
+    Rewrite each partition as one file holding only still-archived sessions
+
+    A partition is rewritten when it has several files, a file smaller than
+    min_file_rows, or rows of sessions that were restored since. Files no
+    longer referenced by any session are deleted.
+
+    Returns:
+        dict: Counts of partitions rewritten and files removed
+    """
+    if not os.path.isdir(ARCHIVE_DIR):
+        return {"partitions_rewritten": 0, "files_removed": 0}
+    with archive_lock(exclusive=True):
+        return _compact(min_file_rows)
+
+
+def _compact(min_file_rows):
+    connection = db_utils.get_db_connection()
+    rewritten = 0
+    removed = 0
+
+    for partition in sorted(os.listdir(ARCHIVE_DIR)):
+        if not partition.startswith("date="):
+            continue
+        partition_date = partition[len("date="):]
+        directory = _partition_dir(partition_date)
+        files = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet"))
+
+        indexed = connection.execute(
+            "SELECT session_id, path, message_count FROM archived_sessions WHERE partition_date = ?",
+            (partition_date,)
+        ).fetchall()
+        referenced = {path for _, path, _ in indexed}
+        indexed_rows = sum(message_count for _, _, message_count in indexed)
+
+        stale = [path for path in files if path not in referenced]
+        if not indexed:
+            for path in stale:
+                os.remove(path)
+                removed += 1
+            if not os.listdir(directory):
+                os.rmdir(directory)
+            continue
+
+        needs_rewrite = len(referenced) > 1 or indexed_rows < min_file_rows and len(files) > 1
+        if not needs_rewrite:
+            # Single live file: it may still hold rows of restored sessions
+            (path,) = referenced
+            total_rows = db_utils.get_analytics_connection().execute(
+                f"SELECT COUNT(*) FROM read_parquet('{path}')"
+            ).fetchone()[0]
+            needs_rewrite = total_rows != indexed_rows
+
+        if needs_rewrite:
+            session_ids = [session_id for session_id, _, _ in indexed]
+            rows = []
+            for path in referenced:
+                for start in range(0, len(session_ids), SESSION_BATCH_SIZE):
+                    rows.extend(_read_parquet(path, session_ids[start:start + SESSION_BATCH_SIZE]))
+
+            new_path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+            _write_parquet(rows, new_path)
+            # Only the sessions copied above (one restored meanwhile is already gone from the index)
+            for start in range(0, len(session_ids), SESSION_BATCH_SIZE):
+                batch = session_ids[start:start + SESSION_BATCH_SIZE]
+                connection.execute(
+                    f"UPDATE archived_sessions SET path = ? WHERE session_id IN ({_placeholders(batch)})",
+                    (new_path, *batch)
+                )
+            stale = files
+            rewritten += 1
+
+        for path in stale:
+            os.remove(path)
+            removed += 1
+
+    return {"partitions_rewritten": rewritten, "files_removed": removed}
+
+
+def get_archive_stats():
+    """Hot vs archived session and message counts"""
+    connection = db_utils.get_db_connection()
+    hot_sessions, hot_messages = connection.execute(
+        "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM chats"
+    ).fetchone()
+    archived_sessions, archived_messages = connection.execute(
+        "SELECT COUNT(*), COALESCE(SUM(message_count), 0) FROM archived_sessions"
+    ).fetchone()
+    return {
+        "hot_sessions": hot_sessions,
+        "hot_messages": hot_messages,
+        "archived_sessions": archived_sessions,
+        "archived_messages": archived_messages
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Chat history retention")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = subparsers.add_parser("archive", help="Move inactive sessions to Parquet")
+    archive_parser.add_argument("--inactive-days", type=int, default=DEFAULT_INACTIVE_DAYS)
+
+    compact_parser = subparsers.add_parser("compact", help="Merge small archive files and drop restored sessions")
+    compact_parser.add_argument("--min-file-rows", type=int, default=10000)
+
+    restore_parser = subparsers.add_parser("restore", help="Move an archived session back to the hot table")
+    restore_parser.add_argument("session_id")
+
+    subparsers.add_parser("stats", help="Show hot and archived counts")
+
+    args = parser.parse_args()
+
+    # The app runs archive + compact itself (MAINTENANCE_INTERVAL_HOURS); on the
+    # default DuckDB backend this CLI only works while the app is stopped
+    try:
+        if args.command == "archive":
+            print(archive_inactive_sessions(args.inactive_days))
+        elif args.command == "compact":
+            print(compact(args.min_file_rows))
+        elif args.command == "restore":
+            print(f"Restored {restore_session(args.session_id)} messages")
+        else:
+            print(get_archive_stats())
+    except db_utils.DatabaseLockedError as e:
+        sys.exit(f"error: {e}")
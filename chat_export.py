@@ -0,0 +1,101 @@
+"""
+Bulk export / import of conversations
+
+    python chat_export.py export chats.jsonl
+    python chat_export.py export chats.parquet --session abc --session def --since 2025-01-01
+    python chat_export.py import chats.parquet
+
+Rows are streamed in batches (--batch-size), so memory use does not grow with
+the number of messages. Progress and throughput are printed to stderr.
+
+On the default DuckDB backend local_chat.db can only be opened by one process,
+so this needs the app stopped; with CHAT_DB_BACKEND=sqlite it runs alongside
+the app. While the app is running on DuckDB, use "Export / import chats" in
+its sidebar, which goes through the app's own connection.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import db_utils
+
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+_last_progress = 0.0
+
+
+def print_progress(stats):
+    global _last_progress
+    now = time.monotonic()
+    if now - _last_progress < PROGRESS_INTERVAL_SECONDS:
+        return
+    _last_progress = now
+    print(f"  {stats['messages']:,} messages  {stats['messages_per_second']:,.0f} msg/s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import chat messages as JSONL/Parquet")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write messages to a file")
+    export_parser.add_argument("path", help="Output file (.jsonl or .parquet)")
+    export_parser.add_argument("--session", action="append", dest="session_ids", help="Session to export (repeatable)")
+    export_parser.add_argument("--since", type=datetime.fromisoformat, help="Messages at or after this time (ISO format)")
+    export_parser.add_argument("--until", type=datetime.fromisoformat, help="Messages before this time (ISO format)")
+    export_parser.add_argument("--no-archived", action="store_true", help="Skip sessions moved to the Parquet archive")
+
+    import_parser = subparsers.add_parser("import", help="Load messages from a file")
+    import_parser.add_argument("path", help="Input file (.jsonl or .parquet)")
+    import_parser.add_argument("--allow-duplicates", action="store_true",
+                               help="Insert every row, even if the message is already stored")
+
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--format", choices=db_utils.TRANSFER_FORMATS, help="Override the format from the file extension")
+        subparser.add_argument("--batch-size", type=int, default=db_utils.TRANSFER_BATCH_SIZE)
+        subparser.add_argument("--quiet", action="store_true", help="No per-batch progress")
+
+    args = parser.parse_args()
+    progress = None if args.quiet else print_progress
+
+    try:
+        if args.command == "export":
+            run_export(args, progress)
+        else:
+            run_import(args, progress)
+    except (ValueError, ImportError, FileNotFoundError) as e:
+        parser.error(str(e))
+    except db_utils.DatabaseLockedError as e:
+        sys.exit(f"error: {e}")
+
+
+def run_export(args, progress):
+    stats = db_utils.export_messages(
+        args.path,
+        fmt=args.format,
+        session_ids=args.session_ids,
+        start=args.since,
+        end=args.until,
+        batch_size=args.batch_size,
+        include_archived=not args.no_archived,
+        progress_callback=progress
+    )
+    print(f"Exported {stats['messages']:,} messages from {stats['sessions']:,} sessions "
+          f"({stats['bytes'] / 1024 / 1024:.1f} MB) in {stats['seconds']:.1f}s "
+          f"- {stats['messages_per_second']:,.0f} msg/s")
+
+
+def run_import(args, progress):
+    stats = db_utils.import_messages(
+        args.path,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        skip_existing=not args.allow_duplicates,
+        progress_callback=progress
+    )
+    print(f"Imported {stats['messages']:,} messages ({stats['skipped']:,} already present) "
+          f"in {stats['seconds']:.1f}s - {stats['messages_per_second']:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
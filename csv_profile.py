@@ -0,0 +1,136 @@
+import re
+
+# Simple profile questions ("how many rows", "average salary", ...) are
+# answered straight from the cached column statistics, skipping the Gemini
+# SQL-generation round-trip entirely.
+
+_ROW_COUNT_PATTERN = re.compile(r"\bhow many (rows|records|entries|lines)\b|\brow count\b|\bnumber of (rows|records|entries)\b")
+_COLUMNS_PATTERN = re.compile(r"\b(what|which|list( the)?|show( the)?) columns\b|\bcolumn names\b|\bwhat fields\b")
+_DISTINCT_PATTERN = re.compile(r"\b(how many (unique|distinct|different)|number of (unique|distinct|different)|count of (unique|distinct))\b")
+_NULL_PATTERN = re.compile(r"\b(null|missing|empty|blank)\b")
+_MIN_PATTERN = re.compile(r"\b(min|minimum|lowest|smallest|earliest)\b")
+_MAX_PATTERN = re.compile(r"\b(max|maximum|highest|largest|biggest|latest)\b")
+_AVG_PATTERN = re.compile(r"\b(avg|average|mean)\b")
+
+# SUMMARIZE reports an avg for DATE/TIMESTAMP columns too, as a timestamp
+# string; only numeric averages are answered here, the rest go to SQL
+_NUMERIC_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                  "UINTEGER", "UBIGINT", "UHUGEINT", "FLOAT", "REAL", "DOUBLE", "DECIMAL")
+
+# Stats describe the whole table, so a question is only answered from them if
+# nothing is left after removing the column name and the aggregate phrase
+# except these words. Anything else ("in Sales", "for engineers", "in 2020")
+# may be a filter and goes to SQL.
+_FILLER_WORDS = {
+    "what", "whats", "what's", "is", "are", "was", "the", "a", "an", "of", "in", "this", "that",
+    "csv", "file", "data", "dataset", "table", "column", "columns", "field", "fields", "value", "values",
+    "show", "tell", "give", "me", "us", "find", "get", "list", "please", "there", "do", "does", "we",
+    "have", "has", "how", "many", "much", "percentage", "percent", "overall", "can", "you", "i",
+}
+
+
+def _column_pattern(column):
+    name = column["name"].lower()
+    variants = sorted({name, name.replace("_", " ")}, key=len, reverse=True)
+    # Allow simple plurals: "departments" -> department
+    return re.compile(r"\b(" + "|".join(re.escape(v) for v in variants) + r")s?\b")
+
+
+def _is_numeric(column):
+    return column["type"].upper().split("(")[0] in _NUMERIC_TYPES
+
+
+def _find_column(question, stats):
+    """Return the single column mentioned in the question, or None"""
+    matches = [column for column in stats["columns"] if _column_pattern(column).search(question)]
+    if len(matches) == 1:
+        return matches[0]
+    return None
+
+
+def _only_filler_left(question, patterns):
+    """True if the question has nothing but filler words once the patterns are removed"""
+    for pattern in patterns:
+        question = pattern.sub(" ", question)
+    return all(word in _FILLER_WORDS for word in re.findall(r"[a-z0-9_']+", question))
+
+
+def answer_profile_question(question, stats):
+    """
+    Try to answer a profile question from precomputed statistics
+
+    Args:
+        question: User's natural language question
+        stats: Statistics dict from db_utils.get_csv_stats
+
+    Returns:
+        str: Markdown answer, or None if the question needs a real SQL query
+    """
+    q = question.lower().strip()
+
+    if _COLUMNS_PATTERN.search(q) and _only_filler_left(q, [_COLUMNS_PATTERN]):
+        lines = [f"- **{col['name']}** ({col['type']})" for col in stats["columns"]]
+        return "**Columns:**\n\n" + "\n".join(lines)
+
+    column = _find_column(q, stats)
+    if column:
+        column_pattern = _column_pattern(column)
+
+        def answerable(pattern):
+            return _only_filler_left(q, [pattern, column_pattern])
+    else:
+        def answerable(pattern):
+            return _only_filler_left(q, [pattern])
+
+    if _ROW_COUNT_PATTERN.search(q) and not column and answerable(_ROW_COUNT_PATTERN):
+        return f"The CSV has **{stats['row_count']}** row(s)."
+
+    if not column:
+        return None
+
+    if _DISTINCT_PATTERN.search(q) and answerable(_DISTINCT_PATTERN):
+        answer = f"**{column['name']}** has **{column['distinct_count']}** distinct value(s)."
+        if column["top_values"]:
+            top = ", ".join(f"{value} ({count})" for value, count in column["top_values"])
+            answer += f"\n\nMost common: {top}"
+        return answer
+
+    if _NULL_PATTERN.search(q) and answerable(_NULL_PATTERN):
+        return f"**{column['name']}** is {column['null_percentage']:.2f}% null/missing."
+
+    if _AVG_PATTERN.search(q) and answerable(_AVG_PATTERN):
+        if column["avg"] is None or not _is_numeric(column):
+            return None
+        return f"Average **{column['name']}**: **{float(column['avg']):,.2f}**"
+
+    # "highest/lowest salary" asks for a value; "who has the highest" leaves "who" over
+    is_min = bool(_MIN_PATTERN.search(q))
+    is_max = bool(_MAX_PATTERN.search(q))
+    if is_min and not is_max and answerable(_MIN_PATTERN):
+        return f"Minimum **{column['name']}**: **{column['min']}**"
+    if is_max and not is_min and answerable(_MAX_PATTERN):
+        return f"Maximum **{column['name']}**: **{column['max']}**"
+
+    return None
+
+
+def format_stats_for_prompt(stats):
+    """Format column statistics as compact text for the SQL generation prompt"""
+    lines = [f"Row count: {stats['row_count']}"]
+    for col in stats["columns"]:
+        line = (
+            f"- {col['name']} ({col['type']}): min={col['min']}, max={col['max']}, "
+            f"distinct={col['distinct_count']}, null={col['null_percentage']:.1f}%"
+        )
+        if col["top_values"]:
+            values = ", ".join(repr(value) for value, _ in col["top_values"])
+            line += f", top values=[{values}]"
+        lines.append(line)
+
+    if stats["sample_rows"]:
+        header = ", ".join(col["name"] for col in stats["columns"])
+        lines.append(f"Sample rows ({header}):")
+        for row in stats["sample_rows"]:
+            lines.append("  " + ", ".join(row))
+
+    return "\n".join(lines)
@@ -1,34 +1,194 @@
-import duckdb
+import contextlib
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
 
+import tracing
 
-connection = duckdb.connect('local_chat.db')
 
+def create_tables(connection):
+    """Create all tables used by the app (idempotent)"""
+    connection.execute("CREATE TABLE IF NOT EXISTS chats (session_id VARCHAR, timestamp TIMESTAMP, role VARCHAR CHECK (role IN ('user', 'assistant')),content_text VARCHAR, has_attachment BOOLEAN  )")
 
-connection.execute("CREATE TABLE IF NOT EXISTS chats (session_id VARCHAR, timestamp TIMESTAMP, role VARCHAR CHECK (role IN ('user', 'assistant')),content_text VARCHAR, has_attachment BOOLEAN  )")
+    # session_id (VARCHAR)
+    # timestamp (TIMESTAMP)
+    # role (VARCHAR) → only user or assistant
+    # content_text (VARCHAR)
+    # has_attachment (BOOLEAN)
+
+    # Content-addressed upload store (see upload_store.py)
+    connection.execute("CREATE TABLE IF NOT EXISTS upload_blobs (sha256 VARCHAR PRIMARY KEY, path VARCHAR, size_bytes BIGINT, created_at TIMESTAMP, last_used TIMESTAMP)")
+    connection.execute("CREATE TABLE IF NOT EXISTS upload_refs (session_id VARCHAR, sha256 VARCHAR, filename VARCHAR, created_at TIMESTAMP)")
+
+    # Per-upload column statistics, computed once and reused for every question
+    connection.execute("CREATE TABLE IF NOT EXISTS csv_stats (csv_path VARCHAR PRIMARY KEY, stats_json VARCHAR, created_at TIMESTAMP)")
+
+    # Per-stage latency of each chat turn (see tracing.py)
+    connection.execute("CREATE TABLE IF NOT EXISTS turn_traces (turn_id VARCHAR, session_id VARCHAR, timestamp TIMESTAMP, stage VARCHAR, duration_ms DOUBLE)")
+
+    # Opt-in Gemini response cache (see response_cache.py)
+    connection.execute("CREATE TABLE IF NOT EXISTS gemini_cache (cache_key VARCHAR PRIMARY KEY, model VARCHAR, response_text VARCHAR, size_bytes BIGINT, created_at TIMESTAMP, last_used TIMESTAMP, hits BIGINT)")
+
+    # Sessions moved to Parquet by the retention job (see chat_archive.py)
+    connection.execute("CREATE TABLE IF NOT EXISTS archived_sessions (session_id VARCHAR PRIMARY KEY, partition_date VARCHAR, path VARCHAR, message_count BIGINT, last_activity TIMESTAMP, archived_at TIMESTAMP)")
+
+
+# Storage backend for the app's own tables (chats, uploads, caches, traces):
+#   "duckdb" - local_chat.db, opened read-write by a single process (default)
+#   "sqlite" - WAL-mode SQLite file that several app processes on one host can
+#              share; DuckDB then runs in-memory and only queries CSV uploads
+DB_BACKEND = os.getenv("CHAT_DB_BACKEND", "duckdb")
+DUCKDB_PATH = 'local_chat.db'
+SQLITE_PATH = os.getenv("CHAT_SQLITE_PATH", "local_chat.sqlite")
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+if DB_BACKEND not in ("duckdb", "sqlite"):
+    raise ValueError(f"Unknown CHAT_DB_BACKEND '{DB_BACKEND}'. Use 'duckdb' or 'sqlite'")
+
+# Explicit datetime <-> TIMESTAMP conversion (the implicit sqlite3 adapters are deprecated)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+
+def _connect_sqlite():
+    sqlite_connection = sqlite3.connect(
+        SQLITE_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+        isolation_level=None,  # autocommit, like DuckDB
+        detect_types=sqlite3.PARSE_DECLTYPES
+    )
+    sqlite_connection.execute("PRAGMA journal_mode=WAL")
+    sqlite_connection.execute("PRAGMA synchronous=NORMAL")
+    return sqlite_connection
+
+
+class DatabaseLockedError(RuntimeError):
+    """local_chat.db is held by another process (DuckDB allows only one)"""
+
+
+# Opened (and the schema created) on first use rather than at import, so
+# importing this module stays cheap and doesn't touch the database file
+connection = None
+_sqlite_schema_ready = False
+_init_lock = threading.Lock()
+
+
+def _get_connection():
+    """The process-wide DuckDB connection, opened on first call"""
+    global connection
+    if connection is None:
+        with _init_lock:
+            if connection is None:
+                import duckdb
+
+                if DB_BACKEND == "sqlite":
+                    connection = duckdb.connect()  # in-memory, CSV analytics only
+                else:
+                    try:
+                        new_connection = duckdb.connect(DUCKDB_PATH)
+                    except duckdb.IOException as e:
+                        if "lock" not in str(e).lower():
+                            raise
+                        raise DatabaseLockedError(
+                            f"{DUCKDB_PATH} is in use by another process (usually the running app). "
+                            "DuckDB lets only one process open it: stop the app, or run both with "
+                            "CHAT_DB_BACKEND=sqlite"
+                        ) from e
+                    create_tables(new_connection)
+                    connection = new_connection
+    return connection
+
+
+def _ensure_sqlite_schema(sqlite_connection):
+    global _sqlite_schema_ready
+    if not _sqlite_schema_ready:
+        with _init_lock:
+            if not _sqlite_schema_ready:
+                create_tables(sqlite_connection)
+                _sqlite_schema_ready = True
+
+
+# Neither DuckDB nor sqlite3 connections are safe to share between threads;
+# attachment processing runs on a background executor, so each thread gets its own
+_thread_local = threading.local()
+
+
+def get_analytics_connection():
+    """DuckDB cursor for queries over uploaded CSV files"""
+    parent = _get_connection()
+    if getattr(_thread_local, "parent", None) is not parent:
+        _thread_local.parent = parent
+        _thread_local.cursor = parent.cursor()
+    return _thread_local.cursor
 
-# session_id (VARCHAR)
-# timestamp (TIMESTAMP)
-# role (VARCHAR) → only user or assistant
-# content_text (VARCHAR)
-# has_attachment (BOOLEAN)
 
 def get_db_connection():
+    """Connection to the app's tables for the configured backend"""
     try:
-        return connection
+        if DB_BACKEND == "sqlite":
+            if getattr(_thread_local, "sqlite", None) is None:
+                sqlite_connection = _connect_sqlite()
+                _ensure_sqlite_schema(sqlite_connection)
+                _thread_local.sqlite = sqlite_connection
+            return _thread_local.sqlite
+        return get_analytics_connection()
     except Exception as e:
         print(f"Error getting database connection: {e}")
         raise e
 
 
 def save_message(session_id, timestamp, role, content_text, has_attachment):
-    connection = get_db_connection()
-    connection.execute( "INSERT INTO chats VALUES (?, ?, ?, ?, ?)",(session_id, timestamp, role, content_text, has_attachment))
+    with tracing.span("save_message"):
+        connection = get_db_connection()
+        connection.execute( "INSERT INTO chats VALUES (?, ?, ?, ?, ?)",(session_id, timestamp, role, content_text, has_attachment))
+
+def _restore_if_archived(session_id):
+    """Read-through for sessions moved to the Parquet archive"""
+    import chat_archive
+
+    if chat_archive.is_archived(session_id):
+        chat_archive.restore_session(session_id)
+
 
 def load_history(session_id):
+    _restore_if_archived(session_id)
     connection = get_db_connection()
     return connection.execute("SELECT * from chats where session_id = ? ORDER BY timestamp", (session_id,)).fetchall()
 
 
+# Newest first; messages sharing a timestamp keep a fixed order (user before
+# assistant) so consecutive pages split ties the same way
+_HISTORY_PAGE_ORDER = "ORDER BY timestamp DESC, role ASC, content_text DESC"
+
+
+def load_history_page(session_id, limit, before=None, skip=0):
+    """
+    Latest `limit` messages of a session, oldest first
+
+    Paging back: `before` is the timestamp of the oldest message already shown
+    and `skip` how many shown messages have exactly that timestamp. Rows at
+    `before` are included (`<=`) and the shown ones skipped, so messages that
+    share a timestamp are never lost between pages.
+    """
+    connection = get_db_connection()
+    if before is None:
+        _restore_if_archived(session_id)
+        rows = connection.execute(
+            f"SELECT * FROM chats WHERE session_id = ? {_HISTORY_PAGE_ORDER} LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+    else:
+        rows = connection.execute(
+            f"SELECT * FROM chats WHERE session_id = ? AND timestamp <= ? {_HISTORY_PAGE_ORDER} LIMIT ? OFFSET ?",
+            (session_id, before, limit, skip)
+        ).fetchall()
+    return rows[::-1]
+
+
 
 def try_message_insert(session_id, timestamp, role, content_text, has_attachment):
     try:
@@ -45,7 +205,7 @@ def get_all_sessions():
     """Get list of all unique session IDs"""
     connection = get_db_connection()
     result = connection.execute(
-        "SELECT DISTINCT session_id FROM chats ORDER BY session_id"
+        "SELECT session_id FROM chats UNION SELECT session_id FROM archived_sessions ORDER BY session_id"
     ).fetchall()
     return [row[0] for row in result]
 
@@ -53,7 +213,7 @@ def get_all_sessions():
 def get_csv_schema(csv_path):
     """Get schema (columns and types) from CSV file using DuckDB"""
     try:
-        connection = get_db_connection()
+        connection = get_analytics_connection()
         result = connection.execute(
             f"DESCRIBE SELECT * FROM read_csv_auto('{csv_path}')"
         ).fetchall()
@@ -79,17 +239,103 @@ def get_csv_schema(csv_path):
         }
 
 
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def compute_csv_stats(csv_path, top_values=5, sample_rows=3, max_categorical_distinct=50):
+    """Compute SUMMARIZE-style per-column statistics for a CSV file using DuckDB"""
+    connection = get_analytics_connection()
+    source = f"read_csv_auto('{csv_path}')"
+
+    summary = connection.execute(f"SUMMARIZE SELECT * FROM {source}").fetchall()
+    summary_columns = [desc[0] for desc in connection.description]
+    summary = [dict(zip(summary_columns, row)) for row in summary]
+
+    # Exact distinct counts in a single scan (SUMMARIZE only gives an estimate)
+    distinct_sql = ", ".join(
+        f"COUNT(DISTINCT {_quote_identifier(col['column_name'])})" for col in summary
+    )
+    distinct_counts = connection.execute(
+        f"SELECT COUNT(*), {distinct_sql} FROM {source}"
+    ).fetchone()
+    row_count = distinct_counts[0]
+
+    columns = []
+    for col, distinct_count in zip(summary, distinct_counts[1:]):
+        column = {
+            "name": col["column_name"],
+            "type": col["column_type"],
+            "min": col["min"],
+            "max": col["max"],
+            "avg": col["avg"],
+            "distinct_count": distinct_count,
+            "null_percentage": float(col["null_percentage"] or 0),
+            "top_values": []
+        }
+
+        # Top values only make sense for low-cardinality columns with repeats
+        if distinct_count <= max_categorical_distinct and distinct_count < row_count:
+            quoted = _quote_identifier(col["column_name"])
+            top = connection.execute(
+                f"SELECT {quoted}, COUNT(*) AS n FROM {source} WHERE {quoted} IS NOT NULL "
+                f"GROUP BY 1 ORDER BY n DESC, 1 LIMIT {int(top_values)}"
+            ).fetchall()
+            column["top_values"] = [[str(value), count] for value, count in top]
+
+        columns.append(column)
+
+    samples = connection.execute(f"SELECT * FROM {source} LIMIT {int(sample_rows)}").fetchall()
+
+    return {
+        "row_count": row_count,
+        "columns": columns,
+        "sample_rows": [[str(value) for value in row] for row in samples]
+    }
+
+
+def get_csv_stats(csv_path):
+    """Get cached column statistics for a CSV file, computing them on first use"""
+    try:
+        connection = get_db_connection()
+        cached = connection.execute(
+            "SELECT stats_json FROM csv_stats WHERE csv_path = ?", (csv_path,)
+        ).fetchone()
+        if cached:
+            return {
+                "success": True,
+                "stats": json.loads(cached[0])
+            }
+
+        stats = compute_csv_stats(csv_path)
+        connection.execute(
+            "INSERT OR REPLACE INTO csv_stats VALUES (?, ?, ?)",
+            (csv_path, json.dumps(stats, default=str), datetime.now())
+        )
+
+        return {
+            "success": True,
+            "stats": stats
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
 def execute_csv_query(csv_path, sql_query):
     """Execute SQL query on CSV file using DuckDB"""
     try:
-        connection = get_db_connection()
+        connection = get_analytics_connection()
 
         full_query = sql_query.replace(
             "FROM csv_data",
             f"FROM read_csv_auto('{csv_path}')"
         )
 
-        result = connection.execute(full_query).fetchall()
+        with tracing.span("execute_csv_query"):
+            result = connection.execute(full_query).fetchall()
 
         columns = [desc[0] for desc in connection.description]
 
@@ -106,6 +352,439 @@ def execute_csv_query(csv_path, sql_query):
         }
 
 
+def save_turn_trace(session_id, trace):
+    """Store the stage durations of one chat turn"""
+    connection = get_db_connection()
+    timestamp = datetime.now()
+    connection.executemany(
+        "INSERT INTO turn_traces VALUES (?, ?, ?, ?, ?)",
+        [(trace["turn_id"], session_id, timestamp, stage, duration_ms) for stage, duration_ms in trace["spans"]]
+    )
+
+
+def _quantile_cont(sorted_values, q):
+    """Linear-interpolated quantile (same definition as DuckDB's quantile_cont)"""
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def get_stage_latency_stats(since=None):
+    """Get p50/p95 latency per stage across all turns (optionally since a timestamp)"""
+    connection = get_db_connection()
+    where = "WHERE timestamp >= ?" if since else ""
+    params = (since,) if since else ()
+
+    # A stage can run several times per turn (e.g. two save_message calls), so sum per turn first
+    per_turn = f"""SELECT stage, SUM(duration_ms) AS duration_ms
+                   FROM turn_traces {where}
+                   GROUP BY turn_id, stage"""
+
+    if DB_BACKEND == "duckdb":
+        result = connection.execute(
+            f"""SELECT stage, COUNT(*), quantile_cont(duration_ms, 0.5), quantile_cont(duration_ms, 0.95)
+                FROM ({per_turn}) GROUP BY stage""",
+            params
+        ).fetchall()
+        stats = [
+            {"stage": stage, "turns": turns, "p50_ms": p50_ms, "p95_ms": p95_ms}
+            for stage, turns, p50_ms, p95_ms in result
+        ]
+        return sorted(stats, key=lambda row: row["p95_ms"], reverse=True)
+
+    # SQLite has no percentile aggregate: compute them from the per-turn rows
+    result = connection.execute(f"{per_turn} ORDER BY stage, duration_ms", params).fetchall()
+
+    durations = {}
+    for stage, duration_ms in result:
+        durations.setdefault(stage, []).append(duration_ms)
+
+    stats = [
+        {
+            "stage": stage,
+            "turns": len(values),
+            "p50_ms": _quantile_cont(values, 0.5),
+            "p95_ms": _quantile_cont(values, 0.95)
+        }
+        for stage, values in durations.items()
+    ]
+    return sorted(stats, key=lambda row: row["p95_ms"], reverse=True)
+
+
+
+# ============================================================================
+# BULK EXPORT / IMPORT (CLI: chat_export.py)
+# ============================================================================
+
+TRANSFER_BATCH_SIZE = 10000
+TRANSFER_FORMATS = ("jsonl", "parquet")
+MESSAGE_COLUMNS = ("session_id", "timestamp", "role", "content_text", "has_attachment")
+
+
+def _import_pyarrow():
+    """pyarrow is optional: needed for Parquet files, and speeds up DuckDB inserts"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _transfer_format(path, fmt):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in TRANSFER_FORMATS:
+        raise ValueError(f"Unknown transfer format '{fmt}'. Use one of: {', '.join(TRANSFER_FORMATS)}")
+    if fmt == "parquet" and _import_pyarrow() is None:
+        raise ImportError("Parquet export/import needs the 'pyarrow' package")
+    return fmt
+
+
+def _transfer_connection():
+    """
+    Separate connection for long-running exports/imports, so a streaming
+    cursor never shares the app's per-thread connection
+    """
+    if DB_BACKEND == "sqlite":
+        sqlite_connection = _connect_sqlite()
+        _ensure_sqlite_schema(sqlite_connection)
+        return sqlite_connection
+    return _get_connection().cursor()
+
+
+def _message_filter(session_ids, start, end):
+    clauses = []
+    params = []
+    if session_ids:
+        clauses.append(f"session_id IN ({', '.join('?' for _ in session_ids)})")
+        params.extend(session_ids)
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _fetch_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _iter_rows(cursor, batch_size):
+    for rows in _fetch_batches(cursor, batch_size):
+        yield from rows
+
+
+def _batched(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _archived_paths(reader, session_ids):
+    """session_id -> archive file, for the archived sessions among session_ids (default: all)"""
+    wanted = set(session_ids) if session_ids else None
+    return {
+        session_id: path
+        for session_id, path in reader.execute("SELECT session_id, path FROM archived_sessions").fetchall()
+        if wanted is None or session_id in wanted
+    }
+
+
+def _iter_archived_rows(archived_paths, start, end, batch_size):
+    """Archived messages in (session_id, timestamp) order, read from the Parquet files"""
+    if not archived_paths:
+        return
+
+    paths = sorted(set(archived_paths.values()))
+    time_where, time_params = _message_filter(None, start, end)
+    archive_reader = _get_connection().cursor()
+    try:
+        # One sorted scan over every file, so sessions spread over several files stay in order
+        cursor = archive_reader.execute(
+            f"""SELECT session_id, timestamp, role, content_text, has_attachment, filename
+                FROM read_parquet([{', '.join('?' for _ in paths)}], filename = true){time_where}
+                ORDER BY session_id, timestamp""",
+            [*paths, *time_params]
+        )
+        for row in _iter_rows(cursor, batch_size):
+            # Files may still hold rows of sessions restored since the last
+            # compaction: keep only the file the index points to
+            if archived_paths.get(row[0]) == row[5]:
+                yield row[:5]
+    finally:
+        archive_reader.close()
+
+
+def iter_message_batches(session_ids=None, start=None, end=None, batch_size=TRANSFER_BATCH_SIZE,
+                         include_archived=True):
+    """
+    Yield chat messages in lists of at most batch_size rows, ordered by session and time
+
+    A session can have rows both in the hot table and in the archive (messages
+    arriving while it was archived stay hot); the two are merged, so each
+    session comes out once, in timestamp order.
+
+    Args:
+        session_ids: Only these sessions (default: all)
+        start: Only messages at or after this datetime
+        end: Only messages before this datetime
+        batch_size: Rows held in memory at a time
+        include_archived: Also read sessions moved to Parquet by chat_archive.py
+    """
+    import chat_archive
+
+    where, params = _message_filter(session_ids, start, end)
+    reader = _transfer_connection()
+    try:
+        # Compaction may not delete the files listed in the index until they are read
+        with chat_archive.archive_lock() if include_archived else contextlib.nullcontext():
+            # Read the index before the hot scan: a new execute() would end that cursor's result
+            archived_paths = _archived_paths(reader, session_ids) if include_archived else {}
+            cursor = reader.execute(
+                f"SELECT session_id, timestamp, role, content_text, has_attachment FROM chats{where} ORDER BY session_id, timestamp",
+                params
+            )
+            rows = _iter_rows(cursor, batch_size)
+            if include_archived:
+                archived = _iter_archived_rows(archived_paths, start, end, batch_size)
+                rows = heapq.merge(rows, archived, key=lambda row: (row[0], row[1]))
+            yield from _batched(rows, batch_size)
+    finally:
+        reader.close()
+
+
+def _transfer_stats(messages, started, **extra):
+    seconds = time.perf_counter() - started
+    return {
+        "messages": messages,
+        **extra,
+        "seconds": round(seconds, 3),
+        "messages_per_second": round(messages / seconds, 1) if seconds > 0 else 0.0
+    }
+
+
+class _JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        for session_id, timestamp, role, content_text, has_attachment in rows:
+            self.file.write(json.dumps({
+                "session_id": session_id,
+                "timestamp": timestamp.isoformat(),
+                "role": role,
+                "content_text": content_text,
+                "has_attachment": bool(has_attachment)
+            }, ensure_ascii=False))
+            self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.pyarrow = _import_pyarrow()
+        self.schema = self.pyarrow.schema([
+            ("session_id", self.pyarrow.string()),
+            ("timestamp", self.pyarrow.timestamp("us")),
+            ("role", self.pyarrow.string()),
+            ("content_text", self.pyarrow.string()),
+            ("has_attachment", self.pyarrow.bool_())
+        ])
+        self.writer = self.pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        columns[4] = [None if value is None else bool(value) for value in columns[4]]
+        # One row group per batch
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_messages(path, fmt=None, session_ids=None, start=None, end=None, batch_size=TRANSFER_BATCH_SIZE,
+                    include_archived=True, progress_callback=None):
+    """
+    Stream chat messages to a JSONL or Parquet file in bounded-memory batches
+
+    The file is written under a temporary name and renamed when complete.
+
+    Args:
+        path: Output file (format taken from the extension unless fmt is given)
+        fmt: "jsonl" or "parquet"
+        session_ids, start, end, include_archived: Filters, see iter_message_batches
+        batch_size: Rows per batch
+        progress_callback: Called with the running stats after each batch
+
+    Returns:
+        dict: messages, sessions, bytes, seconds, messages_per_second
+    """
+    fmt = _transfer_format(path, fmt)
+    started = time.perf_counter()
+    temp_path = f"{path}.tmp"
+    messages = 0
+    sessions = 0
+    last_session = None
+
+    writer = _ParquetWriter(temp_path) if fmt == "parquet" else _JsonlWriter(temp_path)
+    try:
+        for rows in iter_message_batches(session_ids, start, end, batch_size, include_archived):
+            writer.write(rows)
+            messages += len(rows)
+            # Rows arrive grouped by session, so counting changes is enough
+            for row in rows:
+                if row[0] != last_session:
+                    sessions += 1
+                    last_session = row[0]
+            if progress_callback:
+                progress_callback(_transfer_stats(messages, started, sessions=sessions))
+        writer.close()
+    except BaseException:
+        writer.close()
+        os.remove(temp_path)
+        raise
+
+    os.replace(temp_path, path)
+    return _transfer_stats(messages, started, sessions=sessions, bytes=os.path.getsize(path))
+
+
+def _read_jsonl_batches(path, batch_size):
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                batch.append((
+                    record["session_id"],
+                    datetime.fromisoformat(record["timestamp"]),
+                    record["role"],
+                    record.get("content_text"),
+                    bool(record.get("has_attachment", False))
+                ))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid message record ({e})")
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _read_parquet_batches(path, batch_size):
+    parquet_file = _import_pyarrow().parquet.ParquetFile(path)
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=list(MESSAGE_COLUMNS)):
+        columns = [record_batch.column(name).to_pylist() for name in MESSAGE_COLUMNS]
+        yield list(zip(*columns))
+
+
+def _insert_messages(writer, rows):
+    pyarrow = _import_pyarrow() if DB_BACKEND == "duckdb" else None
+    if pyarrow is None:
+        writer.executemany("INSERT INTO chats VALUES (?, ?, ?, ?, ?)", rows)
+        return
+    # Row-by-row executemany is slow on DuckDB; insert the batch as one Arrow table
+    batch = pyarrow.Table.from_arrays(
+        [pyarrow.array(column) for column in zip(*rows)], names=list(MESSAGE_COLUMNS)
+    )
+    writer.register("import_batch", batch)
+    try:
+        writer.execute("INSERT INTO chats SELECT * FROM import_batch")
+    finally:
+        writer.unregister("import_batch")
+
+
+def _restore_archived_sessions(reader, session_ids):
+    import chat_archive
+
+    archived = reader.execute(
+        f"SELECT session_id FROM archived_sessions WHERE session_id IN ({', '.join('?' for _ in session_ids)})",
+        session_ids
+    ).fetchall()
+    for (session_id,) in archived:
+        chat_archive.restore_session(session_id)
+
+
+def import_messages(path, fmt=None, batch_size=TRANSFER_BATCH_SIZE, skip_existing=True, progress_callback=None):
+    """
+    Load chat messages from a JSONL or Parquet export in bounded-memory batches
+
+    Each batch is committed in its own short transaction, so the running app
+    keeps writing during a long import.
+
+    Args:
+        path: Input file (format taken from the extension unless fmt is given)
+        fmt: "jsonl" or "parquet"
+        batch_size: Rows per batch/transaction
+        skip_existing: Skip messages already stored (same session, timestamp
+            and role), so an interrupted import can simply be re-run.
+            Archived sessions in the file are restored to the hot table first.
+        progress_callback: Called with the running stats after each batch
+
+    Returns:
+        dict: messages (inserted), skipped, seconds, messages_per_second
+    """
+    fmt = _transfer_format(path, fmt)
+    batches = _read_parquet_batches(path, batch_size) if fmt == "parquet" else _read_jsonl_batches(path, batch_size)
+    started = time.perf_counter()
+    inserted = 0
+    skipped = 0
+
+    writer = _transfer_connection()
+    try:
+        for rows in batches:
+            batch_sessions = sorted({row[0] for row in rows})
+            if skip_existing:
+                # Messages of archived sessions are only in Parquet: bring those
+                # sessions back first, so the check below sees them
+                _restore_archived_sessions(writer, batch_sessions)
+            writer.execute("BEGIN")
+            try:
+                if skip_existing:
+                    # Only this batch's time range, so a long session isn't loaded in full
+                    existing = set(writer.execute(
+                        f"""SELECT session_id, timestamp, role FROM chats
+                            WHERE session_id IN ({', '.join('?' for _ in batch_sessions)})
+                              AND timestamp BETWEEN ? AND ?""",
+                        [*batch_sessions, min(row[1] for row in rows), max(row[1] for row in rows)]
+                    ).fetchall())
+                    new_rows = [row for row in rows if (row[0], row[1], row[2]) not in existing]
+                    skipped += len(rows) - len(new_rows)
+                    rows = new_rows
+                if rows:
+                    _insert_messages(writer, rows)
+                writer.execute("COMMIT")
+            except BaseException:
+                writer.execute("ROLLBACK")
+                raise
+
+            inserted += len(rows)
+            if progress_callback:
+                progress_callback(_transfer_stats(inserted, started, skipped=skipped))
+    finally:
+        writer.close()
+
+    return _transfer_stats(inserted, started, skipped=skipped)
+
+
 # def get_single_conversation(session_id):
 #     connection=get_db_connection()
 #     result = connection.execute("Select * from chats where session_id = ")
\ No newline at end of file
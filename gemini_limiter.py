@@ -0,0 +1,209 @@
+"""
+Process-wide admission control for Gemini API calls
+
+Every Streamlit session shares one limiter, which:
+- caps the number of in-flight requests
+- rate-limits each model with a token bucket
+- queues callers until a slot frees up or their deadline passes
+- retries rate-limit / overload errors with jittered exponential backoff
+
+On a 429 the model's bucket is paused and its refill rate cut, so all
+sessions back off together instead of each hammering the API with retries;
+successful calls restore the rate gradually. This keeps throughput near the
+quota ceiling under bursts.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import tracing
+
+MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+# Adaptive rate: multiplicative decrease on 429, additive recovery on success
+THROTTLE_FACTOR = 0.7
+RECOVERY_STEP = 0.05      # fraction of the configured rate regained per success
+MIN_RATE_FRACTION = 0.1
+
+RETRYABLE_CODES = (429, 500, 503)
+
+
+def _error_code(error):
+    """HTTP status of a google-genai APIError (None for other exceptions)"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    if "RESOURCE_EXHAUSTED" in str(error):
+        return 429
+    return None
+
+
+class TokenBucket:
+    """Requests-per-minute limiter for one model"""
+
+    def __init__(self, requests_per_minute, burst=None):
+        self.configured_rate = requests_per_minute / 60.0
+        self.rate = self.configured_rate
+        self.capacity = burst or max(1.0, requests_per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self, now):
+        """Seconds until a token can be taken (0 if one is available now)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def throttled(self, pause_seconds):
+        """The API returned 429: stop issuing for a while and slow down"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, now + pause_seconds)
+        self.rate = max(self.configured_rate * MIN_RATE_FRACTION, self.rate * THROTTLE_FACTOR)
+
+    def succeeded(self):
+        self.rate = min(self.configured_rate, self.rate + self.configured_rate * RECOVERY_STEP)
+
+
+class GeminiLimiter:
+    """
+    Shared admission controller for Gemini calls
+
+    Args:
+        max_concurrent: In-flight request cap across all models
+        requests_per_minute: Token bucket rate per model
+        queue_timeout: Default seconds a call may wait (including retries)
+        max_retries: Retries for 429/500/503 errors
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, requests_per_minute=REQUESTS_PER_MINUTE,
+                 queue_timeout=QUEUE_TIMEOUT_SECONDS, max_retries=MAX_RETRIES):
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+
+        self._buckets = {}
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+
+        self._wait_ms = deque(maxlen=500)  # recent admission waits
+        self._counters = {"calls": 0, "retries": 0, "throttled": 0, "timeouts": 0}
+
+    def _bucket(self, model):
+        if model not in self._buckets:
+            self._buckets[model] = TokenBucket(self.requests_per_minute)
+        return self._buckets[model]
+
+    def _acquire(self, model, deadline):
+        """Block until a concurrency slot and a rate token are available"""
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    bucket = self._bucket(model)
+                    token_wait = bucket.time_until_available(now)
+                    if self._in_flight < self.max_concurrent and token_wait == 0:
+                        bucket.take()
+                        self._in_flight += 1
+                        return
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise Exception("Gemini is busy: no request slot freed up before the deadline, try again shortly")
+                    # Slots are signalled on release; tokens refill on a timer
+                    self._cond.wait(timeout=min(remaining, token_wait) if token_wait else remaining)
+            finally:
+                self._waiting -= 1
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def call(self, model, fn, timeout=None):
+        """
+        Run fn() under admission control
+
+        Args:
+            model: Model name (selects the token bucket)
+            fn: Zero-argument callable making the API request
+            timeout: Deadline in seconds for queueing plus retries (default queue_timeout)
+
+        Returns:
+            Whatever fn returns
+        """
+        deadline = time.monotonic() + (timeout or self.queue_timeout)
+        attempt = 0
+
+        while True:
+            start = time.monotonic()
+            self._acquire(model, deadline)
+            wait_ms = (time.monotonic() - start) * 1000
+            with self._cond:
+                self._wait_ms.append(wait_ms)
+                self._counters["calls"] += 1
+            tracing.record("gemini_queue_wait", wait_ms)
+
+            try:
+                result = fn()
+            except Exception as e:
+                code = _error_code(e)
+                if code not in RETRYABLE_CODES or attempt >= self.max_retries:
+                    raise
+                # Full jitter keeps retries from re-synchronizing into another burst
+                delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt))
+                with self._cond:
+                    self._counters["retries"] += 1
+                    if code == 429:
+                        self._counters["throttled"] += 1
+                        self._bucket(model).throttled(delay)
+                if time.monotonic() + delay > deadline:
+                    raise
+                print(f"Gemini returned {code}; retrying in {delay:.1f}s (attempt {attempt + 1})")
+            else:
+                with self._cond:
+                    self._bucket(model).succeeded()
+                return result
+            finally:
+                self._release()
+
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self):
+        """Queue depth, in-flight count, admission wait percentiles and counters"""
+        with self._cond:
+            waits = sorted(self._wait_ms)
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "max_concurrent": self.max_concurrent,
+                "wait_p50_ms": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                "rate_per_minute": {model: round(bucket.rate * 60, 1) for model, bucket in self._buckets.items()},
+                **self._counters
+            }
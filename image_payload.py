@@ -0,0 +1,111 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+# Vision payloads are downscaled to what Gemini actually looks at, re-encoded
+# and stripped of metadata (EXIF, ICC, thumbnails) before upload. Gemini
+# tiles large images into 768px crops, so anything beyond a few tiles per
+# side only adds upload bytes and latency.
+MAX_SIDE = int(os.getenv("GEMINI_IMAGE_MAX_SIDE", "1536"))
+FORMAT = os.getenv("GEMINI_IMAGE_FORMAT", "webp").lower()  # "webp" or "jpeg"
+QUALITY = int(os.getenv("GEMINI_IMAGE_QUALITY", "85"))
+
+# Encoded payloads are cached per attachment hash (LRU, bounded by total bytes)
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        payload = _cache.get(key)
+        if payload is not None:
+            _cache.move_to_end(key)
+        return payload
+
+
+def _cache_put(key, payload):
+    global _cache_bytes
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = payload
+        _cache_bytes += len(payload["data"])
+        while _cache_bytes > CACHE_MAX_BYTES and len(_cache) > 1:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted["data"])
+
+
+def encode_image(image, max_side=MAX_SIDE, image_format=FORMAT, quality=QUALITY):
+    """
+    Resize and re-encode a PIL image for upload
+
+    Returns:
+        tuple: (encoded bytes, mime type, (width, height) sent)
+    """
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Unknown image format '{image_format}'. Use one of: {', '.join(MIME_TYPES)}")
+
+    # Apply EXIF orientation before the metadata is dropped
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white (JPEG has no alpha; keeps WebP small)
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    scale = max_side / max(image.size)
+    if scale < 1.0:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), MIME_TYPES[image_format], image.size
+
+
+def prepare_vision_payload(uploaded_file):
+    """
+    Optimized image bytes for a Gemini vision request, cached by file hash
+
+    Args:
+        uploaded_file: File-like image upload
+
+    Returns:
+        dict: data, mime_type, sha256, original_bytes, original_size, sent_size
+    """
+    raw = bytes(uploaded_file.getbuffer())
+    sha256 = hashlib.sha256(raw).hexdigest()
+
+    payload = _cache_get(sha256)
+    if payload is not None:
+        return payload
+
+    with Image.open(io.BytesIO(raw)) as image:
+        original_size = image.size
+        data, mime_type, sent_size = encode_image(image)
+
+    payload = {
+        "data": data,
+        "mime_type": mime_type,
+        "sha256": sha256,
+        "original_bytes": len(raw),
+        "original_size": original_size,
+        "sent_size": sent_size
+    }
+    _cache_put(sha256, payload)
+    return payload
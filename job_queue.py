@@ -0,0 +1,189 @@
+"""
+Local priority job queue shared by the Whisper and OCR servers
+
+Clients submit work, get a job id back immediately, and poll for the
+result (or receive it via an optional callback URL), so long audio or
+large scans are no longer bounded by HTTP timeouts.
+
+Lower priority numbers run first: interactive voice input goes ahead of
+bulk file uploads.
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import requests
+
+PRIORITIES = {
+    "interactive": 0,
+    "bulk": 10,
+}
+DEFAULT_PRIORITY = "bulk"
+
+# Job records (and their results) are dropped this long after they finish
+RESULT_TTL_SECONDS = 3600
+# Jobs still queued after this long are expired instead of run
+QUEUED_TTL_SECONDS = 6 * 3600
+# Hosts a job may POST its result to (comma-separated). Anything else would let
+# a client make the server call arbitrary internal URLs.
+CALLBACK_ALLOWED_HOSTS = {
+    host.strip().lower()
+    for host in os.getenv("JOB_CALLBACK_HOSTS", "localhost,127.0.0.1,::1").split(",")
+    if host.strip()
+}
+
+
+def is_allowed_callback_url(url, allowed_hosts=CALLBACK_ALLOWED_HOSTS):
+    """True for http(s) URLs whose host is on the callback allowlist"""
+    try:
+        parts = urlsplit(url)
+        hostname = parts.hostname
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and hostname is not None and hostname.lower() in allowed_hosts
+
+
+class JobQueue:
+    """
+    Thread-backed priority queue
+
+    Args:
+        handler: callable(payload) -> result dict, run on a worker thread
+        workers: Number of worker threads
+        result_ttl: Seconds to keep finished jobs
+        queued_ttl: Seconds a job may wait before it expires
+    """
+
+    def __init__(self, handler, workers=1, result_ttl=RESULT_TTL_SECONDS, queued_ttl=QUEUED_TTL_SECONDS):
+        self.handler = handler
+        self.result_ttl = result_ttl
+        self.queued_ttl = queued_ttl
+
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()  # FIFO within a priority
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+        for _ in range(workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, payload, priority=DEFAULT_PRIORITY, callback_url=None, on_expire=None):
+        """
+        Queue a job
+
+        Args:
+            payload: Passed to the handler
+            priority: "interactive" or "bulk"
+            callback_url: Optional URL that receives the finished job as JSON (POST);
+                ignored unless its host is in CALLBACK_ALLOWED_HOSTS
+            on_expire: Optional callable(payload) for cleanup if the job never runs
+
+        Returns:
+            str: Job id
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITIES)}")
+
+        if callback_url and not is_allowed_callback_url(callback_url):
+            print(f"Ignoring callback_url {callback_url!r}: host not in JOB_CALLBACK_HOSTS")
+            callback_url = None
+
+        self.cleanup()
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "priority": priority,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "callback_url": callback_url,
+                "_payload": payload,
+                "_on_expire": on_expire
+            }
+        self._queue.put((PRIORITIES[priority], next(self._counter), job_id))
+        return job_id
+
+    def get(self, job_id):
+        """Public view of a job (None if unknown or expired)"""
+        self.cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            view = {key: value for key, value in job.items() if not key.startswith("_")}
+        if view["status"] == "queued":
+            view["queue_position"] = self._position(job_id)
+        return view
+
+    def _position(self, job_id):
+        with self._queue.mutex:
+            ordered = sorted(self._queue.queue)
+        for position, (_, _, queued_id) in enumerate(ordered):
+            if queued_id == job_id:
+                return position
+        return None
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"queue_depth": self._queue.qsize(), "jobs": counts}
+
+    def cleanup(self):
+        """Drop finished jobs past result_ttl and expire jobs queued past queued_ttl"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job["finished_at"] and now - job["finished_at"] > self.result_ttl:
+                    del self._jobs[job_id]
+                elif job["status"] == "queued" and now - job["submitted_at"] > self.queued_ttl:
+                    job["status"] = "expired"
+                    job["finished_at"] = now
+                    expired.append(job)
+        for job in expired:
+            if job["_on_expire"]:
+                job["_on_expire"](job["_payload"])
+
+    def _worker(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                job["status"] = "running"
+                job["started_at"] = time.time()
+
+            try:
+                result = self.handler(job["_payload"])
+                status, error = "done", None
+            except Exception as e:
+                result, status, error = None, "failed", str(e)
+
+            with self._lock:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error
+                job["finished_at"] = time.time()
+                job["_payload"] = None
+
+            if job["callback_url"]:
+                self._send_callback(job)
+
+    def _send_callback(self, job):
+        view = {key: value for key, value in job.items() if not key.startswith("_")}
+        try:
+            # No redirects: they could lead off the allowlist
+            requests.post(job["callback_url"], json=view, timeout=5, allow_redirects=False)
+        except Exception as e:
+            print(f"Callback to {job['callback_url']} failed: {e}")
@@ -0,0 +1,214 @@
+"""
+Model lifecycle manager shared by the Whisper and OCR servers
+
+- Registry of selectable model variants with estimated memory sizes
+- Eager load + dummy-input warmup at startup (readiness)
+- LRU eviction to stay under a memory cap
+- Idle-timeout unloading, so models nobody uses give their memory back
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ModelManager:
+    """
+    Loads, caches and unloads models from a registry
+
+    Args:
+        registry: dict of name -> {"loader": callable() -> model,
+                                   "size_mb": estimated resident size,
+                                   "warmup": optional callable(model),
+                                   "unload": optional callable(model) releasing
+                                             resources, e.g. worker processes}
+        default: Name of the default model (loaded and warmed at startup)
+        max_memory_mb: Cap on the summed size_mb of loaded models
+        idle_timeout: Seconds after last use before a model is unloaded
+        pin_default: Never evict or idle-unload the default model (off by
+            default: an idle server then releases all model memory and
+            reloads on the next request)
+    """
+
+    def __init__(self, registry, default, max_memory_mb=None, idle_timeout=600, pin_default=False):
+        if default not in registry:
+            raise ValueError(f"Unknown default model: {default}")
+        self.registry = registry
+        self.default = default
+        self.max_memory_mb = max_memory_mb
+        self.idle_timeout = idle_timeout
+        self.pin_default = pin_default
+
+        self._models = {}      # name -> model
+        self._last_used = {}   # name -> monotonic timestamp
+        self._warmed = set()
+        self._loading = set()  # names whose loader is running
+        self._in_use = {}      # name -> requests inside use(); never unloaded meanwhile
+        self._ready = False    # default model warmed up at least once
+        # The global lock only guards the bookkeeping above; loads run under a
+        # per-name lock, so a slow load doesn't block requests for loaded models
+        self._lock = threading.RLock()
+        self._load_locks = {}  # name -> Lock
+        self._reaper = None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _loaded_size_mb(self):
+        return sum(self.registry[name]["size_mb"] for name in self._models)
+
+    def _reserved_size_mb(self):
+        """Loaded models plus the ones being loaded right now"""
+        return self._loaded_size_mb() + sum(self.registry[name]["size_mb"] for name in self._loading)
+
+    def _is_pinned(self, name):
+        return self.pin_default and name == self.default
+
+    def _make_room(self, name):
+        """Evict least recently used models until `name` fits under the cap"""
+        if self.max_memory_mb is None:
+            return
+        needed = self.registry[name]["size_mb"]
+        by_age = sorted(
+            (n for n in self._models if not self._is_pinned(n) and not self._in_use.get(n)),
+            key=lambda n: self._last_used.get(n, 0)
+        )
+        for candidate in by_age:
+            if self._reserved_size_mb() + needed <= self.max_memory_mb:
+                break
+            print(f"Evicting model '{candidate}' to stay under {self.max_memory_mb} MB")
+            self._unload(candidate)
+
+    def _unload(self, name):
+        model = self._models.pop(name, None)
+        self._last_used.pop(name, None)
+        self._warmed.discard(name)
+        unload_fn = self.registry[name].get("unload")
+        if model is not None and unload_fn:
+            unload_fn(model)
+
+    def get(self, name=None):
+        """Return a loaded model, loading (and evicting others) if needed"""
+        name = name or self.default
+        if name not in self.registry:
+            raise ValueError(f"Unknown model '{name}'. Available: {', '.join(self.registry)}")
+
+        with self._lock:
+            if name in self._models:
+                self._last_used[name] = time.monotonic()
+                return self._models[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only requests for this model wait here; others keep being served
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    # Loaded by another request while we waited
+                    self._last_used[name] = time.monotonic()
+                    return self._models[name]
+                self._make_room(name)
+                self._loading.add(name)
+
+            try:
+                print(f"Loading model '{name}'...")
+                start = time.perf_counter()
+                model = self.registry[name]["loader"]()
+                print(f"✓ Model '{name}' loaded in {time.perf_counter() - start:.1f}s")
+            finally:
+                with self._lock:
+                    self._loading.discard(name)
+
+            with self._lock:
+                self._models[name] = model
+                self._last_used[name] = time.monotonic()
+            return model
+
+    @contextmanager
+    def use(self, name=None):
+        """get(), keeping the model loaded until the block exits"""
+        name = name or self.default
+        with self._lock:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                if name in self._models:
+                    self._last_used[name] = time.monotonic()
+
+    def warmup(self, name=None):
+        """Load a model and run its dummy input through it once"""
+        name = name or self.default
+        model = self.get(name)
+        warmup_fn = self.registry[name].get("warmup")
+        if warmup_fn and name not in self._warmed:
+            start = time.perf_counter()
+            warmup_fn(model)
+            print(f"✓ Model '{name}' warmed up in {time.perf_counter() - start:.1f}s")
+        with self._lock:
+            self._warmed.add(name)
+            if name == self.default:
+                self._ready = True
+        return model
+
+    def unload(self, name):
+        with self._lock:
+            self._unload(name)
+
+    # ------------------------------------------------------------------
+    # Idle unloading
+    # ------------------------------------------------------------------
+
+    def unload_idle(self):
+        """Unload models unused for longer than idle_timeout (except a pinned default)"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                name for name, last_used in self._last_used.items()
+                if not self._is_pinned(name) and not self._in_use.get(name)
+                and now - last_used > self.idle_timeout
+            ]
+            for name in idle:
+                print(f"Unloading idle model '{name}'")
+                self._unload(name)
+        return idle
+
+    def start_idle_reaper(self, interval=None):
+        """Start a daemon thread that periodically unloads idle models"""
+        if self._reaper is not None:
+            return
+        interval = interval or max(1, self.idle_timeout / 4)
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.unload_idle()
+
+        self._reaper = threading.Thread(target=reap, daemon=True)
+        self._reaper.start()
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    def is_ready(self):
+        """
+        Ready = default model has been loaded and warmed up
+
+        Stays ready after the default is idle-unloaded: the server can still
+        serve, the next request just reloads it.
+        """
+        return self._ready
+
+    def status(self):
+        return {
+            "default_model": self.default,
+            "available_models": {name: entry["size_mb"] for name, entry in self.registry.items()},
+            "loaded_models": sorted(self._models),
+            "loaded_size_mb": self._loaded_size_mb(),
+            "max_memory_mb": self.max_memory_mb,
+            "idle_timeout": self.idle_timeout,
+            "pin_default": self.pin_default,
+            "ready": self.is_ready()
+        }
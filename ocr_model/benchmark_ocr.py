@@ -0,0 +1,349 @@
+"""
+Reproducible OCR throughput and accuracy benchmark
+
+Runs the doctr predictor from ocr_server.get_ocr_model over a fixed image set:
+  - the PNGs in ../materials/ (accuracy only if listed in a ground-truth file)
+  - generated text renders at several resolutions (ground truth known)
+
+Records images/sec, detection vs recognition time, peak memory and
+character accuracy.
+
+Usage:
+    cd ocr_model
+    python benchmark_ocr.py --output baseline.json
+    python benchmark_ocr.py --ground-truth materials_truth.json --repeat 3
+    python benchmark_ocr.py --preprocess --output preprocessed.json
+    python benchmark_ocr.py --quantize dynamic --output int8.json
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from PIL import Image, ImageDraw, ImageFont
+
+OCR_DIR = os.path.dirname(os.path.abspath(__file__))
+MATERIALS_DIR = os.path.join(OCR_DIR, "..", "materials")
+
+# Fixed text for generated renders, so accuracy is comparable between runs
+RENDER_LINES = [
+    "INVOICE 2024-0173",
+    "Bill to: Northwind Traders",
+    "Quantity 12 Unit price 48.50",
+    "Subtotal 582.00 Tax 46.56",
+    "Total due 628.56 EUR",
+    "Payment terms: net 30 days",
+]
+RENDER_SCALES = [0.5, 1.0, 2.0, 4.0]
+RENDER_BASE_FONT_SIZE = 28
+
+
+# ============================================================================
+# IMAGE SET
+# ============================================================================
+
+def render_text_image(lines, scale, path):
+    """Render black-on-white text lines at a given scale and save as PNG"""
+    font_size = max(8, int(RENDER_BASE_FONT_SIZE * scale))
+    font = ImageFont.load_default(size=font_size)
+    line_height = int(font_size * 1.6)
+    margin = int(40 * scale)
+    width = int(900 * scale)
+    height = margin * 2 + line_height * len(lines)
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_height), line, fill="black", font=font)
+    image.save(path)
+    return path
+
+
+def build_image_set(work_dir, ground_truth=None):
+    """
+    Return list of benchmark images
+
+    Returns:
+        list: dicts with name, path, pixels and expected text (None if unknown)
+    """
+    ground_truth = ground_truth or {}
+    images = []
+
+    for path in sorted(glob.glob(os.path.join(MATERIALS_DIR, "*.png"))):
+        name = os.path.basename(path)
+        images.append({"name": name, "path": path, "expected": ground_truth.get(name)})
+
+    for scale in RENDER_SCALES:
+        name = f"render_{scale}x.png"
+        path = render_text_image(RENDER_LINES, scale, os.path.join(work_dir, name))
+        images.append({"name": name, "path": path, "expected": "\n".join(RENDER_LINES)})
+
+    for image in images:
+        with Image.open(image["path"]) as img:
+            image["pixels"] = img.width * img.height
+
+    return images
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def levenshtein(a, b):
+    """Edit distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def character_accuracy(predicted, expected):
+    """1 - normalized edit distance, ignoring whitespace layout"""
+    predicted = " ".join(predicted.split())
+    expected = " ".join(expected.split())
+    if not expected:
+        return 1.0 if not predicted else 0.0
+    return max(0.0, 1 - levenshtein(predicted, expected) / len(expected))
+
+
+def reset_peak_rss():
+    """
+    Start a new peak-memory window (Linux only)
+
+    Writing 5 to /proc/self/clear_refs resets VmHWM, so each pass reports its
+    own peak instead of the highest one since the process started.
+
+    Returns:
+        bool: False where the peak cannot be reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb():
+    """Peak resident memory in MB since the last reset_peak_rss() (or process start)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """Accumulates time spent in a doctr sub-predictor via forward hooks"""
+
+    def __init__(self, module):
+        self.elapsed = 0.0
+        self._start = None
+        self._handles = [
+            module.register_forward_pre_hook(self._before),
+            module.register_forward_hook(self._after)
+        ]
+
+    def _before(self, module, inputs):
+        self._start = time.perf_counter()
+
+    def _after(self, module, inputs, output):
+        self.elapsed += time.perf_counter() - self._start
+
+    def remove(self):
+        for handle in self._handles:
+            handle.remove()
+
+
+def extract_text(result):
+    """Join recognized words the same way ocr_server does"""
+    lines = []
+    for page in result.pages:
+        for block in page.blocks:
+            for line in block.lines:
+                lines.append(" ".join(word.value for word in line.words))
+    return "\n".join(lines)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def run_benchmark(predictor, images, repeat=1, warmup=True, load_image=None):
+    """
+    Time the predictor over an image set
+
+    Args:
+        predictor: doctr OCRPredictor
+        images: Output of build_image_set
+        repeat: Passes over the image set (timings are averaged)
+        warmup: Run one untimed image first
+        load_image: Optional callable(path) -> doctr document; defaults to DocumentFile.from_images
+
+    Returns:
+        dict: Summary and per-image results
+    """
+    from doctr.io import DocumentFile
+
+    if load_image is None:
+        load_image = lambda path: DocumentFile.from_images([path])
+
+    det_timer = StageTimer(predictor.det_predictor)
+    reco_timer = StageTimer(predictor.reco_predictor)
+    # Otherwise an earlier pass (e.g. fp32 before int8) would set the peak
+    peak_per_pass = reset_peak_rss()
+
+    try:
+        if warmup and images:
+            predictor(load_image(images[0]["path"]))
+
+        results = []
+        for image in images:
+            det_timer.elapsed = reco_timer.elapsed = 0.0
+            load_time = total_time = 0.0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                doc = load_image(image["path"])
+                loaded = time.perf_counter()
+                result = predictor(doc)
+                load_time += loaded - start
+                total_time += time.perf_counter() - loaded
+
+            text = extract_text(result)
+            record = {
+                "name": image["name"],
+                "pixels": image["pixels"],
+                "load_s": load_time / repeat,
+                "total_s": total_time / repeat,
+                "detection_s": det_timer.elapsed / repeat,
+                "recognition_s": reco_timer.elapsed / repeat,
+                "chars": len(text),
+                "accuracy": character_accuracy(text, image["expected"]) if image["expected"] is not None else None
+            }
+            results.append(record)
+            print(
+                f"{record['name']:<45} {record['total_s']:7.3f}s "
+                f"(det {record['detection_s']:.3f}s, reco {record['recognition_s']:.3f}s)"
+                + (f"  acc {record['accuracy']:.1%}" if record["accuracy"] is not None else "")
+            )
+    finally:
+        det_timer.remove()
+        reco_timer.remove()
+
+    total_time = sum(r["load_s"] + r["total_s"] for r in results)
+    scored = [r["accuracy"] for r in results if r["accuracy"] is not None]
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "summary": {
+            "images": len(results),
+            "repeat": repeat,
+            "images_per_sec": len(results) / total_time if total_time else 0,
+            "detection_s": sum(r["detection_s"] for r in results),
+            "recognition_s": sum(r["recognition_s"] for r in results),
+            "mean_accuracy": sum(scored) / len(scored) if scored else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_rss_scope": "pass" if peak_per_pass else "process"
+        },
+        "results": results
+    }
+
+
+def print_summary(report):
+    summary = report["summary"]
+    print("=" * 60)
+    print(f"Images:        {summary['images']} (x{summary['repeat']})")
+    print(f"Throughput:    {summary['images_per_sec']:.2f} images/sec")
+    print(f"Detection:     {summary['detection_s']:.2f}s")
+    print(f"Recognition:   {summary['recognition_s']:.2f}s")
+    if summary["mean_accuracy"] is not None:
+        print(f"Char accuracy: {summary['mean_accuracy']:.1%}")
+    print(f"Peak RSS:      {summary['peak_rss_mb']:.0f} MB"
+          + ("" if summary["peak_rss_scope"] == "pass" else " (whole process, not this pass)"))
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR throughput and accuracy benchmark")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--ground-truth", help="JSON file mapping materials/ filenames to expected text")
+    parser.add_argument("--preprocess", action="store_true", help="Apply adaptive downscaling (preprocess.py)")
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--deskew", action="store_true")
+    parser.add_argument("--quantize", choices=["dynamic", "static"],
+                        help="Also run an int8 pass (quantize.py) and report deltas vs fp32")
+    parser.add_argument("--output", help="Write full JSON report to this file")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    ground_truth_path = os.path.abspath(args.ground_truth) if args.ground_truth else None
+
+    # Model files are resolved relative to the ocr_model directory
+    os.chdir(OCR_DIR)
+    # Always load fp32 first; the quantized pass is applied in place afterwards
+    os.environ["OCR_QUANTIZE"] = "none"
+    from ocr_server import get_ocr_model
+
+    ground_truth = None
+    if ground_truth_path:
+        with open(ground_truth_path) as f:
+            ground_truth = json.load(f)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        images = build_image_set(work_dir, ground_truth)
+        load_image = None
+        if args.preprocess:
+            from preprocess import preprocess_image
+            load_image = lambda path: [preprocess_image(path, grayscale=args.grayscale, deskew=args.deskew)[0]]
+        predictor = get_ocr_model()
+        report = run_benchmark(predictor, images, repeat=args.repeat, load_image=load_image)
+        report["preprocess"] = {"enabled": args.preprocess, "grayscale": args.grayscale, "deskew": args.deskew}
+        print_summary(report)
+
+        if args.quantize:
+            from quantize import quantize_predictor
+
+            fp32_summary = report["summary"]
+            quantization = quantize_predictor(predictor, args.quantize)
+            quantized = run_benchmark(predictor, images, repeat=args.repeat, load_image=load_image)
+            print_summary(quantized)
+
+            q_summary = quantized["summary"]
+            report = {
+                "fp32": report,
+                "quantized": quantized,
+                "quantization": quantization,
+                "delta": {
+                    "speedup": q_summary["images_per_sec"] / fp32_summary["images_per_sec"] if fp32_summary["images_per_sec"] else None,
+                    "accuracy": (q_summary["mean_accuracy"] - fp32_summary["mean_accuracy"])
+                                if q_summary["mean_accuracy"] is not None and fp32_summary["mean_accuracy"] is not None else None,
+                    "detection_s": q_summary["detection_s"] - fp32_summary["detection_s"],
+                    "recognition_s": q_summary["recognition_s"] - fp32_summary["recognition_s"]
+                }
+            }
+            print(f"int8 ({quantization['mode']}) vs fp32: {report['delta']['speedup']:.2f}x throughput"
+                  + (f", accuracy {report['delta']['accuracy']:+.1%}" if report["delta"]["accuracy"] is not None else ""))
+
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {output_path}")
@@ -1,101 +1,199 @@
 from flask import Flask, request, jsonify
 from doctr.models import ocr_predictor, detection, recognition
 from doctr.io import DocumentFile
+import numpy as np
 import os
+import sys
 import tempfile
 
+from preprocess import preprocess_image
+from quantize import quantize_predictor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_manager import ModelManager
+from job_queue import JobQueue, DEFAULT_PRIORITY, PRIORITIES
+
 app = Flask(__name__)
 
-# Global models - loaded once when server starts
-_ocr_predictor = None
+# Model registry: name -> doctr architectures (loaded from <arch>.pt) and approximate resident size
+OCR_MODELS = {
+    "mobilenet": {"det_arch": "db_mobilenet_v3_large", "reco_arch": "crnn_mobilenet_v3_small", "size_mb": 120},
+    "resnet": {"det_arch": "db_resnet50", "reco_arch": "crnn_vgg16_bn", "size_mb": 450},
+}
+DEFAULT_MODEL = os.getenv("OCR_MODEL", "mobilenet")
 
-def get_ocr_model():
-    """Load OCR models once from local files"""
-    global _ocr_predictor
-    if _ocr_predictor is None:
-        det_model_path = "db_mobilenet_v3_large.pt"
-        reco_model_path = "crnn_mobilenet_v3_small.pt"
+# Opt-in int8 CPU inference: "none" (default), "dynamic" or "static" (see quantize.py)
+QUANTIZE_MODE = os.getenv("OCR_QUANTIZE", "none")
+_quantization_info = {}  # model name -> quantization info
 
-        # Check if model files exist
-        if not os.path.exists(det_model_path):
-            raise FileNotFoundError(f"Detection model not found: {det_model_path}")
-        if not os.path.exists(reco_model_path):
-            raise FileNotFoundError(f"Recognition model not found: {reco_model_path}")
+# Adaptive downscaling before detection (see preprocess.py); per-request override via form field
+PREPROCESS_DEFAULT = os.getenv("OCR_PREPROCESS", "1") == "1"
 
-        print("Loading OCR models...")
 
-        # Load detection model (finds WHERE text is)
-        det_model = detection.db_mobilenet_v3_large(pretrained=False)
-        det_model.from_pretrained(det_model_path)
-        print("✓ Detection model loaded (finds text regions)")
+def _form_flag(name, default=False):
+    value = request.form.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
 
-        # Load recognition model (reads WHAT text says)
-        reco_model = recognition.crnn_mobilenet_v3_small(pretrained=False)
-        reco_model.from_pretrained(reco_model_path)
-        print("✓ Recognition model loaded (reads text)")
 
-        # Create predictor with both models
-        _ocr_predictor = ocr_predictor(
-            det_arch=det_model,
-            reco_arch=reco_model,
-            pretrained=False
-        )
-        print("✓ OCR Predictor ready (100% offline)")
+def _load_predictor(det_arch, reco_arch):
+    """Load OCR models from local files"""
+    det_model_path = f"{det_arch}.pt"
+    reco_model_path = f"{reco_arch}.pt"
 
-    return _ocr_predictor
+    # Check if model files exist
+    if not os.path.exists(det_model_path):
+        raise FileNotFoundError(f"Detection model not found: {det_model_path}")
+    if not os.path.exists(reco_model_path):
+        raise FileNotFoundError(f"Recognition model not found: {reco_model_path}")
 
+    print("Loading OCR models...")
 
-@app.route('/ocr', methods=['POST'])
-def perform_ocr():
-    """Extract text from image"""
+    # Load detection model (finds WHERE text is)
+    det_model = getattr(detection, det_arch)(pretrained=False)
+    det_model.from_pretrained(det_model_path)
+    print(f"✓ Detection model loaded: {det_arch} (finds text regions)")
+
+    # Load recognition model (reads WHAT text says)
+    reco_model = getattr(recognition, reco_arch)(pretrained=False)
+    reco_model.from_pretrained(reco_model_path)
+    print(f"✓ Recognition model loaded: {reco_arch} (reads text)")
+
+    # Create predictor with both models
+    predictor = ocr_predictor(
+        det_arch=det_model,
+        reco_arch=reco_model,
+        pretrained=False
+    )
+    print("✓ OCR Predictor ready (100% offline)")
+    return predictor
+
+
+def _load_model(name):
+    entry = OCR_MODELS[name]
+    predictor = _load_predictor(entry["det_arch"], entry["reco_arch"])
+    _quantization_info[name] = quantize_predictor(predictor, QUANTIZE_MODE)
+    return predictor
+
+
+def _warmup(predictor):
+    """Run a blank page through detection + recognition once"""
+    predictor([np.full((512, 512, 3), 255, dtype=np.uint8)])
+
+
+model_manager = ModelManager(
+    registry={
+        name: {
+            "loader": lambda name=name: _load_model(name),
+            "size_mb": entry["size_mb"],
+            "warmup": _warmup
+        }
+        for name, entry in OCR_MODELS.items()
+    },
+    default=DEFAULT_MODEL,
+    max_memory_mb=int(os.getenv("MODEL_MEMORY_CAP_MB", "1000")),
+    idle_timeout=int(os.getenv("MODEL_IDLE_TIMEOUT", "600")),
+    pin_default=os.getenv("MODEL_PIN_DEFAULT", "0") == "1"
+)
+
+
+def get_ocr_model(name=None):
+    """Get an OCR predictor from the model manager (default model if name is None)"""
+    return model_manager.get(name)
+
+
+def run_ocr(temp_path, model_name, preprocess=True, grayscale=False, deskew=False):
+    """Run OCR on an image file on disk (deleted afterwards) and return the response body"""
     try:
-        # Get image file from request
-        if 'file' not in request.files:
-            return jsonify({"success": False, "error": "No file provided"}), 400
-
-        image_file = request.files['file']
-
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
-            image_file.save(f.name)
-            temp_path = f.name
-
-        # Perform OCR
-        print(f"Processing {image_file.filename}...")
-        predictor = get_ocr_model()
-
-        # Load document
-        doc = DocumentFile.from_images([temp_path])
-
-        # Run OCR (detection + recognition)
-        result = predictor(doc)
-
-        # Extract text from result
-        text_output = []
-        for page in result.pages:
-            for block in page.blocks:
-                for line in block.lines:
-                    line_text = " ".join([word.value for word in line.words])
-                    confidence = sum([word.confidence for word in line.words]) / len(line.words) if line.words else 0
-                    text_output.append({
-                        "text": line_text,
-                        "confidence": round(confidence, 3)
-                    })
-
-        # Combine all text
-        full_text = "\n".join([item["text"] for item in text_output])
+        predictor = get_ocr_model(model_name)
 
+        # Load document (downscaled to a working resolution unless disabled)
+        preprocessing = None
+        if preprocess:
+            page, preprocessing = preprocess_image(temp_path, grayscale=grayscale, deskew=deskew)
+            doc = [page]
+        else:
+            doc = DocumentFile.from_images([temp_path])
+    finally:
         # Cleanup
-        os.unlink(temp_path)
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
 
-        print(f"Extracted {len(text_output)} lines of text")
+    # Run OCR (detection + recognition)
+    result = predictor(doc)
 
-        return jsonify({
-            "success": True,
-            "text": full_text,
-            "lines": text_output,
-            "total_lines": len(text_output)
-        })
+    # Extract text from result
+    text_output = []
+    for page in result.pages:
+        for block in page.blocks:
+            for line in block.lines:
+                line_text = " ".join([word.value for word in line.words])
+                confidence = sum([word.confidence for word in line.words]) / len(line.words) if line.words else 0
+                text_output.append({
+                    "text": line_text,
+                    "confidence": round(confidence, 3)
+                })
+
+    # Combine all text
+    full_text = "\n".join([item["text"] for item in text_output])
+
+    print(f"Extracted {len(text_output)} lines of text")
+
+    return {
+        "success": True,
+        "text": full_text,
+        "lines": text_output,
+        "total_lines": len(text_output),
+        "preprocessing": preprocessing
+    }
+
+
+def _save_upload():
+    """Validate the multipart request and save the image to a temp file"""
+    if 'file' not in request.files:
+        raise ValueError("No file provided")
+
+    model_name = request.form.get('model') or DEFAULT_MODEL
+    if model_name not in OCR_MODELS:
+        raise ValueError(f"Unknown model: {model_name}")
+
+    image_file = request.files['file']
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as f:
+        image_file.save(f.name)
+        temp_path = f.name
+
+    print(f"Processing {image_file.filename}...")
+    return {
+        "path": temp_path,
+        "model": model_name,
+        "preprocess": _form_flag('preprocess', PREPROCESS_DEFAULT),
+        "grayscale": _form_flag('grayscale'),
+        "deskew": _form_flag('deskew')
+    }
+
+
+def _run_job(payload):
+    return run_ocr(
+        payload["path"], payload["model"],
+        preprocess=payload["preprocess"], grayscale=payload["grayscale"], deskew=payload["deskew"]
+    )
+
+
+# Async jobs: submit returns immediately, clients poll /jobs/<id> (or get a callback)
+job_queue = JobQueue(handler=_run_job, workers=int(os.getenv("JOB_WORKERS", "1")))
+
+
+@app.route('/ocr', methods=['POST'])
+def perform_ocr():
+    """Extract text from image (synchronous)"""
+    try:
+        payload = _save_upload()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        return jsonify(_run_job(payload))
 
     except Exception as e:
         print(f"Error: {e}")
@@ -107,31 +205,79 @@ def perform_ocr():
         }), 500
 
 
+@app.route('/jobs/ocr', methods=['POST'])
+def submit_ocr_job():
+    """Queue an OCR job; form fields as /ocr plus priority (interactive|bulk) and callback_url"""
+    priority = request.form.get('priority') or DEFAULT_PRIORITY
+    if priority not in PRIORITIES:
+        return jsonify({"success": False, "error": f"Unknown priority: {priority}"}), 400
+
+    try:
+        payload = _save_upload()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    job_id = job_queue.submit(
+        payload,
+        priority=priority,
+        callback_url=request.form.get('callback_url'),
+        on_expire=lambda payload: os.path.exists(payload["path"]) and os.unlink(payload["path"])
+    )
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status; includes the OCR result once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+    return jsonify({"success": True, **job})
+
+
 @app.route('/health', methods=['GET'])
 def health():
-    """Health check"""
+    """Liveness check - the process is up (models may still be loading)"""
+    status = model_manager.status()
     return jsonify({
         "status": "running",
-        "models_loaded": _ocr_predictor is not None,
-        "detection_model": "db_mobilenet_v3_large (16MB)",
-        "recognition_model": "crnn_mobilenet_v3_small (8MB)",
-        "total_size": "24MB",
+        "models_loaded": DEFAULT_MODEL in status["loaded_models"],
+        "detection_model": OCR_MODELS[DEFAULT_MODEL]["det_arch"],
+        "recognition_model": OCR_MODELS[DEFAULT_MODEL]["reco_arch"],
+        "models": status,
+        "quantization": {"requested": QUANTIZE_MODE, "loaded": _quantization_info},
+        "jobs": job_queue.stats(),
         "offline": True
     })
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness check - default model loaded and warmed up"""
+    status = model_manager.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
 if __name__ == '__main__':
     PORT = 8002
 
     print("=" * 60)
     print(f"OCR Server Starting on Port {PORT}")
     print("=" * 60)
-    print("Models:")
-    print("  - Detection:    db_mobilenet_v3_large.pt (finds text regions)")
-    print("  - Recognition:  crnn_mobilenet_v3_small.pt (reads text)")
+    print(f"Models (default: {DEFAULT_MODEL}, quantization: {QUANTIZE_MODE}):")
+    for name, entry in OCR_MODELS.items():
+        print(f"  - {name}: {entry['det_arch']}.pt + {entry['reco_arch']}.pt")
     print("=" * 60)
     print(f"POST http://localhost:{PORT}/ocr")
     print(f"GET  http://localhost:{PORT}/health")
+    print(f"GET  http://localhost:{PORT}/ready")
+    print(f"POST http://localhost:{PORT}/jobs/ocr")
+    print(f"GET  http://localhost:{PORT}/jobs/<job_id>")
     print("=" * 60)
 
+    # Load and warm the default model in the background so /health answers immediately
+    import threading
+    threading.Thread(target=model_manager.warmup, daemon=True).start()
+    model_manager.start_idle_reaper()
+
     app.run(host='0.0.0.0', port=PORT, debug=False)
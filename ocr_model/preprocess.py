@@ -0,0 +1,143 @@
+"""
+Image preprocessing before OCR
+
+Large phone photos are downscaled to a working resolution chosen from the
+estimated text size: text is kept at least MIN_TEXT_HEIGHT pixels tall (so
+small print survives) and the image is capped at MAX_PIXELS. Optional
+grayscale conversion and deskew.
+"""
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(4_000_000)))
+TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32"))  # px per text line
+MIN_TEXT_HEIGHT = 16  # never shrink text below this
+
+# Text size is estimated on a reduced copy to keep preprocessing cheap
+ANALYSIS_MAX_SIDE = 1500
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+
+
+def _to_gray_array(image, max_side=ANALYSIS_MAX_SIDE):
+    """Reduced grayscale copy for analysis, plus the factor it was reduced by"""
+    factor = min(1.0, max_side / max(image.size))
+    small = image.convert("L")
+    if factor < 1.0:
+        small = small.resize((max(1, int(image.width * factor)), max(1, int(image.height * factor))), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32), factor
+
+
+def _ink_mask(gray):
+    """Dark-on-light binarization with a mean/std threshold"""
+    return gray < (gray.mean() - 0.5 * gray.std())
+
+
+def estimate_text_height(image):
+    """
+    Estimate typical text line height in pixels of the original image
+
+    Uses the horizontal ink profile: consecutive rows containing ink form a
+    text line; the median run length is the line height.
+
+    Returns:
+        float: Estimated line height, or None if no text-like rows are found
+    """
+    gray, factor = _to_gray_array(image)
+    ink = _ink_mask(gray)
+    row_ink = ink.mean(axis=1)
+    text_rows = row_ink > max(0.01, row_ink.mean() * 0.25)
+
+    runs = []
+    run = 0
+    for is_text in text_rows:
+        if is_text:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    if run:
+        runs.append(run)
+
+    # Ignore single-row specks and huge blocks (photos, borders)
+    runs = [r for r in runs if 2 <= r <= len(text_rows) * 0.25]
+    if not runs:
+        return None
+    return float(np.median(runs)) / factor
+
+
+def estimate_skew(image):
+    """Estimate skew angle (degrees) by maximizing row-profile sharpness"""
+    gray, _ = _to_gray_array(image, max_side=800)
+    ink = Image.fromarray((_ink_mask(gray) * 255).astype(np.uint8))
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP, DESKEW_STEP):
+        profile = np.asarray(ink.rotate(angle, resample=Image.NEAREST, expand=True), dtype=np.float32).sum(axis=1)
+        score = float(np.var(profile))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def choose_scale(image, text_height=None, max_pixels=MAX_PIXELS, target_text_height=TARGET_TEXT_HEIGHT):
+    """Pick a downscale factor (<= 1.0) for the image"""
+    pixels = image.width * image.height
+    scale = 1.0
+
+    if text_height:
+        # Shrink until text is about target_text_height tall
+        scale = min(scale, target_text_height / text_height)
+    if pixels * scale * scale > max_pixels:
+        scale = min(scale, (max_pixels / pixels) ** 0.5)
+    if text_height:
+        # ...but never push small print below the readable minimum
+        scale = max(scale, min(1.0, MIN_TEXT_HEIGHT / text_height))
+        # The pixel cap still wins over the text-size floor
+        if pixels * scale * scale > max_pixels:
+            scale = (max_pixels / pixels) ** 0.5
+    return min(1.0, scale)
+
+
+def preprocess_image(path_or_image, grayscale=False, deskew=False, max_pixels=MAX_PIXELS):
+    """
+    Prepare an image for OCR
+
+    Args:
+        path_or_image: File path or PIL image
+        grayscale: Convert to grayscale (kept as 3 channels for doctr)
+        deskew: Estimate and correct small rotations (up to ±5°)
+        max_pixels: Upper bound on working resolution
+
+    Returns:
+        tuple: (H x W x 3 uint8 array for the predictor, info dict)
+    """
+    image = Image.open(path_or_image) if isinstance(path_or_image, str) else path_or_image
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    original_size = image.size
+
+    text_height = estimate_text_height(image)
+    scale = choose_scale(image, text_height, max_pixels)
+    if scale < 1.0:
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+
+    angle = 0.0
+    if deskew:
+        angle = estimate_skew(image)
+        if angle:
+            image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor="white")
+
+    if grayscale:
+        image = image.convert("L").convert("RGB")
+
+    info = {
+        "original_size": list(original_size),
+        "working_size": list(image.size),
+        "scale": round(scale, 3),
+        "estimated_text_height": round(text_height, 1) if text_height else None,
+        "deskew_angle": angle,
+        "grayscale": grayscale
+    }
+    return np.asarray(image), info
@@ -0,0 +1,112 @@
+"""
+Int8 quantized CPU inference for the OCR predictor
+
+Modes:
+  - "dynamic": int8 dynamic quantization of the recognition model's
+    LSTM/Linear layers. No calibration needed. Detection stays fp32: DBNet is
+    convolutions, which dynamic quantization does not touch.
+  - "static":  dynamic mode plus FX static int8 quantization of the
+    detection backbone, calibrated on a local image set. Falls back to
+    dynamic mode (fp32 detection) if the backbone cannot be traced.
+"""
+import glob
+import os
+
+import torch
+from torch import nn
+
+QUANTIZE_MODES = ("none", "dynamic", "static")
+DEFAULT_CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "materials")
+
+
+def _select_engine():
+    """Pick the quantized kernel backend for this CPU"""
+    supported = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in supported:
+            torch.backends.quantized.engine = engine
+            return engine
+    return torch.backends.quantized.engine
+
+
+def _quantize_dynamic(module):
+    return torch.ao.quantization.quantize_dynamic(
+        module, {nn.Linear, nn.LSTM, nn.GRU}, dtype=torch.qint8
+    )
+
+
+def calibration_pages(calibration_dir=DEFAULT_CALIBRATION_DIR, limit=16):
+    """Load calibration images the same way /ocr does (preprocessed pages)"""
+    from preprocess import preprocess_image
+
+    paths = sorted(
+        glob.glob(os.path.join(calibration_dir, "*.png"))
+        + glob.glob(os.path.join(calibration_dir, "*.jpg"))
+    )[:limit]
+    return [preprocess_image(path)[0] for path in paths]
+
+
+def _quantize_detection_backbone(predictor, pages, engine):
+    """FX static int8 quantization of the DBNet feature extractor"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    det_model = predictor.det_predictor.model
+    backbone = det_model.feat_extractor.eval()
+    example_inputs = (torch.zeros(1, 3, 1024, 1024),)
+
+    prepared = prepare_fx(backbone, get_default_qconfig_mapping(engine), example_inputs)
+    det_model.feat_extractor = prepared
+
+    try:
+        # Calibration: run the whole predictor so observers see real preprocessed inputs
+        with torch.inference_mode():
+            for page in pages:
+                predictor([page])
+        det_model.feat_extractor = convert_fx(prepared)
+    except Exception:
+        det_model.feat_extractor = backbone
+        raise
+
+
+def quantize_predictor(predictor, mode, calibration_dir=DEFAULT_CALIBRATION_DIR):
+    """
+    Quantize an OCR predictor in place
+
+    Args:
+        predictor: doctr OCRPredictor
+        mode: "none", "dynamic" or "static"
+        calibration_dir: Image folder used to calibrate static quantization
+
+    Returns:
+        dict: Quantization info for /health and benchmark reports
+    """
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'. Use one of: {', '.join(QUANTIZE_MODES)}")
+
+    info = {"mode": mode, "engine": None, "detection": "fp32", "recognition": "fp32"}
+    if mode == "none":
+        return info
+
+    engine = _select_engine()
+    info["engine"] = engine
+
+    reco_predictor = predictor.reco_predictor
+    reco_predictor.model = _quantize_dynamic(reco_predictor.model.eval())
+    info["recognition"] = "int8-dynamic"
+
+    if mode == "static":
+        pages = calibration_pages(calibration_dir)
+        if not pages:
+            print(f"⚠ No calibration images in {calibration_dir}; using dynamic quantization only")
+            info["mode"] = "dynamic"
+            return info
+        try:
+            _quantize_detection_backbone(predictor, pages, engine)
+            info["detection"] = f"int8-static backbone ({len(pages)} calibration images)"
+        except Exception as e:
+            print(f"⚠ Static quantization of detection backbone failed ({e}); using dynamic only")
+            info["mode"] = "dynamic"
+
+    print(f"✓ OCR predictor quantized: {info}")
+    return info
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+import db_utils
+
+# Opt-in cache of Gemini responses for requests that don't depend on
+# conversation state (SQL generation, the first turn of a chat). Keys cover
+# the model, system prompt, normalized message text and content hashes of
+# any attachments, so the same question about the same OCR'd form or CSV
+# is answered from DuckDB instead of the API.
+CACHE_ENABLED_DEFAULT = os.getenv("GEMINI_CACHE", "0") == "1"
+DEFAULT_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(24 * 3600)))
+DEFAULT_MAX_TOTAL_BYTES = int(os.getenv("GEMINI_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+def _normalize_part(part):
+    """JSON-serializable fingerprint of one message part"""
+    if isinstance(part, str):
+        # Whitespace differences don't change the answer
+        return {"text": " ".join(part.split())}
+    if isinstance(part, (bytes, bytearray)):
+        return {"bytes": hashlib.sha256(part).hexdigest()}
+    inline_data = getattr(part, "inline_data", None)
+    if inline_data is not None:
+        # google.genai types.Part carrying image bytes
+        return {"bytes": hashlib.sha256(inline_data.data).hexdigest(), "mime_type": inline_data.mime_type}
+    if hasattr(part, "tobytes") and hasattr(part, "mode") and hasattr(part, "size"):
+        # PIL image: hash the decoded pixels, not the file (re-saves hit the same entry)
+        digest = hashlib.sha256(part.tobytes()).hexdigest()
+        return {"image": digest, "mode": part.mode, "size": list(part.size)}
+    raise TypeError(f"Cannot build a cache key for {type(part).__name__}")
+
+
+def make_key(model, system_prompt, parts):
+    """
+    Cache key for a request
+
+    Args:
+        model: Gemini model name
+        system_prompt: System instruction (or a fixed label for one-off prompts)
+        parts: Message parts (strings, bytes, PIL images or image Parts)
+
+    Returns:
+        str: sha256 hex digest
+    """
+    payload = {
+        "model": model,
+        "system_prompt": " ".join((system_prompt or "").split()),
+        "parts": [_normalize_part(part) for part in parts]
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get(cache_key, ttl_seconds=DEFAULT_TTL_SECONDS):
+    """Return the cached response text, or None on a miss or expired entry"""
+    connection = db_utils.get_db_connection()
+    row = connection.execute(
+        "SELECT response_text, created_at FROM gemini_cache WHERE cache_key = ?", (cache_key,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    response_text, created_at = row
+    if created_at < datetime.now() - timedelta(seconds=ttl_seconds):
+        connection.execute("DELETE FROM gemini_cache WHERE cache_key = ?", (cache_key,))
+        return None
+
+    connection.execute(
+        "UPDATE gemini_cache SET last_used = ?, hits = hits + 1 WHERE cache_key = ?",
+        (datetime.now(), cache_key)
+    )
+    return response_text
+
+
+def put(cache_key, model, response_text, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES):
+    """Store a response and evict least recently used entries above the size cap"""
+    connection = db_utils.get_db_connection()
+    now = datetime.now()
+    size_bytes = len(response_text.encode("utf-8"))
+
+    connection.execute("DELETE FROM gemini_cache WHERE cache_key = ?", (cache_key,))
+    connection.execute(
+        "INSERT INTO gemini_cache VALUES (?, ?, ?, ?, ?, ?, 0)",
+        (cache_key, model, response_text, size_bytes, now, now)
+    )
+    evict(max_total_bytes=max_total_bytes)
+
+
+def evict(ttl_seconds=DEFAULT_TTL_SECONDS, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES):
+    """
+    Drop expired entries, then least recently used ones until under max_total_bytes
+
+    Returns:
+        int: Number of entries removed
+    """
+    connection = db_utils.get_db_connection()
+    cutoff = datetime.now() - timedelta(seconds=ttl_seconds)
+
+    removed = connection.execute(
+        "SELECT COUNT(*) FROM gemini_cache WHERE created_at < ?", (cutoff,)
+    ).fetchone()[0]
+    connection.execute("DELETE FROM gemini_cache WHERE created_at < ?", (cutoff,))
+
+    total_bytes = connection.execute(
+        "SELECT COALESCE(SUM(size_bytes), 0) FROM gemini_cache"
+    ).fetchone()[0]
+    if total_bytes > max_total_bytes:
+        lru = connection.execute(
+            "SELECT cache_key, size_bytes FROM gemini_cache ORDER BY last_used"
+        ).fetchall()
+        for cache_key, size_bytes in lru:
+            if total_bytes <= max_total_bytes:
+                break
+            connection.execute("DELETE FROM gemini_cache WHERE cache_key = ?", (cache_key,))
+            total_bytes -= size_bytes
+            removed += 1
+
+    return removed
+
+
+def get_cache_stats():
+    """Entry count, total size and hit count of the cache"""
+    connection = db_utils.get_db_connection()
+    entries, total_bytes, hits = connection.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0) FROM gemini_cache"
+    ).fetchone()
+    return {"entries": entries, "total_bytes": total_bytes, "hits": hits}
+
+
+def clear():
+    """Remove every cached response"""
+    db_utils.get_db_connection().execute("DELETE FROM gemini_cache")
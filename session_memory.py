@@ -0,0 +1,313 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+
+import upload_store
+
+# Per-session memory accounting for the Streamlit app.
+#
+# Every open tab keeps its attachment data and Gemini chat object in process
+# memory. This module estimates each session's footprint, spills large
+# attachments to disk once a session goes over its budget or sits idle, and
+# keeps the chat objects in a process-wide registry so idle sessions' chats can
+# be dropped (they are rebuilt from the saved history on the next message).
+SESSION_BUDGET_BYTES = int(os.getenv("SESSION_MEMORY_BUDGET_MB", "32")) * 1024 * 1024
+PROCESS_BUDGET_BYTES = int(os.getenv("PROCESS_SESSION_MEMORY_MB", "1024")) * 1024 * 1024
+IDLE_CHAT_SECONDS = int(os.getenv("IDLE_CHAT_SECONDS", "900"))
+SPILL_THRESHOLD_BYTES = 256 * 1024  # smaller values stay in memory
+SPILL_DIR = os.path.join(upload_store.UPLOAD_ROOT, "spill")
+# Spill dirs untouched this long belong to sessions that are gone (e.g. from
+# before a restart) and are swept at startup and by the maintenance job
+SPILL_MAX_AGE_SECONDS = int(os.getenv("SPILL_MAX_AGE_HOURS", "24")) * 3600
+
+# Session state keys that hold attachment data, and which of them can be spilled
+ATTACHMENT_KEYS = ("file_context", "image_data", "csv_info", "audio_transcription", "ocr_result", "vision_payload")
+SPILLABLE_KEYS = ("file_context", "audio_transcription", "vision_payload")
+
+
+class Spilled:
+    """
+    Placeholder for a value moved to disk
+
+    Text values are stored as .txt; payload dicts (vision_payload) as their
+    "data" bytes in a .bin file, with the other, small fields kept in `fields`.
+    """
+
+    def __init__(self, path, size_bytes, fields=None):
+        self.path = path
+        self.size_bytes = size_bytes
+        self.fields = fields
+
+    def __bool__(self):
+        return self.size_bytes > 0
+
+
+def load(value):
+    """Return the real value, reading it back from disk if it was spilled"""
+    if not isinstance(value, Spilled):
+        return value
+    # Keep the directory's mtime fresh so the stale-dir sweep leaves it alone
+    os.utime(os.path.dirname(value.path))
+    if value.fields is not None:
+        with open(value.path, "rb") as f:
+            return {**value.fields, "data": f.read()}
+    with open(value.path, encoding="utf-8") as f:
+        return f.read()
+
+
+def estimate_size(value, _depth=0):
+    """Rough resident size of a session state value in bytes"""
+    if value is None or _depth > 4:
+        return 0
+    if isinstance(value, Spilled):
+        return sys.getsizeof(value)
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    if hasattr(value, "getbands") and hasattr(value, "size"):
+        # PIL image: decoded pixel buffer (lazily opened images count as if loaded)
+        return value.size[0] * value.size[1] * len(value.getbands())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v, _depth + 1) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v, _depth + 1) for v in value)
+    return sys.getsizeof(value)
+
+
+def estimate_chat_size(chat):
+    """Approximate size of a Gemini chat's history"""
+    total = 0
+    for content in chat.get_history():
+        for part in content.parts or []:
+            if part.text:
+                total += len(part.text)
+            elif part.inline_data is not None:
+                total += len(part.inline_data.data or b"")
+    return total
+
+
+class SessionMemory:
+    """
+    Process-wide registry of session footprints and Gemini chat objects
+
+    Args:
+        session_budget: Bytes of attachment data a session may hold before spilling
+        process_budget: Bytes across all sessions before idle chats are evicted early
+        idle_seconds: Sessions inactive this long have their chat dropped and
+            attachments spilled (and are forgotten once the tab is gone)
+    """
+
+    def __init__(self, session_budget=SESSION_BUDGET_BYTES, process_budget=PROCESS_BUDGET_BYTES,
+                 idle_seconds=IDLE_CHAT_SECONDS):
+        self.session_budget = session_budget
+        self.process_budget = process_budget
+        self.idle_seconds = idle_seconds
+
+        # session_id -> {"attachments": bytes, "last_active": monotonic,
+        #                "state": thread-safe session state (to spill idle sessions),
+        #                "is_active": callable() -> False once the tab is gone}
+        self._sessions = {}
+        self._chats = {}      # session_id -> (chat, estimated bytes)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Chat objects
+    # ------------------------------------------------------------------
+
+    def get_chat(self, session_id):
+        with self._lock:
+            entry = self._chats.get(session_id)
+            return entry[0] if entry else None
+
+    def set_chat(self, session_id, chat):
+        with self._lock:
+            self._chats[session_id] = (chat, estimate_chat_size(chat))
+
+    def refresh_chat_size(self, session_id):
+        """Re-measure a chat after new messages were sent"""
+        with self._lock:
+            entry = self._chats.get(session_id)
+            if entry:
+                self._chats[session_id] = (entry[0], estimate_chat_size(entry[0]))
+
+    def drop_chat(self, session_id):
+        with self._lock:
+            self._chats.pop(session_id, None)
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+
+    def update(self, session_id, session_state, shared_state=None, is_active=None):
+        """
+        Measure a session after its script run, spill over-budget attachments,
+        and evict idle sessions
+
+        Args:
+            session_id: The app's session id
+            session_state: This run's session state
+            shared_state: The same state as an object other sessions' threads
+                may read and write (lets evict_idle spill this session later)
+            is_active: callable() -> False once the session is gone for good;
+                without it a session idle for idle_seconds is assumed gone
+
+        Returns:
+            int: The session's footprint in bytes
+        """
+        attachment_bytes = sum(estimate_size(_get(session_state, key)) for key in ATTACHMENT_KEYS)
+
+        if attachment_bytes > self.session_budget:
+            attachment_bytes -= spill(session_id, session_state)
+
+        with self._lock:
+            self._sessions[session_id] = {
+                "attachments": attachment_bytes,
+                "last_active": time.monotonic(),
+                "state": shared_state,
+                "is_active": is_active
+            }
+
+        self.evict_idle()
+        return attachment_bytes + self._chat_bytes(session_id)
+
+    def _chat_bytes(self, session_id):
+        with self._lock:
+            entry = self._chats.get(session_id)
+            return entry[1] if entry else 0
+
+    def evict_idle(self):
+        """
+        Drop chats and spill attachments of idle sessions; over the process
+        budget, do the same for the least recently active sessions until back
+        under it. Sessions that are gone are forgotten and their spill
+        directory deleted.
+
+        Returns:
+            int: Number of chats dropped
+        """
+        now = time.monotonic()
+        dropped = 0
+        with self._lock:
+            by_age = sorted(self._sessions.items(), key=lambda item: item[1]["last_active"])
+            total = self._total_bytes()
+
+        for session_id, info in by_age:
+            idle = now - info["last_active"] > self.idle_seconds
+            if not idle and total <= self.process_budget:
+                break
+            gone = idle and (info["is_active"] is None or not info["is_active"]())
+
+            with self._lock:
+                if session_id in self._chats:
+                    total -= self._chats.pop(session_id)[1]
+                    dropped += 1
+                if gone:
+                    total -= info["attachments"]
+                    self._sessions.pop(session_id, None)
+
+            if gone:
+                release(session_id)
+            elif info["state"] is not None and info["attachments"]:
+                # Idle tabs hold most of the memory: move their attachments to disk
+                freed = spill(session_id, info["state"])
+                total -= freed
+                with self._lock:
+                    current = self._sessions.get(session_id)
+                    if current is not None and current["last_active"] == info["last_active"]:
+                        current["attachments"] -= freed
+        return dropped
+
+    def _total_bytes(self):
+        return (sum(info["attachments"] for info in self._sessions.values())
+                + sum(size for _, size in self._chats.values()))
+
+    def stats(self):
+        """Total and per-session memory estimates"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "chats": len(self._chats),
+                "total_bytes": self._total_bytes(),
+                "attachment_bytes": sum(info["attachments"] for info in self._sessions.values()),
+                "chat_bytes": sum(size for _, size in self._chats.values())
+            }
+
+
+def _spill_dir(session_id):
+    """
+    Spill directory of a session
+
+    Named by a hash of the id, so a crafted session id can never point
+    outside SPILL_DIR; the resolved path is checked as well (symlinks).
+    """
+    directory = os.path.join(SPILL_DIR, hashlib.sha256(session_id.encode("utf-8")).hexdigest())
+    root = os.path.realpath(SPILL_DIR)
+    if os.path.commonpath([root, os.path.realpath(directory)]) != root:
+        raise ValueError(f"Spill directory for session {session_id!r} is outside {SPILL_DIR}")
+    return directory
+
+
+def _get(session_state, key):
+    # Works for st.session_state and for the runtime's SafeSessionState (no .get)
+    return session_state[key] if key in session_state else None
+
+
+def spill(session_id, session_state):
+    """
+    Move large attachment text and image payloads to disk
+
+    Returns:
+        int: Estimated bytes freed
+    """
+    freed = 0
+    for key in SPILLABLE_KEYS:
+        value = _get(session_state, key)
+        if isinstance(value, str) and len(value) >= SPILL_THRESHOLD_BYTES:
+            directory = _spill_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{key}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(value)
+            spilled = Spilled(path, len(value))
+        elif isinstance(value, dict) and len(value.get("data") or b"") >= SPILL_THRESHOLD_BYTES:
+            directory = _spill_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{key}.bin")
+            with open(path, "wb") as f:
+                f.write(value["data"])
+            spilled = Spilled(path, len(value["data"]), {k: v for k, v in value.items() if k != "data"})
+        else:
+            continue
+        freed += estimate_size(value) - estimate_size(spilled)
+        session_state[key] = spilled
+    return freed
+
+
+def release(session_id):
+    """Delete a session's spilled attachment data"""
+    shutil.rmtree(_spill_dir(session_id), ignore_errors=True)
+
+
+def sweep_spill_dirs(max_age_seconds=SPILL_MAX_AGE_SECONDS):
+    """
+    Delete spill directories not touched for max_age_seconds
+
+    Session state lives in process memory, so after a restart nothing refers
+    to the old directories any more. Other app processes sharing SPILL_DIR
+    keep theirs fresh through load().
+
+    Returns:
+        int: Number of directories removed
+    """
+    if not os.path.isdir(SPILL_DIR):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(SPILL_DIR):
+        path = os.path.join(SPILL_DIR, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -26,6 +26,10 @@ if check_port 8002; then
     echo "Killing process on port 8002..."
     lsof -ti:8002 | xargs kill -9 2>/dev/null
 fi
+if check_port 8003; then
+    echo "Killing process on port 8003..."
+    lsof -ti:8003 | xargs kill -9 2>/dev/null
+fi
 if check_port 8501; then
     echo "Killing process on port 8501..."
     lsof -ti:8501 | xargs kill -9 2>/dev/null
@@ -34,7 +38,7 @@ fi
 sleep 2
 
 # Start Whisper Server
-echo -e "\n${GREEN}[1/3] Starting Whisper Server (Port 8001)...${NC}"
+echo -e "\n${GREEN}[1/4] Starting Whisper Server (Port 8001)...${NC}"
 cd whisper_model
 python whisper_server.py > ../logs/whisper.log 2>&1 &
 WHISPER_PID=$!
@@ -45,7 +49,7 @@ echo "Whisper PID: $WHISPER_PID"
 sleep 2
 
 # Start OCR Server
-echo -e "\n${GREEN}[2/3] Starting OCR Server (Port 8002)...${NC}"
+echo -e "\n${GREEN}[2/4] Starting OCR Server (Port 8002)...${NC}"
 cd ocr_model
 python ocr_server.py > ../logs/ocr.log 2>&1 &
 OCR_PID=$!
@@ -55,8 +59,17 @@ echo "OCR PID: $OCR_PID"
 # Wait a bit
 sleep 2
 
+# Start Vosk Server
+echo -e "\n${GREEN}[3/4] Starting Vosk Server (Port 8003)...${NC}"
+python vosk_server.py > logs/vosk.log 2>&1 &
+VOSK_PID=$!
+echo "Vosk PID: $VOSK_PID"
+
+# Wait a bit
+sleep 2
+
 # Start Streamlit App
-echo -e "\n${GREEN}[3/3] Starting Streamlit App (Port 8501)...${NC}"
+echo -e "\n${GREEN}[4/4] Starting Streamlit App (Port 8501)...${NC}"
 streamlit run app_integrated.py > logs/streamlit.log 2>&1 &
 STREAMLIT_PID=$!
 echo "Streamlit PID: $STREAMLIT_PID"
@@ -69,16 +82,19 @@ echo ""
 echo "Process IDs:"
 echo "  Whisper:   $WHISPER_PID"
 echo "  OCR:       $OCR_PID"
+echo "  Vosk:      $VOSK_PID"
 echo "  Streamlit: $STREAMLIT_PID"
 echo ""
 echo "URLs:"
 echo "  Whisper:   http://localhost:8001/health"
 echo "  OCR:       http://localhost:8002/health"
+echo "  Vosk:      http://localhost:8003/health"
 echo "  Streamlit: http://localhost:8501"
 echo ""
 echo "Logs:"
 echo "  Whisper:   logs/whisper.log"
 echo "  OCR:       logs/ocr.log"
+echo "  Vosk:      logs/vosk.log"
 echo "  Streamlit: logs/streamlit.log"
 echo ""
 echo "To stop all services, run: ./stop_all.sh"
@@ -87,4 +103,5 @@ echo "========================================================"
 # Save PIDs to file for stopping later
 echo "$WHISPER_PID" > logs/whisper.pid
 echo "$OCR_PID" > logs/ocr.pid
+echo "$VOSK_PID" > logs/vosk.pid
 echo "$STREAMLIT_PID" > logs/streamlit.pid
@@ -28,11 +28,13 @@ kill_process() {
 
 kill_process "whisper"
 kill_process "ocr"
+kill_process "vosk"
 kill_process "streamlit"
 
 # Also kill by port as backup
 lsof -ti:8001 | xargs kill -9 2>/dev/null
 lsof -ti:8002 | xargs kill -9 2>/dev/null
+lsof -ti:8003 | xargs kill -9 2>/dev/null
 lsof -ti:8501 | xargs kill -9 2>/dev/null
 
 echo ""
@@ -1,6 +1,10 @@
 import whisper
 import os
 
+from whisper_model.vad_transcribe import SAMPLE_RATE, LONG_AUDIO_SECONDS, transcribe_with_vad
+
+MODEL_PATH = "tiny.pt"
+
 # Global model - loaded once and reused
 _whisper_model = None
 
@@ -8,7 +12,7 @@ def get_whisper_model():
     """Get or create Whisper model (lazy loading)"""
     global _whisper_model
     if _whisper_model is None:
-        model_path = "tiny.pt"
+        model_path = MODEL_PATH
         if not os.path.exists(model_path):
             raise FileNotFoundError(
                 f"Whisper model not found at '{model_path}'. "
@@ -35,8 +39,14 @@ def transcribe_audio_whisper(audio_file_path):
         if not os.path.exists(audio_file_path):
             raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
 
-        model = get_whisper_model()
-        result = model.transcribe(audio_file_path)
+        audio = whisper.load_audio(audio_file_path)
+
+        # Long recordings: drop silence, transcribe speech chunks in parallel
+        # (the pool workers load their own models)
+        if len(audio) / SAMPLE_RATE > LONG_AUDIO_SECONDS:
+            result = transcribe_with_vad(audio, MODEL_PATH)
+        else:
+            result = get_whisper_model().transcribe(audio)
 
         return result["text"].strip()
 
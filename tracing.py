@@ -0,0 +1,64 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Lightweight per-turn span recording. A trace is started when the app accepts
+# a chat message, so "total" covers only the turn itself, not rendering the
+# page that preceded it; span() is a no-op when no trace is active, so library
+# code (db_utils) can be instrumented unconditionally.
+
+_current_trace = ContextVar("current_trace", default=None)
+
+
+def start_turn():
+    """Start a new trace for the turn being handled and return its id"""
+    trace = {
+        "turn_id": str(uuid.uuid4()),
+        "started": time.perf_counter(),
+        "spans": []
+    }
+    _current_trace.set(trace)
+    return trace["turn_id"]
+
+
+@contextmanager
+def span(stage):
+    """Time a block and record it as a stage of the active trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace["spans"].append((stage, (time.perf_counter() - start) * 1000))
+
+
+def record(stage, duration_ms):
+    """Record a stage timed elsewhere (e.g. on a background thread) in the active trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["spans"].append((stage, duration_ms))
+
+
+def finish_turn():
+    """
+    End the active trace
+
+    Returns:
+        dict: turn_id and list of (stage, duration_ms) including a "total" stage,
+              or None if no trace is active
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    _current_trace.set(None)
+
+    total_ms = (time.perf_counter() - trace["started"]) * 1000
+    return {
+        "turn_id": trace["turn_id"],
+        "spans": trace["spans"] + [("total", total_ms)]
+    }
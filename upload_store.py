@@ -0,0 +1,315 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import db_utils
+
+# Blobs live at uploads/blobs/<first 2 hex chars>/<sha256>. The path has no
+# extension: the same bytes uploaded as a.csv and a.txt are one blob.
+# Sessions only hold references (upload_refs), so identical files uploaded
+# from many tabs are written to disk once.
+UPLOAD_ROOT = "uploads"
+BLOB_DIR = os.path.join(UPLOAD_ROOT, "blobs")
+
+# Streaming copy settings: uploads are copied in fixed-size chunks so peak
+# memory stays constant regardless of file size.
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+LARGE_FILE_THRESHOLD = 100 * 1024 * 1024  # 100 MB - show progress above this
+
+# Retention defaults for collect_garbage()
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_TOTAL_BYTES = 5 * 1024 * 1024 * 1024  # 5 GB
+# Quota eviction never removes blobs used (uploaded or queried) this recently
+DEFAULT_ACTIVE_HOURS = 24
+
+
+def blob_path(sha256):
+    """Return the on-disk path for a blob"""
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def _recorded_path(sha256):
+    """Path of a registered blob whose file still exists, or None"""
+    connection = db_utils.get_db_connection()
+    row = connection.execute(
+        "SELECT path FROM upload_blobs WHERE sha256 = ?", (sha256,)
+    ).fetchone()
+    if row and os.path.exists(row[0]):
+        return row[0]
+    return None
+
+
+def _register_blob(sha256, path, size_bytes, session_id, filename):
+    """
+    Record the blob (if new) and a reference from the session
+
+    Returns:
+        str: The blob's recorded path
+    """
+    connection = db_utils.get_db_connection()
+    now = datetime.now()
+
+    existing = connection.execute(
+        "SELECT path FROM upload_blobs WHERE sha256 = ?", (sha256,)
+    ).fetchone()
+    if existing and os.path.exists(existing[0]):
+        path = existing[0]
+        connection.execute(
+            "UPDATE upload_blobs SET last_used = ? WHERE sha256 = ?", (now, sha256)
+        )
+    else:
+        # New blob, or a row left behind by a file deleted outside the store
+        connection.execute("DELETE FROM upload_blobs WHERE sha256 = ?", (sha256,))
+        connection.execute(
+            "INSERT INTO upload_blobs VALUES (?, ?, ?, ?, ?)",
+            (sha256, path, size_bytes, now, now)
+        )
+
+    already_referenced = connection.execute(
+        "SELECT 1 FROM upload_refs WHERE session_id = ? AND sha256 = ? AND filename = ?",
+        (session_id, sha256, filename)
+    ).fetchone()
+    if not already_referenced:
+        connection.execute(
+            "INSERT INTO upload_refs VALUES (?, ?, ?, ?)",
+            (session_id, sha256, filename, now)
+        )
+    return path
+
+
+def get_upload_size(uploaded_file):
+    """Return the size of a file-like upload without reading it"""
+    size = getattr(uploaded_file, "size", None)
+    if size is not None:
+        return size
+    position = uploaded_file.tell()
+    uploaded_file.seek(0, os.SEEK_END)
+    size = uploaded_file.tell()
+    uploaded_file.seek(position)
+    return size
+
+
+def copy_in_chunks(source, destination, chunk_size=CHUNK_SIZE, progress_callback=None):
+    """
+    Copy a file-like object to an open binary file, hashing as it streams
+
+    Args:
+        source: Readable binary file-like object (read from its current position)
+        destination: Writable binary file
+        chunk_size: Bytes per read
+        progress_callback: Optional callable(bytes_copied)
+
+    Returns:
+        tuple: (sha256 hex digest, bytes copied)
+    """
+    digest = hashlib.sha256()
+    copied = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        destination.write(chunk)
+        copied += len(chunk)
+        if progress_callback:
+            progress_callback(copied)
+    return digest.hexdigest(), copied
+
+
+def hash_upload(uploaded_file, chunk_size=CHUNK_SIZE):
+    """
+    sha256 and size of an upload, without copying it
+
+    Streamlit's UploadedFile is already in memory, so it is hashed straight
+    from its buffer; other files are read in chunks.
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes)
+    """
+    if hasattr(uploaded_file, "getbuffer"):
+        with uploaded_file.getbuffer() as buffer:
+            return hashlib.sha256(buffer).hexdigest(), buffer.nbytes
+
+    digest = hashlib.sha256()
+    size_bytes = 0
+    uploaded_file.seek(0)
+    try:
+        while True:
+            chunk = uploaded_file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size_bytes += len(chunk)
+    finally:
+        uploaded_file.seek(0)
+    return digest.hexdigest(), size_bytes
+
+
+def store_upload(uploaded_file, session_id, chunk_size=CHUNK_SIZE, progress_callback=None):
+    """
+    Store an uploaded file in the content-addressed blob store
+
+    The upload is hashed first; duplicates of a stored blob are not written
+    at all. New content is streamed to a temp file in fixed-size chunks, so
+    the file is never held in memory a second time.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile (or any readable binary file with .name)
+        session_id: Session that references the file
+        chunk_size: Bytes per read
+        progress_callback: Optional callable(bytes_copied)
+
+    Returns:
+        str: Path of the stored blob (shared between sessions with identical content)
+    """
+    sha256, size_bytes = hash_upload(uploaded_file, chunk_size)
+    path = _recorded_path(sha256) or blob_path(sha256)
+
+    if os.path.exists(path):
+        # Dedup: identical content already stored, nothing to write
+        if progress_callback:
+            progress_callback(size_bytes)
+    else:
+        temp_dir = os.path.join(BLOB_DIR, "tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        uploaded_file.seek(0)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                written_sha256, _ = copy_in_chunks(uploaded_file, f, chunk_size, progress_callback)
+            if written_sha256 != sha256:
+                raise Exception("Upload changed while it was being stored")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic rename so concurrent uploads of the same file never see a partial blob
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            uploaded_file.seek(0)
+
+    return _register_blob(sha256, path, size_bytes, session_id, uploaded_file.name)
+
+
+def touch_blob(path):
+    """Mark a stored upload as in use (protects it from quota eviction)"""
+    connection = db_utils.get_db_connection()
+    connection.execute("UPDATE upload_blobs SET last_used = ? WHERE path = ?", (datetime.now(), path))
+
+
+def release_session(session_id):
+    """Drop all blob references held by a session (blobs are freed by collect_garbage)"""
+    connection = db_utils.get_db_connection()
+    connection.execute("DELETE FROM upload_refs WHERE session_id = ?", (session_id,))
+
+
+def _delete_blob(sha256, path):
+    connection = db_utils.get_db_connection()
+    connection.execute("DELETE FROM upload_refs WHERE sha256 = ?", (sha256,))
+    connection.execute("DELETE FROM upload_blobs WHERE sha256 = ?", (sha256,))
+    connection.execute("DELETE FROM csv_stats WHERE csv_path = ?", (path,))
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def get_store_usage():
+    """Return blob count, total size and reference count of the store"""
+    connection = db_utils.get_db_connection()
+    blob_count, total_bytes = connection.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM upload_blobs"
+    ).fetchone()
+    ref_count = connection.execute("SELECT COUNT(*) FROM upload_refs").fetchone()[0]
+    return {
+        "blobs": blob_count,
+        "total_bytes": total_bytes,
+        "references": ref_count
+    }
+
+
+def collect_garbage(max_age_days=DEFAULT_MAX_AGE_DAYS, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES,
+                    active_hours=DEFAULT_ACTIVE_HOURS):
+    """
+    Apply retention and size quota to the upload store
+
+    1. References older than max_age_days are expired.
+    2. Blobs with no remaining references are deleted.
+    3. If the store is still above max_total_bytes, least recently used
+       blobs are evicted (together with their references) until it fits.
+       Blobs used within active_hours are never evicted, since sessions
+       still querying them would be left with a missing file; the store
+       may then stay over quota (reported as over_quota_bytes).
+
+    Returns:
+        dict: Counts of expired references, deleted blobs, freed and over-quota bytes
+    """
+    connection = db_utils.get_db_connection()
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+
+    expired_refs = connection.execute(
+        "SELECT COUNT(*) FROM upload_refs WHERE created_at < ?", (cutoff,)
+    ).fetchone()[0]
+    connection.execute("DELETE FROM upload_refs WHERE created_at < ?", (cutoff,))
+
+    deleted_blobs = 0
+    freed_bytes = 0
+
+    unreferenced = connection.execute(
+        """SELECT b.sha256, b.path, b.size_bytes FROM upload_blobs b
+           WHERE NOT EXISTS (SELECT 1 FROM upload_refs r WHERE r.sha256 = b.sha256)"""
+    ).fetchall()
+    for sha256, path, size_bytes in unreferenced:
+        _delete_blob(sha256, path)
+        deleted_blobs += 1
+        freed_bytes += size_bytes
+
+    total_bytes = get_store_usage()["total_bytes"]
+    if total_bytes > max_total_bytes:
+        active_cutoff = datetime.now() - timedelta(hours=active_hours)
+        lru = connection.execute(
+            "SELECT sha256, path, size_bytes FROM upload_blobs WHERE last_used < ? ORDER BY last_used",
+            (active_cutoff,)
+        ).fetchall()
+        for sha256, path, size_bytes in lru:
+            if total_bytes <= max_total_bytes:
+                break
+            _delete_blob(sha256, path)
+            total_bytes -= size_bytes
+            deleted_blobs += 1
+            freed_bytes += size_bytes
+
+    return {
+        "expired_references": expired_refs,
+        "deleted_blobs": deleted_blobs,
+        "freed_bytes": freed_bytes,
+        "over_quota_bytes": max(0, get_store_usage()["total_bytes"] - max_total_bytes)
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Upload store maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gc_parser = subparsers.add_parser("gc", help="Expire old references and enforce the size quota")
+    gc_parser.add_argument("--max-age-days", type=int, default=DEFAULT_MAX_AGE_DAYS)
+    gc_parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_TOTAL_BYTES)
+    gc_parser.add_argument("--active-hours", type=int, default=DEFAULT_ACTIVE_HOURS)
+
+    subparsers.add_parser("usage", help="Show blob store usage")
+
+    args = parser.parse_args()
+
+    # The app runs gc itself (MAINTENANCE_INTERVAL_HOURS); on the default
+    # DuckDB backend this CLI only works while the app is stopped
+    try:
+        if args.command == "gc":
+            print(collect_garbage(args.max_age_days, args.max_bytes, args.active_hours))
+        else:
+            print(get_store_usage())
+    except db_utils.DatabaseLockedError as e:
+        sys.exit(f"error: {e}")
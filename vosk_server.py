@@ -0,0 +1,101 @@
+from flask import Flask, request, jsonify
+import os
+import tempfile
+import threading
+import time
+
+from vosk_stt_service import get_vosk_model, is_model_loaded, load_audio, recognizer_pool, transcribe_samples
+
+app = Flask(__name__)
+
+# Lightweight STT for short voice commands and for overflow when Whisper is busy.
+# One vosk.Model is shared by all requests; recognizers are pooled per sample rate.
+
+_started_at = time.time()
+_requests_served = 0
+_counter_lock = threading.Lock()
+
+
+@app.route('/transcribe', methods=['POST'])
+def transcribe():
+    """Transcribe an audio file (synchronous - Vosk is fast enough for short clips)"""
+    global _requests_served
+
+    if 'file' not in request.files:
+        return jsonify({"success": False, "error": "No file provided"}), 400
+
+    audio_file = request.files['file']
+    suffix = os.path.splitext(audio_file.filename or "")[1] or '.wav'
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+        audio_file.save(f.name)
+        temp_path = f.name
+
+    print(f"Received {audio_file.filename}")
+
+    try:
+        start = time.perf_counter()
+        # Any channel count / sample rate; downmixed and resampled in-process
+        audio, sample_rate = load_audio(temp_path)
+        duration = len(audio) / sample_rate
+        transcription = transcribe_samples(audio, sample_rate)
+        elapsed = time.perf_counter() - start
+
+        with _counter_lock:
+            _requests_served += 1
+
+        print(f"Result ({elapsed:.2f}s): {transcription}")
+
+        return jsonify({
+            "success": True,
+            "transcription": transcription,
+            "duration": round(duration, 2),
+            "engine": "vosk"
+        })
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+    finally:
+        # Cleanup
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Liveness check plus recognizer pool load"""
+    return jsonify({
+        "status": "running",
+        "model_loaded": is_model_loaded(),
+        "pool": recognizer_pool.stats(),
+        "requests_served": _requests_served,
+        "uptime_seconds": round(time.time() - _started_at)
+    })
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness check - model loaded"""
+    loaded = is_model_loaded()
+    return jsonify({"ready": loaded}), (200 if loaded else 503)
+
+
+if __name__ == '__main__':
+    PORT = 8003
+
+    print("=" * 50)
+    print(f"Vosk Server Starting on Port {PORT}")
+    print("=" * 50)
+    print(f"POST http://localhost:{PORT}/transcribe")
+    print(f"GET  http://localhost:{PORT}/health")
+    print(f"GET  http://localhost:{PORT}/ready")
+    print("=" * 50)
+
+    # Load the model in the background so /health answers immediately
+    threading.Thread(target=get_vosk_model, daemon=True).start()
+
+    app.run(host='0.0.0.0', port=PORT, debug=False, threaded=True)
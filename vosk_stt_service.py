@@ -2,30 +2,247 @@ import vosk
 import wave
 import json
 import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    # Optional: FLAC/OGG/Opus/MP3 and float WAV decoding (plain PCM WAV needs only the stdlib)
+    import soundfile
+except ImportError:
+    soundfile = None
 
 # Global model - loaded once and reused
 _vosk_model = None
+_vosk_model_lock = threading.Lock()
+
+# Recognizers kept per sample rate (creating one builds the decoding graph)
+RECOGNIZERS_PER_RATE = int(os.getenv("VOSK_RECOGNIZERS_PER_RATE", "4"))
+
+# Seconds of audio fed to the recognizer per AcceptWaveform call
+BLOCK_SECONDS = float(os.getenv("VOSK_BLOCK_SECONDS", "1.0"))
+DEFAULT_MODEL_SAMPLE_RATE = 16000
 
 def get_vosk_model():
     """Get or create Vosk model (lazy loading)"""
     global _vosk_model
-    if _vosk_model is None:
-        model_path = "vosk-model-small-en-us-0.15"
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(
-                f"Vosk model not found at '{model_path}'. "
-                "Please download from https://alphacephei.com/vosk/models"
-            )
-        _vosk_model = vosk.Model(model_path)
+    with _vosk_model_lock:
+        if _vosk_model is None:
+            model_path = os.getenv("VOSK_MODEL_PATH", "vosk-model-small-en-us-0.15")
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(
+                    f"Vosk model not found at '{model_path}'. "
+                    "Please download from https://alphacephei.com/vosk/models"
+                )
+            _vosk_model = vosk.Model(model_path)
     return _vosk_model
 
 
+def get_model_sample_rate():
+    """Sample rate the model was trained on (from conf/mfcc.conf)"""
+    model_path = os.getenv("VOSK_MODEL_PATH", "vosk-model-small-en-us-0.15")
+    try:
+        with open(os.path.join(model_path, "conf", "mfcc.conf")) as f:
+            for line in f:
+                if line.startswith("--sample-frequency="):
+                    return int(float(line.split("=", 1)[1]))
+    except OSError:
+        pass
+    return DEFAULT_MODEL_SAMPLE_RATE
+
+
+def is_model_loaded():
+    return _vosk_model is not None
+
+
+class RecognizerPool:
+    """
+    Reusable KaldiRecognizer instances per sample rate, sharing one vosk.Model
+
+    At most `size` recognizers exist per rate; callers beyond that wait for
+    one to be returned.
+    """
+
+    def __init__(self, size=RECOGNIZERS_PER_RATE):
+        self.size = size
+        self._idle = {}        # sample rate -> queue of idle recognizers
+        self._created = {}     # sample rate -> recognizers created so far
+        self._active = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, sample_rate):
+        """Borrow a reset recognizer for `sample_rate`"""
+        sample_rate = int(sample_rate)
+        with self._lock:
+            idle = self._idle.setdefault(sample_rate, queue.LifoQueue())
+            create = idle.empty() and self._created.get(sample_rate, 0) < self.size
+            if create:
+                self._created[sample_rate] = self._created.get(sample_rate, 0) + 1
+            self._waiting += 1
+
+        try:
+            if create:
+                try:
+                    recognizer = vosk.KaldiRecognizer(get_vosk_model(), sample_rate)
+                    # Text-only results keep the per-utterance JSON small
+                    recognizer.SetWords(False)
+                    recognizer.SetPartialWords(False)
+                except Exception:
+                    with self._lock:
+                        self._created[sample_rate] -= 1
+                    raise
+            else:
+                recognizer = idle.get()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._active += 1
+        try:
+            yield recognizer
+        finally:
+            recognizer.Reset()
+            with self._lock:
+                self._active -= 1
+            idle.put(recognizer)
+
+    def stats(self):
+        """Pool load (for /health and the app-side router)"""
+        with self._lock:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "capacity_per_rate": self.size,
+                "recognizers": dict(self._created)
+            }
+
+
+recognizer_pool = RecognizerPool()
+
+
+# ============================================================================
+# AUDIO DECODING
+# ============================================================================
+
+def _read_wav(path):
+    """Decode PCM WAV (8/16/24/32-bit, any channel count) with the stdlib"""
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        sample_rate = wf.getframerate()
+        data = wf.readframes(wf.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        as_int = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = (np.where(as_int >= 1 << 23, as_int - (1 << 24), as_int)).astype(np.float32) / (1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype="<i4").astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width * 8}-bit")
+
+    return samples.reshape(-1, channels), sample_rate
+
+
+def load_audio(path):
+    """
+    Decode an audio file to mono float32
+
+    PCM WAV is decoded with the stdlib; other formats (FLAC, OGG/Opus, MP3,
+    float WAV) need the optional soundfile package.
+
+    Returns:
+        tuple: (mono float32 samples in [-1, 1], sample rate)
+    """
+    try:
+        samples, sample_rate = _read_wav(path)
+    except (wave.Error, EOFError, ValueError) as wav_error:
+        if soundfile is None:
+            raise ValueError(f"Cannot decode audio ({wav_error}); install 'soundfile' for non-PCM-WAV formats")
+        samples, sample_rate = soundfile.read(path, dtype="float32", always_2d=True)
+
+    # Downmix to mono
+    if samples.shape[1] > 1:
+        samples = samples.mean(axis=1)
+    else:
+        samples = samples[:, 0]
+    return np.ascontiguousarray(samples, dtype=np.float32), sample_rate
+
+
+def resample(audio, source_rate, target_rate):
+    """Resample mono audio with linear interpolation (box-filtered first when downsampling)"""
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+
+    ratio = source_rate / target_rate
+    if ratio > 1:
+        # Crude anti-aliasing: average over the decimation window
+        width = int(round(ratio))
+        if width > 1:
+            audio = np.convolve(audio, np.full(width, 1.0 / width, dtype=np.float32), mode="same")
+
+    target_length = int(round(len(audio) / ratio))
+    positions = np.arange(target_length, dtype=np.float64) * ratio
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def to_pcm16(audio):
+    """Float samples -> little-endian 16-bit PCM bytes (what KaldiRecognizer expects)"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+# ============================================================================
+# TRANSCRIPTION
+# ============================================================================
+
+def transcribe_samples(audio, sample_rate, block_seconds=BLOCK_SECONDS):
+    """
+    Transcribe mono float32 audio (resampled to the model rate)
+
+    Args:
+        audio: Mono float32 samples
+        sample_rate: Sample rate of `audio`
+        block_seconds: Audio fed per AcceptWaveform call
+
+    Returns:
+        str: Transcribed text
+    """
+    model_rate = get_model_sample_rate()
+    pcm = to_pcm16(resample(audio, sample_rate, model_rate))
+    block_bytes = max(1, int(block_seconds * model_rate)) * 2
+
+    # Borrow a pooled recognizer for the model rate
+    with recognizer_pool.acquire(model_rate) as recognizer:
+        # Results are drained at each utterance endpoint (the recognizer
+        # drops them otherwise) and decoded once at the end
+        results = []
+        for offset in range(0, len(pcm), block_bytes):
+            if recognizer.AcceptWaveform(pcm[offset:offset + block_bytes]):
+                results.append(recognizer.Result())
+        results.append(recognizer.FinalResult())
+
+    texts = (json.loads(result).get("text", "") for result in results)
+    return " ".join(text for text in texts if text)
+
+
 def transcribe_audio_vosk(audio_file_path):
     """
     Transcribe audio file using Vosk
 
+    Accepts any channel count and sample rate; audio is downmixed and
+    resampled to the model rate in-process.
+
     Args:
-        audio_file_path: Path to WAV audio file
+        audio_file_path: Path to audio file (PCM WAV, or any soundfile format)
 
     Returns:
         str: Transcribed text
@@ -37,41 +254,8 @@ def transcribe_audio_vosk(audio_file_path):
         if not os.path.exists(audio_file_path):
             raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
 
-        # Open WAV file
-        wf = wave.open(audio_file_path, "rb")
-
-        # Validate audio format
-        if wf.getnchannels() != 1:
-            raise ValueError("Audio must be mono (1 channel)")
-        if wf.getsampwidth() != 2:
-            raise ValueError("Audio must be 16-bit")
-        if wf.getframerate() not in [8000, 16000, 32000, 48000]:
-            raise ValueError(f"Unsupported sample rate: {wf.getframerate()}")
-
-        # Create recognizer with actual sample rate
-        model = get_vosk_model()
-        recognizer = vosk.KaldiRecognizer(model, wf.getframerate())
-
-        # Process audio in chunks
-        transcription = ""
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-
-            if recognizer.AcceptWaveform(data):
-                result = json.loads(recognizer.Result())
-                if result.get("text"):
-                    transcription += result["text"] + " "
-
-        # Get final result
-        final_result = json.loads(recognizer.FinalResult())
-        if final_result.get("text"):
-            transcription += final_result["text"]
-
-        wf.close()
-
-        return transcription.strip()
+        audio, sample_rate = load_audio(audio_file_path)
+        return transcribe_samples(audio, sample_rate)
 
     except Exception as e:
         raise Exception(f"Vosk transcription failed: {str(e)}")
@@ -0,0 +1,78 @@
+"""
+CPU performance settings for Whisper inference
+
+- Explicit intra-op / inter-op thread counts, so several worker processes on
+  one host split the cores instead of oversubscribing them
+- Optional int8 dynamic quantization of the Linear layers
+- fp16 disabled on CPU (avoids the per-call FP16 fallback warning)
+
+Environment variables:
+    WHISPER_QUANTIZE            "int8" or "none" (default)
+    WHISPER_WORKERS_PER_HOST    worker processes sharing this host (default 1)
+    WHISPER_INTRA_OP_THREADS    default: cores / workers per host
+    WHISPER_INTER_OP_THREADS    default: 1
+"""
+import os
+import warnings
+
+import torch
+from torch import nn
+
+QUANTIZE_MODE = os.getenv("WHISPER_QUANTIZE", "none")
+WORKERS_PER_HOST = int(os.getenv("WHISPER_WORKERS_PER_HOST", "1"))
+
+# Options passed to every model.transcribe call on CPU
+TRANSCRIBE_OPTIONS = {"fp16": False}
+
+warnings.filterwarnings("ignore", message="FP16 is not supported on CPU")
+
+
+def default_intra_op_threads(workers=WORKERS_PER_HOST):
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """Set torch thread pools (call before the first inference in this process)"""
+    intra_op = intra_op or int(os.getenv("WHISPER_INTRA_OP_THREADS", "0")) or default_intra_op_threads()
+    inter_op = inter_op or int(os.getenv("WHISPER_INTER_OP_THREADS", "1"))
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError:
+        # Inter-op pool can only be sized once per process
+        pass
+    return {"intra_op_threads": torch.get_num_threads(), "inter_op_threads": torch.get_num_interop_threads()}
+
+
+def _to_plain_linear(model):
+    """Replace whisper's Linear subclass with nn.Linear so quantize_dynamic recognizes it"""
+    for name, child in model.named_children():
+        if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+            plain = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            plain.weight = child.weight
+            plain.bias = child.bias
+            setattr(model, name, plain)
+        else:
+            _to_plain_linear(child)
+    return model
+
+
+def quantize_model(model, mode=QUANTIZE_MODE):
+    """Apply the configured quantization to a loaded Whisper model"""
+    if mode == "none":
+        return model
+    if mode != "int8":
+        raise ValueError(f"Unknown WHISPER_QUANTIZE mode '{mode}'. Use 'int8' or 'none'")
+    model = _to_plain_linear(model.eval())
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def describe():
+    """Current CPU performance configuration (for /health)"""
+    return {
+        "quantize": QUANTIZE_MODE,
+        "workers_per_host": WORKERS_PER_HOST,
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+        "fp16": TRANSCRIBE_OPTIONS["fp16"]
+    }
@@ -0,0 +1,269 @@
+"""
+Load generator for the local Whisper server
+
+Replays a corpus of WAV/MP3 clips against /transcribe and reports
+throughput, latency percentiles, error rate and server RSS over time.
+
+Usage:
+    python load_test.py clips/ --concurrency 4 --requests 200
+    python load_test.py clips/ --concurrency 8 --rate 2.5 --duration 120 --output run.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_URL = "http://localhost:8001"
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def load_corpus(corpus_dir):
+    """Return sorted list of audio clip paths in a directory"""
+    clips = sorted(
+        os.path.join(corpus_dir, name)
+        for name in os.listdir(corpus_dir)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+    if not clips:
+        raise FileNotFoundError(f"No .wav/.mp3 clips found in {corpus_dir}")
+    return clips
+
+
+def read_rss_mb(pid):
+    """Read resident memory of a process in MB (None if unavailable)"""
+    try:
+        output = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(pid)],
+            capture_output=True, text=True, timeout=2
+        ).stdout.strip()
+        return int(output) / 1024 if output else None
+    except Exception:
+        return None
+
+
+def find_server_pid():
+    """Use the PID written by start_all.sh, if present"""
+    for pid_file in ("../logs/whisper.pid", "logs/whisper.pid"):
+        if os.path.exists(pid_file):
+            with open(pid_file) as f:
+                return int(f.read().strip())
+    return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class RssSampler(threading.Thread):
+    """Samples server RSS at a fixed interval until stopped"""
+
+    def __init__(self, pid, interval, started):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.started = started
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss_mb = read_rss_mb(self.pid)
+            if rss_mb is not None:
+                self.samples.append({
+                    "t": round(time.perf_counter() - self.started, 3),
+                    "rss_mb": round(rss_mb, 1)
+                })
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def send_clip(url, clip_path, timeout, scheduled_at=None):
+    """
+    POST one clip and return a result record
+
+    Latency is measured from scheduled_at (the request's arrival time) when
+    given, so time spent waiting for a free worker counts - otherwise an
+    overloaded open-loop run would hide its queueing delay.
+    """
+    picked_up = time.perf_counter()
+    start = picked_up if scheduled_at is None else scheduled_at
+    try:
+        with open(clip_path, "rb") as f:
+            response = requests.post(f"{url}/transcribe", files={"file": f}, timeout=timeout)
+        ok = response.status_code == 200 and response.json().get("success", False)
+        error = None if ok else f"HTTP {response.status_code}"
+    except Exception as e:
+        ok = False
+        error = str(e)
+    return {
+        "clip": os.path.basename(clip_path),
+        "ok": ok,
+        "error": error,
+        "latency_s": time.perf_counter() - start,
+        "client_wait_s": picked_up - start
+    }
+
+
+def run_load_test(url, clips, concurrency, total_requests=None, duration=None,
+                  rate=None, timeout=300, server_pid=None, rss_interval=1.0, seed=0):
+    """
+    Replay clips against the server
+
+    Args:
+        url: Server base URL (must be local)
+        clips: List of clip paths, replayed round-robin
+        concurrency: Max in-flight requests
+        total_requests: Stop after this many requests (default: one pass over the corpus)
+        duration: Stop submitting after this many seconds
+        rate: Mean arrivals per second (Poisson); None = closed loop at full concurrency
+        timeout: Per-request timeout in seconds
+        server_pid: PID to sample RSS from (optional)
+        rss_interval: Seconds between RSS samples
+
+    Returns:
+        dict: Config, summary statistics, per-request results and RSS samples
+    """
+    host = urlparse(url).hostname
+    if host not in LOCAL_HOSTS:
+        raise ValueError(f"Refusing to load-test non-local host: {host}")
+
+    if total_requests is None and duration is None:
+        total_requests = len(clips)
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    sampler = None
+    if server_pid:
+        sampler = RssSampler(server_pid, rss_interval, started)
+        sampler.start()
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        next_arrival = started
+        i = 0
+        while True:
+            if total_requests is not None and i >= total_requests:
+                break
+            if duration is not None and time.perf_counter() - started >= duration:
+                break
+
+            if rate:
+                # Open loop: Poisson arrivals regardless of how fast the server answers
+                next_arrival += rng.expovariate(rate)
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            elif len(futures) - sum(f.done() for f in futures) >= concurrency:
+                # Closed loop: keep exactly `concurrency` requests in flight
+                time.sleep(0.005)
+                continue
+
+            # Open loop: the clock starts at the planned arrival, not when a worker picks it up
+            scheduled_at = next_arrival if rate else time.perf_counter()
+            futures.append(executor.submit(send_clip, url, clips[i % len(clips)], timeout, scheduled_at))
+            i += 1
+
+    elapsed = time.perf_counter() - started
+    if sampler:
+        sampler.stop()
+        sampler.join()
+
+    results = [f.result() for f in futures]
+    latencies = [r["latency_s"] for r in results if r["ok"]]
+    errors = [r for r in results if not r["ok"]]
+    rss_samples = sampler.samples if sampler else []
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "url": url,
+            "clips": len(clips),
+            "concurrency": concurrency,
+            "requests": total_requests,
+            "duration": duration,
+            "rate": rate,
+            "server_pid": server_pid
+        },
+        "summary": {
+            "requests": len(results),
+            "succeeded": len(latencies),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(results) if results else 0,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0,
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "latency_p99_s": percentile(latencies, 99),
+            "client_wait_p95_s": percentile([r["client_wait_s"] for r in results if r["ok"]], 95),
+            "peak_rss_mb": max((s["rss_mb"] for s in rss_samples), default=None)
+        },
+        "results": results,
+        "rss_samples": rss_samples
+    }
+
+
+def print_summary(report):
+    summary = report["summary"]
+    print("=" * 50)
+    print(f"Requests:    {summary['requests']} ({summary['errors']} errors, {summary['error_rate']:.1%})")
+    print(f"Elapsed:     {summary['elapsed_s']:.1f}s")
+    print(f"Throughput:  {summary['throughput_rps']:.2f} req/s")
+    if summary["latency_p50_s"] is not None:
+        print(f"Latency p50: {summary['latency_p50_s']:.3f}s")
+        print(f"Latency p95: {summary['latency_p95_s']:.3f}s")
+        print(f"Latency p99: {summary['latency_p99_s']:.3f}s")
+        print(f"Client wait p95: {summary['client_wait_p95_s']:.3f}s (arrival -> free worker, included above)")
+    if summary["peak_rss_mb"] is not None:
+        print(f"Peak RSS:    {summary['peak_rss_mb']:.0f} MB")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the local Whisper server")
+    parser.add_argument("corpus", help="Directory of .wav/.mp3 clips")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=None, help="Total requests (default: one pass)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop submitting after N seconds")
+    parser.add_argument("--rate", type=float, default=None, help="Poisson arrival rate (req/s); default closed loop")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--server-pid", type=int, default=None, help="Default: logs/whisper.pid")
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write full JSON report to this file")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        args.url,
+        load_corpus(args.corpus),
+        args.concurrency,
+        total_requests=args.requests,
+        duration=args.duration,
+        rate=args.rate,
+        timeout=args.timeout,
+        server_pid=args.server_pid or find_server_pid(),
+        rss_interval=args.rss_interval,
+        seed=args.seed
+    )
+    print_summary(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
@@ -0,0 +1,253 @@
+"""
+Voice-activity-segmented parallel transcription for long audio
+
+Long recordings are split at pauses using an energy-based VAD, silence is
+dropped, and the speech chunks are transcribed in parallel by a pool of
+worker processes (each with its own Whisper model). Results are stitched
+back in order with timestamps relative to the original recording.
+
+The Whisper server keeps its pools in the ModelManager, so they count towards
+the memory cap and are shut down when idle.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import cpu_perf
+except ImportError:
+    # Imported as whisper_model.vad_transcribe (e.g. from stt_whisper_service)
+    from whisper_model import cpu_perf
+
+SAMPLE_RATE = 16000  # whisper.load_audio always resamples to 16 kHz
+
+# VAD settings
+FRAME_MS = 30
+MIN_SILENCE_SECONDS = 0.5      # pauses at least this long split speech regions
+MIN_SPEECH_SECONDS = 0.25      # shorter blips are treated as noise
+PADDING_SECONDS = 0.2          # keep a little context around each region
+ENERGY_FLOOR = 1e-4            # absolute RMS floor for "speech"
+NOISE_MULTIPLIER = 3.0         # speech must be this much louder than the noise floor
+
+# Chunking settings
+MAX_CHUNK_SECONDS = 30.0       # Whisper's native window
+MAX_GAP_SECONDS = 2.0          # longer silences always start a new chunk
+
+# Recordings shorter than this are transcribed in one call (no pool overhead)
+LONG_AUDIO_SECONDS = 90.0
+
+
+# ============================================================================
+# VOICE ACTIVITY DETECTION
+# ============================================================================
+
+def frame_energy(audio, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """RMS energy per frame"""
+    frame_length = int(sample_rate * frame_ms / 1000)
+    frame_count = len(audio) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32), frame_length
+    frames = audio[:frame_count * frame_length].reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1)), frame_length
+
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE):
+    """
+    Find speech regions in mono float audio
+
+    Returns:
+        list: (start_sample, end_sample) tuples in order
+    """
+    energy, frame_length = frame_energy(audio, sample_rate)
+    if len(energy) == 0:
+        return []
+
+    # Adaptive threshold: well above the quietest 10% of frames
+    noise_floor = np.percentile(energy, 10)
+    threshold = max(ENERGY_FLOOR, noise_floor * NOISE_MULTIPLIER)
+    is_speech = energy > threshold
+
+    min_silence_frames = int(MIN_SILENCE_SECONDS * 1000 / FRAME_MS)
+    min_speech_frames = int(MIN_SPEECH_SECONDS * 1000 / FRAME_MS)
+    padding = int(PADDING_SECONDS * sample_rate)
+
+    regions = []
+    start = None
+    silence_run = 0
+    for i, speech in enumerate(is_speech):
+        if speech:
+            if start is None:
+                start = i
+            silence_run = 0
+        elif start is not None:
+            silence_run += 1
+            if silence_run >= min_silence_frames:
+                end = i - silence_run + 1
+                if end - start >= min_speech_frames:
+                    regions.append((start, end))
+                start = None
+                silence_run = 0
+    if start is not None:
+        end = len(is_speech) - silence_run
+        if end - start >= min_speech_frames:
+            regions.append((start, end))
+
+    return [
+        (max(0, s * frame_length - padding), min(len(audio), e * frame_length + padding))
+        for s, e in regions
+    ]
+
+
+def _split_region(audio, start, end, max_samples, sample_rate=SAMPLE_RATE):
+    """Split an over-long region at the quietest frame near each max-length boundary"""
+    pieces = []
+    while end - start > max_samples:
+        # Look for the quietest point in the last 20% of the allowed window
+        search_start = start + int(max_samples * 0.8)
+        search_end = start + max_samples
+        energy, frame_length = frame_energy(audio[search_start:search_end], sample_rate)
+        cut = search_start + int(np.argmin(energy)) * frame_length if len(energy) else search_end
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def build_chunks(audio, regions, sample_rate=SAMPLE_RATE):
+    """
+    Pack speech regions into transcription chunks
+
+    Neighbouring regions are merged while the chunk stays within
+    MAX_CHUNK_SECONDS and the gap between them is under MAX_GAP_SECONDS.
+
+    Returns:
+        list: (start_sample, end_sample) tuples in order
+    """
+    max_samples = int(MAX_CHUNK_SECONDS * sample_rate)
+    max_gap = int(MAX_GAP_SECONDS * sample_rate)
+
+    pieces = []
+    for start, end in regions:
+        pieces.extend(_split_region(audio, start, end, max_samples, sample_rate))
+
+    chunks = []
+    for start, end in pieces:
+        if chunks:
+            chunk_start, chunk_end = chunks[-1]
+            if start - chunk_end <= max_gap and end - chunk_start <= max_samples:
+                chunks[-1] = (chunk_start, max(chunk_end, end))
+                continue
+        chunks.append((start, end))
+    return chunks
+
+
+# ============================================================================
+# PARALLEL TRANSCRIPTION
+# ============================================================================
+
+_worker_model = None
+_pools = {}  # (model_path, workers) -> executor, for callers without a ModelManager
+_pools_lock = threading.Lock()
+
+
+def _init_worker(model_path, threads):
+    """Load one Whisper model per worker process"""
+    global _worker_model
+    import whisper
+
+    cpu_perf.configure_threads(intra_op=threads, inter_op=1)
+    _worker_model = cpu_perf.quantize_model(whisper.load_model(model_path, device="cpu"))
+
+
+def _transcribe_chunk(index, offset_seconds, samples, transcribe_options):
+    result = _worker_model.transcribe(samples, **transcribe_options)
+    segments = [
+        {
+            "start": round(segment["start"] + offset_seconds, 2),
+            "end": round(segment["end"] + offset_seconds, 2),
+            "text": segment["text"].strip()
+        }
+        for segment in result.get("segments", [])
+    ]
+    return index, result["text"].strip(), segments
+
+
+def default_worker_count():
+    """Half of this server's share of the cores (see WHISPER_WORKERS_PER_HOST), max 4"""
+    return max(1, min(4, cpu_perf.default_intra_op_threads() // 2))
+
+
+def worker_threads(workers):
+    """
+    Torch threads per pool worker
+
+    The server's core share is split between the workers and the server
+    process itself, which keeps serving short clips while the pool runs.
+    """
+    return max(1, cpu_perf.default_intra_op_threads() // (workers + 1))
+
+
+def create_pool(model_path, workers=None):
+    """Start a worker pool for a model; the caller owns it and must shut it down"""
+    workers = workers or default_worker_count()
+    # spawn: forking a process that already ran torch ops can deadlock
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(os.path.abspath(model_path), worker_threads(workers))
+    )
+
+
+def get_pool(model_path, workers=None):
+    """Shared pool for a model, created on first use and kept for the process lifetime"""
+    key = (os.path.abspath(model_path), workers or default_worker_count())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = create_pool(*key)
+        return _pools[key]
+
+
+def transcribe_with_vad(audio, model_path=None, workers=None, sample_rate=SAMPLE_RATE, pool=None,
+                        **transcribe_options):
+    """
+    Transcribe long audio by VAD chunks in parallel
+
+    Args:
+        audio: Mono float32 samples at 16 kHz (e.g. from whisper.load_audio)
+        model_path: Whisper model file loaded by each worker (when no pool is given)
+        workers: Worker process count (default: see default_worker_count)
+        pool: Executor from create_pool, e.g. one held by a ModelManager
+        **transcribe_options: Passed through to model.transcribe
+
+    Returns:
+        dict: text, ordered segments with timestamps, and speech/total seconds
+    """
+    regions = detect_speech(audio, sample_rate)
+    chunks = build_chunks(audio, regions, sample_rate)
+
+    total_seconds = len(audio) / sample_rate
+    speech_seconds = sum(end - start for start, end in chunks) / sample_rate
+
+    if not chunks:
+        return {"text": "", "segments": [], "speech_seconds": 0.0, "total_seconds": total_seconds}
+
+    pool = pool or get_pool(model_path, workers)
+    futures = [
+        pool.submit(_transcribe_chunk, i, start / sample_rate, audio[start:end], transcribe_options)
+        for i, (start, end) in enumerate(chunks)
+    ]
+    results = sorted(future.result() for future in futures)
+
+    texts = [text for _, text, _ in results if text]
+    segments = [segment for _, _, chunk_segments in results for segment in chunk_segments]
+
+    return {
+        "text": " ".join(texts),
+        "segments": segments,
+        "speech_seconds": round(speech_seconds, 2),
+        "total_seconds": round(total_seconds, 2)
+    }
@@ -1,57 +1,156 @@
 from flask import Flask, request, jsonify
 import whisper
+import numpy as np
 import os
+import sys
 import tempfile
 
+import cpu_perf
+from vad_transcribe import SAMPLE_RATE, LONG_AUDIO_SECONDS, create_pool, default_worker_count, transcribe_with_vad
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_manager import ModelManager
+from job_queue import JobQueue, DEFAULT_PRIORITY, PRIORITIES
+
 app = Flask(__name__)
 
-# Global model - loaded once when server starts
-_whisper_model = None
+# Model registry: name -> local checkpoint and approximate resident size on CPU
+WHISPER_MODELS = {
+    "tiny": {"path": "tiny.pt", "size_mb": 150},
+    "base": {"path": "base.pt", "size_mb": 300},
+    "small": {"path": "small.pt", "size_mb": 1000},
+}
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "tiny")
 
-def get_whisper_model():
-    """Load Whisper model once"""
-    global _whisper_model
-    if _whisper_model is None:
-        model_path = "tiny.pt"
+
+def _make_loader(model_path):
+    def load():
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model not found: {model_path}")
+        return cpu_perf.quantize_model(whisper.load_model(model_path, device="cpu"))
+    return load
 
-        print("Loading Whisper model...")
-        _whisper_model = whisper.load_model(model_path, device="cpu")
-        print("Model loaded on CPU!")
-    return _whisper_model
 
+def _warmup(model):
+    """Decode one second of silence so the first real request is fast"""
+    model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), **cpu_perf.TRANSCRIBE_OPTIONS)
 
-@app.route('/transcribe', methods=['POST'])
-def transcribe():
-    """Transcribe audio file"""
-    try:
-        # Get audio file from request
-        if 'file' not in request.files:
-            return jsonify({"success": False, "error": "No file provided"}), 400
 
-        audio_file = request.files['file']
+# Long audio goes to a pool of worker processes, each holding its own copy of
+# the model; registered as "<name>-vad" so it shares the memory cap and idle unloading
+VAD_WORKERS = int(os.getenv("WHISPER_VAD_WORKERS", "0")) or default_worker_count()
+
 
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as f:
-            audio_file.save(f.name)
-            temp_path = f.name
+def _vad_pool_name(model_name):
+    return f"{model_name}-vad"
 
-        # Transcribe
-        print(f"Transcribing {audio_file.filename}...")
-        model = get_whisper_model()
-        result = model.transcribe(temp_path)
-        transcription = result["text"].strip()
 
+def _make_pool_loader(model_path):
+    def load():
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model not found: {model_path}")
+        return create_pool(model_path, VAD_WORKERS)
+    return load
+
+
+model_manager = ModelManager(
+    registry={
+        **{
+            name: {"loader": _make_loader(entry["path"]), "size_mb": entry["size_mb"], "warmup": _warmup}
+            for name, entry in WHISPER_MODELS.items()
+        },
+        **{
+            _vad_pool_name(name): {
+                "loader": _make_pool_loader(entry["path"]),
+                "size_mb": entry["size_mb"] * VAD_WORKERS,
+                "unload": lambda pool: pool.shutdown(wait=False, cancel_futures=True)
+            }
+            for name, entry in WHISPER_MODELS.items()
+        }
+    },
+    default=DEFAULT_MODEL,
+    max_memory_mb=int(os.getenv("MODEL_MEMORY_CAP_MB", "1500")),
+    idle_timeout=int(os.getenv("MODEL_IDLE_TIMEOUT", "600")),
+    pin_default=os.getenv("MODEL_PIN_DEFAULT", "0") == "1"
+)
+
+
+def get_whisper_model(name=None):
+    """Get a Whisper model from the model manager (default model if name is None)"""
+    return model_manager.get(name)
+
+
+def run_transcription(temp_path, model_name):
+    """Transcribe an audio file on disk (deleted afterwards) and return the response body"""
+    try:
+        audio = whisper.load_audio(temp_path)
+    finally:
         # Cleanup
-        os.unlink(temp_path)
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+    duration = len(audio) / SAMPLE_RATE
+    if duration > LONG_AUDIO_SECONDS:
+        # Long recordings: drop silence, transcribe speech chunks in parallel.
+        # The workers hold their own models, so the in-process one isn't loaded.
+        print(f"Long audio ({duration:.0f}s) - using VAD parallel transcription")
+        with model_manager.use(_vad_pool_name(model_name)) as pool:
+            result = transcribe_with_vad(audio, pool=pool, **cpu_perf.TRANSCRIBE_OPTIONS)
+        segments = result["segments"]
+    else:
+        model = get_whisper_model(model_name)
+        result = model.transcribe(audio, **cpu_perf.TRANSCRIBE_OPTIONS)
+        segments = [
+            {"start": round(s["start"], 2), "end": round(s["end"], 2), "text": s["text"].strip()}
+            for s in result.get("segments", [])
+        ]
+    transcription = result["text"].strip()
+
+    print(f"Result: {transcription}")
+
+    return {
+        "success": True,
+        "transcription": transcription,
+        "segments": segments,
+        "duration": round(duration, 2)
+    }
+
+
+def _save_upload():
+    """Validate the multipart request and save the audio to a temp file"""
+    if 'file' not in request.files:
+        raise ValueError("No file provided")
+
+    model_name = request.form.get('model') or DEFAULT_MODEL
+    if model_name not in WHISPER_MODELS:
+        raise ValueError(f"Unknown model: {model_name}")
+
+    audio_file = request.files['file']
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as f:
+        audio_file.save(f.name)
+        temp_path = f.name
+
+    print(f"Received {audio_file.filename}")
+    return temp_path, model_name
+
+
+# Async jobs: submit returns immediately, clients poll /jobs/<id> (or get a callback)
+job_queue = JobQueue(
+    handler=lambda payload: run_transcription(payload["path"], payload["model"]),
+    workers=int(os.getenv("JOB_WORKERS", "1"))
+)
 
-        print(f"Result: {transcription}")
 
-        return jsonify({
-            "success": True,
-            "transcription": transcription
-        })
+@app.route('/transcribe', methods=['POST'])
+def transcribe():
+    """Transcribe audio file (synchronous)"""
+    try:
+        temp_path, model_name = _save_upload()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        return jsonify(run_transcription(temp_path, model_name))
 
     except Exception as e:
         print(f"Error: {e}")
@@ -61,15 +160,56 @@ def transcribe():
         }), 500
 
 
+@app.route('/jobs/transcribe', methods=['POST'])
+def submit_transcription_job():
+    """Queue a transcription job; form fields: file, model, priority (interactive|bulk), callback_url"""
+    priority = request.form.get('priority') or DEFAULT_PRIORITY
+    if priority not in PRIORITIES:
+        return jsonify({"success": False, "error": f"Unknown priority: {priority}"}), 400
+
+    try:
+        temp_path, model_name = _save_upload()
+        job_id = job_queue.submit(
+            {"path": temp_path, "model": model_name},
+            priority=priority,
+            callback_url=request.form.get('callback_url'),
+            on_expire=lambda payload: os.path.exists(payload["path"]) and os.unlink(payload["path"])
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status; includes the transcription result once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+    return jsonify({"success": True, **job})
+
+
 @app.route('/health', methods=['GET'])
 def health():
-    """Health check"""
+    """Liveness check - the process is up (models may still be loading)"""
+    status = model_manager.status()
     return jsonify({
         "status": "running",
-        "model_loaded": _whisper_model is not None
+        "model_loaded": DEFAULT_MODEL in status["loaded_models"],
+        "models": status,
+        "cpu": cpu_perf.describe(),
+        "jobs": job_queue.stats()
     })
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness check - default model loaded and warmed up"""
+    status = model_manager.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
 if __name__ == '__main__':
     PORT = 8001
 
@@ -78,6 +218,17 @@ if __name__ == '__main__':
     print("=" * 50)
     print(f"POST http://localhost:{PORT}/transcribe")
     print(f"GET  http://localhost:{PORT}/health")
+    print(f"GET  http://localhost:{PORT}/ready")
+    print(f"POST http://localhost:{PORT}/jobs/transcribe")
+    print(f"GET  http://localhost:{PORT}/jobs/<job_id>")
     print("=" * 50)
 
+    # Size torch thread pools before any inference runs in this process
+    print(f"CPU config: {cpu_perf.configure_threads()} quantize={cpu_perf.QUANTIZE_MODE}")
+
+    # Load and warm the default model in the background so /health answers immediately
+    import threading
+    threading.Thread(target=model_manager.warmup, daemon=True).start()
+    model_manager.start_idle_reaper()
+
     app.run(host='0.0.0.0', port=PORT, debug=False)